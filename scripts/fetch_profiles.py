@@ -13,10 +13,12 @@ load_dotenv()
 
 from src.database.queries import (
     get_profile_by_username,
-    get_all_profiles,
+    get_profiles_page,
     search_profiles,
     get_posts_by_username
 )
+from src.database.indexes import ensure_indexes
+from src.database.cache import query_cache
 
 def display_profile(profile):
     """Display profile information and posts in a tabulated format."""
@@ -64,10 +66,10 @@ def display_profile(profile):
 
             print("📆 Timestamp:", post.get("timestamp", "N/A"))
 
-            # Display comments in table format if available
-            if post.get("comments"):
-                print("\n💬 Comments:")
-                comments_table = [[comment.get("user", "Unknown"), textwrap.fill(comment.get("text", ""), width=60)] for comment in post["comments"]]
+            # Display the top comments stored on the post; the full thread is in the comments collection
+            if post.get("comment_preview"):
+                print(f"\n💬 Top comments ({len(post['comment_preview'])} of {post.get('comment_count', 0):,}):")
+                comments_table = [[comment.get("user", "Unknown"), textwrap.fill(comment.get("text") or "", width=60)] for comment in post["comment_preview"]]
                 print(tabulate(comments_table, headers=["Username", "Comment"], tablefmt="fancy_grid"))
             else:
                 print("\n💬 No comments")
@@ -80,6 +82,7 @@ def display_profile(profile):
 def main():
     """Main function demonstrating different ways to fetch data."""
     usernames = ["taylorswift", "zuck", "cristiano"]
+    ensure_indexes()
 
     for username in usernames:
         print(f"\n1️⃣ Fetching profile: {username}")
@@ -87,18 +90,27 @@ def main():
         display_profile(profile)
 
     print("\n2️⃣ Fetching all profiles (no limit):")
-    profiles = get_all_profiles(limit=15)
-    profile_table = [[p["username"], p["follower_count"], p["following_count"], p["media_count"]] for p in profiles]
+    # Keyset pages: each page costs the same however deep into the collection it is
+    profile_table, cursor = [], None
+    while True:
+        profiles, cursor = get_profiles_page(limit=15, cursor=cursor)
+        profile_table += [[p["username"], p.get("follower_count"), p.get("following_count"), p.get("media_count")] for p in profiles]
+        if cursor is None:
+            break
     print(tabulate(profile_table, headers=["Username", "Followers", "Following", "Posts"], tablefmt="fancy_grid"))
 
     print("\n3️⃣ Searching for profiles:")
     search_term = "taylor"
     search_results = search_profiles(search_term)
     if search_results:
-        search_table = [[p["username"], p["full_name"], p["follower_count"]] for p in search_results]
+        search_table = [[p["username"], p.get("full_name"), p.get("follower_count")] for p in search_results]
         print(tabulate(search_table, headers=["Username", "Full Name", "Followers"], tablefmt="fancy_grid"))
     else:
         print("No matching profiles found.")
 
+    print("\n📊 Query cache:")
+    cache_table = [[kind, s["hits"], s["misses"], f"{s['hit_rate']:.0%}"] for kind, s in query_cache.stats().items()]
+    print(tabulate(cache_table, headers=["Query", "Hits", "Misses", "Hit rate"], tablefmt="fancy_grid"))
+
 if __name__ == "__main__":
     main()
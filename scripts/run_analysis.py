@@ -0,0 +1,66 @@
+import sys
+import os
+import time
+import argparse
+from dotenv import load_dotenv
+from tabulate import tabulate
+
+# Add project root to path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+# Load environment variables
+load_dotenv()
+
+from src.config.db import get_db
+from src.config.settings import SNAPSHOT_DIR
+from src.analysis.roster import load_frames, load_snapshot_frames, roster_metrics, to_documents
+from src.scraper.save_to_db import BulkWriter
+
+
+def main():
+    """Compute roster-wide engagement analytics and store them in MongoDB."""
+    parser = argparse.ArgumentParser(description="Batch engagement analytics for every stored profile.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the results without writing them")
+    parser.add_argument("--top", type=int, default=15, help="Profiles to show in the summary table")
+    parser.add_argument("--snapshot", nargs="?", const="", metavar="DIR",
+                        help="Read Parquet snapshots (default SNAPSHOT_DIR) instead of querying MongoDB")
+    args = parser.parse_args()
+
+    db = get_db()
+    started = time.perf_counter()
+    profiles, posts = load_frames(db) if args.snapshot is None else load_snapshot_frames(args.snapshot or SNAPSHOT_DIR)
+    loaded = time.perf_counter()
+    metrics, outliers = roster_metrics(profiles, posts)
+    computed = time.perf_counter()
+
+    print(f"📥 Loaded {len(profiles):,} profiles and {len(posts):,} posts in {loaded - started:.2f}s")
+    print(f"🧮 Computed metrics in {computed - loaded:.2f}s ({len(outliers):,} outlier posts)")
+
+    top = metrics.sort_values("engagement_rate", ascending=False).head(args.top)
+    print(tabulate(
+        top[["username", "follower_count", "post_count", "avg_likes", "avg_comments",
+             "engagement_rate", "posts_per_week", "outlier_posts"]].values.tolist(),
+        headers=["Username", "Followers", "Posts", "Avg Likes", "Avg Comments",
+                 "Engagement %", "Posts/Week", "Outliers"],
+        tablefmt="fancy_grid", floatfmt=".2f",
+    ))
+
+    if args.dry_run:
+        return
+
+    with BulkWriter() as writer:
+        for document in to_documents(metrics):
+            document["_id"] = document["username"]
+            writer.add_document("roster_metrics", document)
+        db.post_outliers.delete_many({})
+        for document in to_documents(outliers[["_id", "username", "like_count", "comment_count",
+                                               "timestamp", "engagement", "robust_z"]]):
+            writer.add_document("post_outliers", document)
+    totals = writer.totals()
+    print(f"💾 Wrote {totals['operations']:,} documents in {totals['batches']} batches "
+          f"(errors {totals['errors']}) in {time.perf_counter() - computed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import sys
+import os
+import argparse
+from dotenv import load_dotenv
+
+# Add project root to path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+# Load environment variables
+load_dotenv()
+
+from src.config.settings import SCHEDULER_WORKERS
+from src.scraper.scheduler import Scheduler, track, untrack
+from src.database.indexes import ensure_indexes
+
+
+def main():
+    """Keep tracked accounts fresh, crawling the most overdue ones first."""
+    parser = argparse.ArgumentParser(description="Priority crawl scheduler for tracked Instagram accounts.")
+    parser.add_argument("--add", nargs="+", metavar="USERNAME", help="Start tracking these accounts")
+    parser.add_argument("--remove", nargs="+", metavar="USERNAME", help="Stop tracking these accounts")
+    parser.add_argument("--once", action="store_true", help="Crawl the accounts due now, then exit")
+    parser.add_argument("--workers", type=int, default=SCHEDULER_WORKERS, help="Crawler processes")
+    args = parser.parse_args()
+
+    if args.add:
+        print(f"➕ Tracking {track(args.add)} new accounts")
+    if args.remove:
+        print(f"➖ Stopped tracking {untrack(args.remove)} accounts")
+    if (args.add or args.remove) and not args.once:
+        return
+
+    ensure_indexes()
+    try:
+        stats = Scheduler(args.workers).run(once=args.once)
+    except KeyboardInterrupt:
+        print("\n🛑 Scheduler stopped")
+        return
+    print(f"\n📊 {stats['profiles']} profiles, {stats['posts']} posts crawled, {stats['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import sys
+import os
+import argparse
+from dotenv import load_dotenv
+
+# Add project root to path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+# Load environment variables
+load_dotenv()
+
+from src.config.settings import INCREMENTAL_CRAWL, POSTS_MAX_PAGES
+from src.scraper.pipeline import stream_instagram
+from src.scraper.save_to_db import BulkWriter
+from src.scraper.sinks import NDJSONSink
+from src.scraper.checkpoints import CrawlJob
+from src.scraper.rate_limit import QuotaExhausted
+from src.analysis.engagement import EngagementTracker
+from src.database.indexes import ensure_indexes
+from src.utils import metrics
+
+
+def main():
+    """Stream profiles and posts page by page into MongoDB and an optional NDJSON file."""
+    parser = argparse.ArgumentParser(description="Streaming Instagram scraper.")
+    parser.add_argument("usernames", nargs="+", help="Instagram usernames to crawl")
+    parser.add_argument("--pages", type=int, default=POSTS_MAX_PAGES, help="Post pages to follow per profile")
+    parser.add_argument("--output", help="Append every record to this NDJSON file")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-fetch comments for every post instead of only new or changed ones")
+    parser.add_argument("--job", help="Name of a resumable crawl job; a restart continues from the last saved page")
+    args = parser.parse_args()
+
+    ensure_indexes()
+    metrics.serve()
+    job = CrawlJob(args.job) if args.job else None
+    sink = NDJSONSink(args.output) if args.output else None
+    try:
+        with BulkWriter() as writer:
+            stats = stream_instagram(args.usernames, writer, sink,
+                                     incremental=INCREMENTAL_CRAWL and not args.full,
+                                     max_pages=args.pages, job=job,
+                                     tracker=EngagementTracker(writer))
+    except QuotaExhausted as e:
+        print(f"\n⏸️ Stopped: {e}. Rerun with the same --job once the quota resets to continue.")
+        return
+    finally:
+        if sink is not None:
+            sink.close()
+        metrics.write_textfile(process="run_scraper")
+
+    totals = writer.totals()
+    print(f"\n📊 {stats['profiles']} profiles, {stats['posts']} posts streamed, {stats['failed']} failed")
+    print(f"💾 {totals['operations']} upserts in {totals['batches']} batches (errors {totals['errors']})")
+    if job is not None:
+        print(f"📋 Job '{args.job}' progress: {job.progress()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Batch text analytics over the comments collection.
+Comments are read in post order and cut into chunks that never split a
+post; a process pool tokenizes each chunk and scores it against a built-in
+sentiment lexicon, counting terms, hashtags, mentions and emoji. Workers
+never touch the database: they return one compact summary per post, which
+the parent upserts into `comment_analytics` and folds into per-profile
+totals in `profile_comment_analytics`. A run over a subset of comments only
+replaces the totals of profiles whose comments it covered in full.
+Everything runs locally.
+
+    python -m src.analysis.comments --workers 8
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from itertools import groupby
+from operator import itemgetter
+
+from src.config.db import get_db
+from src.config.settings import TEXT_CHUNK_SIZE, TEXT_TOP_TERMS, TEXT_WORKERS
+from src.database.export import post_owners
+from src.scraper.save_to_db import BulkWriter
+from src.utils.logger import get_logger
+from src.utils import metrics
+
+log = get_logger(__name__)
+
+EMOJI = "\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF"
+TOKEN_RE = re.compile(rf"(#\w+)|(@[\w.]+)|([{EMOJI}])|([^\W\d_]+(?:'[^\W\d_]+)?)")
+
+# Word and emoji valences (-3..3); a negator flips the next scored token
+LEXICON = {
+    "love": 3, "loved": 3, "loving": 2, "lovely": 3, "amazing": 3, "awesome": 3, "incredible": 3, "perfect": 3,
+    "beautiful": 3, "gorgeous": 3, "stunning": 3, "best": 3, "great": 3, "fantastic": 3, "wonderful": 3,
+    "excellent": 3, "brilliant": 3, "good": 2, "nice": 2, "cute": 2, "cool": 2, "happy": 2, "fun": 2, "wow": 2,
+    "congrats": 2, "congratulations": 2, "proud": 2, "thanks": 2, "thank": 2, "yes": 1, "like": 1, "fire": 2,
+    "queen": 2, "king": 2, "legend": 2, "goat": 2, "iconic": 2, "inspiring": 2, "favorite": 2, "favourite": 2,
+    "bad": -2, "worst": -3, "terrible": -3, "awful": -3, "horrible": -3, "hate": -3, "hated": -3, "ugly": -2,
+    "boring": -2, "sad": -2, "angry": -2, "disgusting": -3, "stupid": -2, "fake": -2, "trash": -3, "cringe": -2,
+    "disappointed": -2, "disappointing": -2, "annoying": -2, "scam": -3, "poor": -2, "wrong": -1, "lame": -2,
+    "sucks": -2, "gross": -2, "shame": -2, "overrated": -2, "unfollow": -2, "spam": -2,
+    "❤": 3, "😍": 3, "🥰": 3, "😘": 2, "💕": 3, "💖": 3, "💯": 2, "🔥": 2, "👏": 2, "🙌": 2, "😊": 2, "😁": 2,
+    "😂": 1, "🤣": 1, "👍": 2, "🥳": 2, "✨": 1, "😢": -2, "😭": -1, "😡": -3, "🤬": -3, "👎": -2, "💔": -2,
+    "🤮": -3, "😒": -2, "🙄": -2, "😤": -2,
+}
+NEGATORS = {"not", "no", "never", "dont", "don't", "isnt", "isn't", "wasnt", "wasn't", "cant", "can't", "aint",
+            "ain't", "nothing", "nobody"}
+STOPWORDS = {
+    "the", "and", "for", "you", "your", "are", "was", "this", "that", "with", "have", "has", "had", "but", "all",
+    "just", "she", "her", "his", "him", "they", "them", "what", "when", "who", "will", "would", "can", "from",
+    "out", "our", "more", "one", "get", "got", "how", "its", "it's", "i'm", "you're", "too", "very", "there",
+    "here", "then", "than", "been", "were", "also", "some", "about", "into", "only", "much", "did", "does",
+    "see", "let", "now", "why", "way", "really", "wanna", "gonna", "please", "omg", "lol",
+}
+# VADER's normalization constant: maps a summed score into (-1, 1)
+ALPHA = 15
+NEUTRAL_BAND = 0.05
+
+
+def tokenize(text):
+    """(words, hashtags, mentions, emoji) from one comment, lowercased."""
+    words, hashtags, mentions, emoji = [], [], [], []
+    for hashtag, mention, symbol, word in TOKEN_RE.findall(text.lower()):
+        if word:
+            words.append(word)
+        elif hashtag:
+            hashtags.append(hashtag)
+        elif mention:
+            mentions.append(mention.rstrip("."))
+        else:
+            emoji.append(symbol)
+    return words, hashtags, mentions, emoji
+
+
+def sentiment(words, emoji=()):
+    """Lexicon score of one comment, normalized into (-1, 1)."""
+    score = 0
+    negate = False
+    for word in words:
+        if word in NEGATORS:
+            negate = True
+            continue
+        value = LEXICON.get(word)
+        if value:
+            score += -value if negate else value
+            negate = False
+    score += sum(LEXICON.get(symbol, 0) for symbol in emoji)
+    return score / math.sqrt(score * score + ALPHA) if score else 0.0
+
+
+def summarize(texts, keep=TEXT_TOP_TERMS):
+    """Sentiment counts and top terms, hashtags, mentions and emoji for one post's comments."""
+    terms, hashtags, mentions, emoji = Counter(), Counter(), Counter(), Counter()
+    polarity = 0.0
+    labels = {"positive": 0, "negative": 0, "neutral": 0}
+    for text in texts:
+        words, tags, users, symbols = tokenize(text or "")
+        score = sentiment(words, symbols)
+        polarity += score
+        labels["positive" if score >= NEUTRAL_BAND else "negative" if score <= -NEUTRAL_BAND else "neutral"] += 1
+        terms.update(word for word in words if len(word) > 2 and word not in STOPWORDS)
+        hashtags.update(tags)
+        mentions.update(users)
+        emoji.update(symbols)
+    return {"comments": len(texts), "polarity": polarity, **labels,
+            "terms": terms.most_common(keep), "hashtags": hashtags.most_common(keep),
+            "mentions": mentions.most_common(keep), "emoji": emoji.most_common(keep)}
+
+
+def summarize_chunk(chunk, keep=TEXT_TOP_TERMS):
+    """[(post_id, summary)] for a chunk of (post_id, [texts]); runs in a worker process.
+
+    Counters keep a few times `keep` entries so profile totals merged from
+    them stay close to exact.
+    """
+    return [(post_id, summarize(texts, keep * 5)) for post_id, texts in chunk]
+
+
+def iter_chunks(chunk_size=TEXT_CHUNK_SIZE, query=None):
+    """Lists of (post_id, [texts]) with about `chunk_size` comments each; a post never spans two."""
+    cursor = get_db().comments.find(query or {}, {"post_id": 1, "text": 1}).sort([("post_id", 1), ("_id", 1)])
+    chunk, size = [], 0
+    for post_id, comments in groupby(cursor, key=itemgetter("post_id")):
+        texts = [comment.get("text") or "" for comment in comments]
+        chunk.append((post_id, texts))
+        size += len(texts)
+        if size >= chunk_size:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+class ProfileTotals:
+    """Per-post summaries folded into one profile's totals."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.counters = defaultdict(Counter)
+
+    def add(self, summary):
+        self.counts.update({key: summary[key] for key in ("comments", "polarity", "positive", "negative", "neutral")})
+        for key in ("terms", "hashtags", "mentions", "emoji"):
+            self.counters[key].update(dict(summary[key]))
+
+
+def fully_analyzed(profiles):
+    """Usernames in `profiles` (username -> ProfileTotals) whose totals cover every stored comment."""
+    db = get_db()
+    owners = {post["_id"]: post["username"]
+              for post in db.posts.find({"username": {"$in": list(profiles)}}, {"username": 1})}
+    stored = Counter()
+    for row in db.comments.aggregate([{"$match": {"post_id": {"$in": list(owners)}}},
+                                      {"$group": {"_id": "$post_id", "count": {"$sum": 1}}}]):
+        stored[owners[row["_id"]]] += row["count"]
+    return [username for username, totals in profiles.items() if totals.counts["comments"] == stored[username]]
+
+
+def summary_document(summary, keep, analyzed_at):
+    """The stored form of a summary: label counts, mean sentiment and the top `keep` of each list."""
+    document = {key: summary.get(key, 0) for key in ("comments", "positive", "negative", "neutral")}
+    document.update({key: [list(pair) for pair in summary.get(key, [])[:keep]]
+                     for key in ("terms", "hashtags", "mentions", "emoji")})
+    document["sentiment"] = round(summary["polarity"] / summary["comments"], 4) if summary.get("comments") else 0.0
+    document["analyzed_at"] = analyzed_at
+    return document
+
+
+def analyze_comments(workers=TEXT_WORKERS, chunk_size=TEXT_CHUNK_SIZE, keep=TEXT_TOP_TERMS, query=None):
+    """Summarize every comment (or those matching `query`) per post and per profile. Returns counts.
+
+    With a `query`, profile totals are only written for profiles whose comments all matched it.
+    """
+    workers = workers or os.cpu_count() or 1
+    analyzed_at = datetime.now(timezone.utc)
+    profiles = defaultdict(ProfileTotals)
+    stats = {"comments": 0, "posts": 0, "profiles": 0, "chunks": 0}
+    start = time.perf_counter()
+
+    def store(results):
+        owners = post_owners(post_id for post_id, _ in results)
+        for post_id, summary in results:
+            username = owners.get(post_id)
+            writer.add_update("comment_analytics", {"_id": post_id},
+                              {"$set": {"username": username, **summary_document(summary, keep, analyzed_at)}})
+            if username is not None:
+                profiles[username].add(summary)
+            stats["comments"] += summary["comments"]
+        stats["posts"] += len(results)
+        stats["chunks"] += 1
+        metrics.QUEUE_DEPTH.labels("comment_chunks").set(len(running))
+
+    running = set()
+    with metrics.span("analyze_comments", workers=workers), BulkWriter() as writer:
+        if workers == 1:
+            for chunk in iter_chunks(chunk_size, query):
+                store(summarize_chunk(chunk, keep))
+        else:
+            # Workers only see text, so spawned processes need no database connection
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                for chunk in iter_chunks(chunk_size, query):
+                    # A couple of chunks per worker queued ahead; reading stays ahead without buffering everything
+                    while len(running) >= workers * 2:
+                        done, running = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            store(future.result())
+                    running.add(pool.submit(summarize_chunk, chunk, keep))
+                while running:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        store(future.result())
+
+        complete = list(profiles) if query is None else fully_analyzed(profiles)
+        for username in complete:
+            totals = profiles[username]
+            summary = {**totals.counts, **{key: counter.most_common(keep) for key, counter in totals.counters.items()}}
+            writer.add_update("profile_comment_analytics", {"_id": username},
+                              {"$set": summary_document(summary, keep, analyzed_at)})
+        stats["profiles"] = len(complete)
+
+    elapsed = time.perf_counter() - start
+    log.info("💬 Comment analytics written",
+             extra={"fields": {**stats, "seconds": round(elapsed, 2),
+                               "comments_per_sec": round(stats["comments"] / elapsed) if elapsed else None}})
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sentiment, top terms, hashtags, mentions and emoji for stored comments.")
+    parser.add_argument("--workers", type=int, default=TEXT_WORKERS, help="Processes (0 = one per CPU, 1 = inline)")
+    parser.add_argument("--chunk-size", type=int, default=TEXT_CHUNK_SIZE, help="Comments per worker task")
+    parser.add_argument("--top", type=int, default=TEXT_TOP_TERMS, help="Entries kept per top list")
+    args = parser.parse_args()
+
+    stats = analyze_comments(args.workers, args.chunk_size, args.top)
+    print(f"✅ {stats['comments']:,} comments on {stats['posts']:,} posts from {stats['profiles']:,} profiles "
+          f"in {stats['chunks']:,} chunks.")
@@ -0,0 +1,209 @@
+"""
+Engagement metrics computation.
+Per-profile aggregates (post count, total likes and comments) and per-day /
+per-week rollups are kept in MongoDB and updated incrementally with $inc as
+posts are upserted, so dashboards read precomputed numbers instead of
+re-scanning every post. `rebuild_metrics` recomputes everything from the
+posts collection when the aggregates need a backfill or repair.
+
+A crawl's deltas are stored in its crawl_state document and written after
+it; every updated document remembers the crawl it last took deltas from,
+so replaying them after a crash adds nothing twice.
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from src.analysis.timeseries import SnapshotRecorder
+from src.config.db import get_db
+from src.config.settings import TIMESERIES_ENABLED
+
+def period_buckets(timestamp):
+    """Return {"day": "YYYY-MM-DD", "week": "YYYY-Www"} for a post's epoch timestamp."""
+    if not timestamp:
+        return {}
+    posted = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    year, week, _ = posted.isocalendar()
+    return {"day": posted.strftime("%Y-%m-%d"), "week": f"{year}-W{week:02d}"}
+
+
+def engagement_summary(metrics):
+    """Derive averages and engagement rate from a profile_metrics document."""
+    post_count = metrics.get("post_count", 0)
+    total_likes = metrics.get("total_likes", 0)
+    total_comments = metrics.get("total_comments", 0)
+    follower_count = metrics.get("follower_count") or 0
+    avg_likes = total_likes / post_count if post_count else 0.0
+    avg_comments = total_comments / post_count if post_count else 0.0
+    return {
+        "username": metrics.get("_id"),
+        "follower_count": follower_count,
+        "post_count": post_count,
+        "total_likes": total_likes,
+        "total_comments": total_comments,
+        "avg_likes": avg_likes,
+        "avg_comments": avg_comments,
+        # Average interactions per post as a percentage of followers
+        "engagement_rate": (avg_likes + avg_comments) / follower_count * 100 if follower_count else 0.0,
+        "updated_at": metrics.get("updated_at"),
+    }
+
+
+def guarded_update(crawl_id, inc, fields):
+    """Pipeline update adding `inc` and setting `fields`, unless the document already took crawl `crawl_id`."""
+    applied = {"$eq": ["$applied_crawl", crawl_id]}
+    stage = {name: {"$add": [{"$ifNull": [f"${name}", 0]}, {"$cond": [applied, 0, delta]}]}
+             for name, delta in inc.items()}
+    stage.update({name: {"$literal": value} for name, value in fields.items()})
+    stage["applied_crawl"] = crawl_id
+    return [{"$set": stage}]
+
+
+class EngagementTracker:
+    """Turn post upserts into $inc deltas on profile_metrics and engagement_rollups.
+
+    Deltas are taken against the counts seen on the previous crawl, so a post
+    is counted once and later crawls only add what changed. New and changed
+    posts, and the profile's follower count, are also snapshotted into
+    src.analysis.timeseries (unless TIMESERIES_ENABLED is off); an unchanged
+    post adds no sample, as its last one still holds.
+    """
+
+    def __init__(self, writer, snapshots=TIMESERIES_ENABLED):
+        self.writer = writer
+        self.snapshots = SnapshotRecorder(writer) if snapshots else None
+        self._totals = defaultdict(lambda: {"post_count": 0, "total_likes": 0, "total_comments": 0})
+        self._rollups = defaultdict(lambda: {"posts": 0, "likes": 0, "comments": 0})
+
+    def record_post(self, username, post, seen_posts=None):
+        previous = (seen_posts or {}).get(post["id"])
+        is_new = previous is None
+        previous = previous or {}
+        likes = (post.get("like_count") or 0) - (previous.get("like_count") or 0)
+        comments = (post.get("comment_count") or 0) - (previous.get("comment_count") or 0)
+        if not (is_new or likes or comments):
+            return
+        if self.snapshots is not None:
+            self.snapshots.record_post(username, post)
+
+        totals = self._totals[username]
+        totals["post_count"] += is_new
+        totals["total_likes"] += likes
+        totals["total_comments"] += comments
+        for period, bucket in period_buckets(post.get("timestamp")).items():
+            rollup = self._rollups[(username, period, bucket)]
+            rollup["posts"] += is_new
+            rollup["likes"] += likes
+            rollup["comments"] += comments
+
+    def record_profile(self, username, follower_count, posts, seen_posts=None, state=None, state_id=None):
+        for post in posts:
+            self.record_post(username, post, seen_posts)
+        self.finish_profile(username, follower_count, state, state_id)
+
+    def finish_profile(self, username, follower_count, state=None, state_id=None):
+        """Queue the accumulated deltas for `username` on the writer.
+
+        Given the profile's crawl_state document, the deltas are recorded in
+        it as `pending_metrics` and it is queued first (under `state_id`,
+        default `username`); the writer sends crawl_state before the deltas,
+        so a crash in between is repaired by `replay` on the next crawl.
+        """
+        totals = self._totals.pop(username, {"post_count": 0, "total_likes": 0, "total_comments": 0})
+        updates = [["profile_metrics", username, totals,
+                    {"follower_count": follower_count, "updated_at": datetime.now(timezone.utc)}]]
+        for key in [key for key in self._rollups if key[0] == username]:
+            _, period, bucket = key
+            updates.append(["engagement_rollups", f"{username}:{period}:{bucket}", self._rollups.pop(key),
+                            {"username": username, "period": period, "bucket": bucket}])
+        pending = {"crawl_id": uuid.uuid4().hex, "updates": updates}
+        if state is not None:
+            state["pending_metrics"] = pending
+            self.writer.add_crawl_state(state_id or username, state)
+        self._queue(pending["crawl_id"], updates)
+        if self.snapshots is not None:
+            self.snapshots.finish_profile(username, follower_count)
+
+    def replay(self, pending):
+        """Apply a stored crawl's `pending_metrics` wherever they did not land, and write them out now.
+
+        Documents that already took the crawl are skipped (the update itself
+        checks again), and the writer is flushed so a newer crawl's deltas
+        cannot reach a document first.
+        """
+        if not pending:
+            return 0
+        crawl_id, missing = pending["crawl_id"], []
+        by_collection = defaultdict(list)
+        for update in pending["updates"]:
+            by_collection[update[0]].append(update)
+        for collection, updates in by_collection.items():
+            applied = {document["_id"] for document in self.writer.db[collection].find(
+                {"_id": {"$in": [update[1] for update in updates]}, "applied_crawl": crawl_id}, {"_id": 1})}
+            missing.extend(update for update in updates if update[1] not in applied)
+        if missing:
+            self._queue(crawl_id, missing)
+            self.writer.flush()
+        return len(missing)
+
+    def _queue(self, crawl_id, updates):
+        for collection, _id, inc, fields in updates:
+            self.writer.add_update(collection, {"_id": _id}, guarded_update(crawl_id, inc, fields))
+
+    def discard(self, username):
+        """Drop deltas for a profile whose crawl failed; its posts count as new next time."""
+        self._totals.pop(username, None)
+        for key in [key for key in self._rollups if key[0] == username]:
+            del self._rollups[key]
+        if self.snapshots is not None:
+            self.snapshots.discard(username)
+
+
+def get_profile_metrics(username):
+    """Precomputed engagement numbers for one profile, or None."""
+    metrics = get_db().profile_metrics.find_one({"_id": username})
+    return engagement_summary(metrics) if metrics else None
+
+
+def get_rollups(username, period="day", since=None):
+    """Per-day or per-week rollups for a profile, oldest first."""
+    query = {"username": username, "period": period}
+    if since:
+        query["bucket"] = {"$gte": since}
+    return list(get_db().engagement_rollups.find(query, {"_id": 0, "applied_crawl": 0}).sort("bucket", 1))
+
+
+def rebuild_metrics():
+    """Recompute every aggregate from the posts and profiles collections."""
+    db = get_db()
+    # The rebuilt documents already include every recorded crawl
+    db.crawl_state.update_many({"pending_metrics": {"$exists": True}}, {"$unset": {"pending_metrics": ""}})
+    db.posts.aggregate([
+        {"$group": {"_id": "$username", "post_count": {"$sum": 1},
+                    "total_likes": {"$sum": {"$ifNull": ["$like_count", 0]}},
+                    "total_comments": {"$sum": {"$ifNull": ["$comment_count", 0]}}}},
+        {"$lookup": {"from": "profiles", "localField": "_id", "foreignField": "username", "as": "profile"}},
+        {"$set": {"follower_count": {"$first": "$profile.follower_count"}, "updated_at": "$$NOW"}},
+        {"$unset": "profile"},
+        {"$out": "profile_metrics"},
+    ])
+
+    db.engagement_rollups.delete_many({})
+    for period, fmt in (("day", "%Y-%m-%d"), ("week", "%G-W%V")):
+        db.posts.aggregate([
+            {"$match": {"timestamp": {"$type": "number"}}},
+            {"$set": {"bucket": {"$dateToString": {"format": fmt, "date": {"$toDate": {"$multiply": ["$timestamp", 1000]}}}}}},
+            {"$group": {"_id": {"username": "$username", "bucket": "$bucket"}, "posts": {"$sum": 1},
+                        "likes": {"$sum": {"$ifNull": ["$like_count", 0]}},
+                        "comments": {"$sum": {"$ifNull": ["$comment_count", 0]}}}},
+            {"$project": {"_id": {"$concat": ["$_id.username", f":{period}:", "$_id.bucket"]},
+                          "username": "$_id.username", "period": {"$literal": period}, "bucket": "$_id.bucket",
+                          "posts": 1, "likes": 1, "comments": 1}},
+            {"$merge": {"into": "engagement_rollups", "whenMatched": "replace"}},
+        ])
+
+
+if __name__ == "__main__":
+    print("Rebuilding engagement metrics from posts...")
+    rebuild_metrics()
+    print("Done.")
@@ -0,0 +1,133 @@
+"""
+Vectorized roster analytics.
+Loads profiles and posts with column projections into pandas DataFrames and
+computes engagement rate, like/comment distributions, posting cadence and
+outlier posts for the whole roster with grouped NumPy operations, no
+per-post Python loops.
+"""
+import numpy as np
+import pandas as pd
+
+from src.config.settings import SNAPSHOT_DIR
+from src.database.export import load_snapshot
+
+try:
+    # Decodes BSON straight into Arrow columns when installed
+    from pymongoarrow.api import find_pandas_all
+except ImportError:
+    find_pandas_all = None
+
+PROFILE_FIELDS = ["username", "follower_count"]
+POST_FIELDS = ["_id", "username", "like_count", "comment_count", "timestamp"]
+
+# Posts whose robust z-score exceeds this are flagged as outliers
+OUTLIER_Z = 3.5
+
+
+def load_columns(collection, fields, query=None, batch_size=10000):
+    """Read only `fields` from a collection into a DataFrame, column by column."""
+    if find_pandas_all is not None:
+        return find_pandas_all(collection, query or {}, projection={field: 1 for field in fields})[fields]
+    columns = {field: [] for field in fields}
+    cursor = collection.find(query or {}, {field: 1 for field in fields}, batch_size=batch_size)
+    for document in cursor:
+        for field, values in columns.items():
+            values.append(document.get(field))
+    return pd.DataFrame(columns)
+
+
+def load_frames(db):
+    """Return (profiles, posts) DataFrames with numeric columns as NumPy dtypes."""
+    profiles = load_columns(db.profiles, PROFILE_FIELDS)
+    posts = load_columns(db.posts, POST_FIELDS, {"username": {"$ne": None}})
+    return normalize_frames(profiles, posts)
+
+
+def load_snapshot_frames(root=SNAPSHOT_DIR):
+    """Like load_frames, but from the Parquet snapshots written by src.database.export."""
+    profiles = load_snapshot("profiles", columns=["date", *PROFILE_FIELDS], root=root)
+    posts = load_snapshot("posts", columns=["exported_at", *POST_FIELDS], root=root)
+    # Appended snapshots can hold several rows per key; keep the newest
+    profiles = profiles.sort_values("date", kind="stable").drop_duplicates("username", keep="last")
+    posts = posts.sort_values("exported_at", kind="stable").drop_duplicates("_id", keep="last")
+    profiles["username"] = profiles["username"].astype(str)
+    posts = posts.dropna(subset=["username"]).astype({"username": str})
+    return normalize_frames(profiles[PROFILE_FIELDS].reset_index(drop=True), posts[POST_FIELDS].reset_index(drop=True))
+
+
+def normalize_frames(profiles, posts):
+    profiles["follower_count"] = pd.to_numeric(profiles["follower_count"], errors="coerce").fillna(0).astype("int64")
+    for column in ("like_count", "comment_count"):
+        posts[column] = pd.to_numeric(posts[column], errors="coerce").fillna(0).astype("int64")
+    posts["timestamp"] = pd.to_numeric(posts["timestamp"], errors="coerce")
+    return profiles, posts
+
+
+def flag_outliers(posts, threshold=OUTLIER_Z):
+    """Add `engagement`, `robust_z` and `is_outlier` columns, scored within each profile.
+
+    Uses the median absolute deviation so a single viral post does not hide itself
+    by inflating the spread.
+    """
+    posts = posts.copy()
+    posts["username"] = posts["username"].astype("category")
+    posts["engagement"] = posts["like_count"] + posts["comment_count"]
+    grouped = posts.groupby("username", observed=True)["engagement"]
+    median = grouped.transform("median")
+    mad = (posts["engagement"] - median).abs().groupby(posts["username"], observed=True).transform("median")
+    posts["robust_z"] = np.where(mad > 0, 0.6745 * (posts["engagement"] - median) / mad.where(mad > 0, 1), 0.0)
+    posts["is_outlier"] = np.abs(posts["robust_z"]) > threshold
+    return posts
+
+
+def posting_cadence(posts):
+    """Per-profile gaps between consecutive posts (hours) and posts per week."""
+    timed = posts.dropna(subset=["timestamp"]).sort_values(["username", "timestamp"])
+    by_user = timed.groupby("username", observed=True)["timestamp"]
+    gaps = by_user.diff() / 3600.0
+    cadence = gaps.groupby(timed["username"], observed=True).agg(["mean", "median"])
+    cadence.columns = ["mean_gap_hours", "median_gap_hours"]
+    bounds = by_user.agg(["min", "max", "size"])
+    span, counts = bounds["max"] - bounds["min"], bounds["size"]
+    weeks = span / (7 * 24 * 3600.0)
+    cadence["posts_per_week"] = np.where(weeks > 0, counts / weeks.where(weeks > 0, 1), np.nan)
+    return cadence
+
+
+def roster_metrics(profiles, posts):
+    """One row per profile with engagement, distribution, cadence and outlier columns."""
+    # Group on category codes instead of re-hashing username strings for every aggregate
+    scored = flag_outliers(posts)
+    grouped = scored.groupby("username", observed=True)
+    metrics = grouped.agg(
+        post_count=("engagement", "size"),
+        total_likes=("like_count", "sum"),
+        total_comments=("comment_count", "sum"),
+        avg_likes=("like_count", "mean"),
+        median_likes=("like_count", "median"),
+        avg_comments=("comment_count", "mean"),
+        median_comments=("comment_count", "median"),
+        std_engagement=("engagement", "std"),
+        outlier_posts=("is_outlier", "sum"),
+    )
+    p90 = grouped[["like_count", "comment_count"]].quantile(0.9)
+    metrics["p90_likes"] = p90["like_count"]
+    metrics["p90_comments"] = p90["comment_count"]
+    metrics = metrics.join(posting_cadence(scored))
+    metrics.index = metrics.index.astype(str)
+    metrics = profiles.drop_duplicates("username").set_index("username").join(metrics, how="inner")
+
+    followers = metrics["follower_count"].to_numpy(dtype="float64")
+    interactions = (metrics["avg_likes"] + metrics["avg_comments"]).to_numpy()
+    metrics["engagement_rate"] = np.divide(interactions, followers, out=np.zeros_like(followers), where=followers > 0) * 100
+    metrics["engagement_rate_percentile"] = metrics["engagement_rate"].rank(pct=True) * 100
+    return metrics.reset_index(), scored.loc[scored["is_outlier"]]
+
+
+def to_documents(frame):
+    """Convert a DataFrame to Mongo-ready dicts (NaN -> None, NumPy scalars -> Python)."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return [
+        {key: value.item() if isinstance(value, np.generic) else value for key, value in row.items()}
+        for row in frame.to_dict("records")
+    ]
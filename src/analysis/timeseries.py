@@ -0,0 +1,173 @@
+"""
+Engagement history as bucketed time series.
+Crawls overwrite like, comment and follower counts in place, so each crawl
+also snapshots them here. Raw samples are appended to one document per post
+or profile per day (`metric_snapshots`), and the same write folds them into
+hourly and daily rollups (`metric_rollups`) that keep the first, last, min
+and max of every metric in the bucket. TTL indexes drop raw buckets after
+TIMESERIES_RAW_DAYS and hourly rollups after TIMESERIES_HOURLY_DAYS; daily
+rollups are kept. Trend and velocity queries read a few rollup documents
+instead of raw samples.
+
+    python -m src.analysis.timeseries taylorswift --hours 24
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, DESCENDING
+
+from src.config.db import get_db
+from src.config.settings import TIMESERIES_HOURLY_DAYS, TIMESERIES_RAW_DAYS
+
+# kind -> {metric name: field on the crawled record}
+METRICS = {
+    "post": {"likes": "like_count", "comments": "comment_count"},
+    "profile": {"followers": "follower_count"},
+}
+RESOLUTIONS = ("hour", "day")
+
+
+def bucket_start(at, resolution):
+    """Start of the hour or day containing `at`."""
+    if resolution == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _utc(value):
+    # Mongo hands back naive UTC datetimes
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def snapshot_values(kind, record):
+    """{metric: value} for the counts present on a crawled post or profile."""
+    return {name: record[field] for name, field in METRICS[kind].items() if record.get(field) is not None}
+
+
+def snapshot_updates(kind, key, username, values, at):
+    """(collection, filter, update) upserts that append one snapshot and fold it into every rollup."""
+    key = str(key)
+    owner = {"kind": kind, "key": key, "username": username}
+    updates = []
+    if TIMESERIES_RAW_DAYS:
+        day = bucket_start(at, "day")
+        updates.append(("metric_snapshots", {"_id": f"{kind}:{key}:{day:%Y-%m-%d}"}, {
+            "$push": {"samples": {"t": at, **values}},
+            "$inc": {"count": 1},
+            # A day's bucket outlives its last sample by the full retention
+            "$setOnInsert": {**owner, "start": day, "expires_at": day + timedelta(days=TIMESERIES_RAW_DAYS + 1)},
+        }))
+    for resolution in RESOLUTIONS:
+        start = bucket_start(at, resolution)
+        insert = {**owner, "resolution": resolution, "start": start,
+                  **{f"first.{name}": value for name, value in values.items()}}
+        if resolution == "hour" and TIMESERIES_HOURLY_DAYS:
+            insert["expires_at"] = start + timedelta(days=TIMESERIES_HOURLY_DAYS)
+        updates.append(("metric_rollups", {"_id": f"{kind}:{key}:{resolution}:{start:%Y-%m-%dT%H}"}, {
+            "$setOnInsert": insert,
+            "$set": {f"last.{name}": value for name, value in values.items()},
+            "$min": {"t_first": at, **{f"min.{name}": value for name, value in values.items()}},
+            "$max": {"t_last": at, **{f"max.{name}": value for name, value in values.items()}},
+            "$inc": {"samples": 1},
+        }))
+    return updates
+
+
+class SnapshotRecorder:
+    """Queue time-series snapshots on a BulkWriter, one profile at a time.
+
+    Like EngagementTracker, a profile's snapshots are held until
+    `finish_profile` and dropped by `discard` when its crawl fails.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self._pending = defaultdict(list)  # username -> [(kind, key, values, at)]
+
+    def record_post(self, username, post, at=None):
+        values = snapshot_values("post", post)
+        if values:
+            self._pending[username].append(("post", post["id"], values, at or datetime.now(timezone.utc)))
+
+    def finish_profile(self, username, follower_count, at=None):
+        at = at or datetime.now(timezone.utc)
+        if follower_count is not None:
+            self._pending[username].append(("profile", username, {"followers": follower_count}, at))
+        for kind, key, values, sampled_at in self._pending.pop(username, []):
+            for collection, filter, update in snapshot_updates(kind, key, username, values, sampled_at):
+                self.writer.add_update(collection, filter, update)
+
+    def discard(self, username):
+        self._pending.pop(username, None)
+
+
+# --- Queries ---
+
+def find_series(kind, key, resolution="day", since=None):
+    """Cursor over a series' rollups, oldest first."""
+    query = {"kind": kind, "key": str(key), "resolution": resolution}
+    if since is not None:
+        query["start"] = {"$gte": bucket_start(since, resolution)}
+    return get_db().metric_rollups.find(query, {"_id": 0}).sort("start", ASCENDING)
+
+
+def trend(kind, key, metric, resolution="day", since=None):
+    """[(bucket start, last value)] for one metric, oldest first."""
+    return [(_utc(row["start"]), row["last"][metric])
+            for row in find_series(kind, key, resolution, since) if metric in row.get("last", {})]
+
+
+def _edge(kind, key, resolution, query, direction):
+    rows = get_db().metric_rollups.find({"kind": kind, "key": str(key), "resolution": resolution, **query},
+                                        {"first": 1, "last": 1, "t_first": 1, "t_last": 1})
+    return next(iter(rows.sort("start", direction).limit(1)), None)
+
+
+def velocity(kind, key, metric, hours=24, now=None):
+    """Change in `metric` per hour over the last `hours`, or None without two samples.
+
+    Reads at most three rollups: the latest one, and as a baseline the last
+    bucket before the window (or else the first inside it).
+    """
+    now = now or datetime.now(timezone.utc)
+    resolution = "hour" if hours <= 72 else "day"
+    window = bucket_start(now - timedelta(hours=hours), resolution)
+    latest = _edge(kind, key, resolution, {}, DESCENDING)
+    if latest is None or metric not in latest.get("last", {}):
+        return None
+    before = _edge(kind, key, resolution, {"start": {"$lt": window}}, DESCENDING)
+    if before is not None and metric in before.get("last", {}):
+        value, since = before["last"][metric], before["t_last"]
+    else:
+        first = _edge(kind, key, resolution, {"start": {"$gte": window}}, ASCENDING)
+        if first is None or metric not in first.get("first", {}):
+            return None
+        value, since = first["first"][metric], first["t_first"]
+    elapsed = (_utc(latest["t_last"]) - _utc(since)).total_seconds() / 3600
+    return (latest["last"][metric] - value) / elapsed if elapsed > 0 else None
+
+
+def raw_samples(kind, key, since=None):
+    """Raw samples still within retention, oldest first."""
+    query = {"kind": kind, "key": str(key)}
+    if since is not None:
+        query["start"] = {"$gte": bucket_start(since, "day")}
+    samples = []
+    for bucket in get_db().metric_snapshots.find(query, {"samples": 1}).sort("start", ASCENDING):
+        samples.extend(sample for sample in bucket["samples"] if since is None or _utc(sample["t"]) >= since)
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Follower trend and growth for a profile.")
+    parser.add_argument("username")
+    parser.add_argument("--hours", type=int, default=24, help="Window for the growth rate")
+    parser.add_argument("--days", type=int, default=30, help="Days of daily follower counts to show")
+    args = parser.parse_args()
+
+    since = datetime.now(timezone.utc) - timedelta(days=args.days)
+    for start, followers in trend("profile", args.username, "followers", "day", since):
+        print(f"{start:%Y-%m-%d}  {followers:>12,}")
+    rate = velocity("profile", args.username, "followers", args.hours)
+    print(f"📈 {rate:+,.1f} followers/hour over {args.hours}h" if rate is not None else "No follower history yet.")
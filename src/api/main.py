@@ -1,6 +1,7 @@
 import sys
 import os
 import json
+import argparse
 from dotenv import load_dotenv
 
 # Add project root to path to fix imports
@@ -10,44 +11,100 @@ sys.path.append(project_root)
 # Load environment variables
 load_dotenv()
 
-from src.scraper.fetch_data import fetch_instagram_data
-from src.scraper.save_to_db import save_profile, save_posts, save_comments
-from src.config.db import get_db  # MongoDB connection
+from src.scraper.fetch_engine import FetchEngine
+from src.scraper.fetch_data import client as api_client
+from src.scraper.save_to_db import BulkWriter
+from src.scraper.crawl_state import load_crawl_state, build_crawl_state
+from src.scraper.checkpoints import CrawlJob
+from src.scraper.rate_limit import QuotaExhausted
+from src.analysis.engagement import EngagementTracker
+from src.config.settings import INCREMENTAL_CRAWL
+from src.config.db import ping_mongo  # MongoDB connection
+from src.database.indexes import ensure_indexes
+from src.utils.logger import get_logger
+from src.utils import metrics
+
+log = get_logger("src.api.main")
 
 def main():
     """Main function to fetch Instagram data including comments."""
+    parser = argparse.ArgumentParser(description="Fetch Instagram profiles, posts and comments.")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-fetch comments for every post instead of only new or changed ones")
+    parser.add_argument("--job", help="Name of a resumable crawl job; a restart skips accounts already saved")
+    args = parser.parse_args()
+    incremental = INCREMENTAL_CRAWL and not args.full
+
     usernames = ["taylorswift", "zuck", "cristiano"]
 
-    db = get_db()  # MongoDB connection
-    if db is None:  # ✅ Explicitly check if db is None
-        print("❌ Failed to connect to MongoDB. Exiting.")
+    metrics.serve()
+    job = CrawlJob(args.job) if args.job else None
+    if job is not None:
+        job.add_accounts(usernames)
+        usernames = job.pending_accounts()
+        log.info("📋 Resuming job", extra={"fields": {"job": args.job, "accounts_left": len(usernames), **job.progress()}})
+
+    mongo = ping_mongo()  # Opens this process's pooled client
+    if not mongo["ok"]:
+        log.error("❌ Failed to connect to MongoDB. Exiting.", extra={"fields": {"error": mongo["error"]}})
         return
+    ensure_indexes()
 
-    try:
-        for username in usernames:
-            print(f"📌 Fetching data for {username}...")
-            data = fetch_instagram_data(username)
+    writer = BulkWriter()
+    tracker = EngagementTracker(writer)
 
+    # Last crawl's post counts drive both comment skipping and the metric deltas
+    states = {}
+    def seen_posts(username):
+        states[username] = load_crawl_state(username)
+        return states[username].get("posts", {}) if incremental else None
+
+    try:
+        log.info("📌 Fetching profiles",
+                 extra={"fields": {"profiles": len(usernames), "mode": "incremental" if incremental else "full"}})
+        for username, data in FetchEngine().iter_fetch(usernames, seen_posts):
             if data["status"] == "success":
-                print(f"✅ Profile data fetched for {username}")
-                print(f"✅ {len(data['posts'])} posts fetched for {username}")
+                skipped = sum(1 for post in data["posts"] if "comments" not in post)
+                log.info("✅ Profile and posts fetched",
+                         extra={"fields": {"username": username, "posts": len(data["posts"]), "comments_skipped": skipped}})
 
                 if len(data["posts"]) > 0:
-                    print("📝 Sample post data:", data["posts"][0])  # Debugging
-
-                # Save profile and posts
-                save_profile(data)
-                save_posts(data["username"], data["posts"])
+                    log.debug("📝 Sample post data", extra={"fields": {"post": data["posts"][0]}})
 
-                # Save comments separately
-                for post in data["posts"]:
-                    save_comments(post["id"], post["comments"])
+                # Queue profile and posts (comments ride along with each post)
+                writer.add_profile(data)
+                writer.add_posts(data["username"], data["posts"])
+                state = states.pop(username, {})
+                tracker.replay(state.get("pending_metrics"))
+                # Queues crawl_state too, ahead of the deltas it records
+                tracker.record_profile(data["username"], data["follower_count"], data["posts"],
+                                       state.get("posts"), build_crawl_state(data), username)
+                if job is not None:
+                    writer.flush()  # Checkpoint only what is already written
+                    job.finish_account(username)
 
-                print(f"✅ Data successfully saved for {username}\n")
+                log.info("✅ Data queued for saving", extra={"fields": {"username": username}})
             else:
-                print(f"❌ Failed to fetch {username}: {data.get('message', 'Unknown error')}")
+                log.error("❌ Failed to fetch profile",
+                          extra={"fields": {"username": username, "error": data.get("message", "Unknown error")}})
+                states.pop(username, None)
+                if job is not None:
+                    job.fail_account(username, data.get("message"))
+    except QuotaExhausted as e:
+        # Accounts not saved yet stay pending in the job for the next run
+        log.warning("⏸️ API quota exhausted, stopping", extra={"fields": {"error": str(e)}})
     except Exception as e:
-        print(f"❌ Error occurred: {e}")
+        log.exception("❌ Error occurred", extra={"fields": {"error": str(e)}})
+    finally:
+        writer.flush()
+        metrics.write_textfile(process="refresh")
+        totals = writer.totals()
+        print(f"💾 {totals['operations']} upserts in {totals['batches']} batches "
+              f"(matched {totals['matched']}, upserted {totals['upserted']}, errors {totals['errors']})")
+        stats = api_client.stats()
+        print(f"📊 {stats['requests']} API requests over {stats['connections_opened']} connections "
+              f"({stats['handshakes_avoided']} handshakes avoided, avg {stats['avg_latency_ms']} ms, "
+              f"{stats['retries']} retries, {stats['throttled']} throttled)")
 
 if __name__ == "__main__":
     main()
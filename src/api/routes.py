@@ -0,0 +1,162 @@
+"""
+HTTP endpoints for stored Instagram data.
+Queries come from src.database.queries, run on the app's Motor database.
+Small responses are serialized once and kept for API_RESPONSE_TTL seconds
+with an ETag, so a repeat request is a cache lookup (or a 304). Large post
+lists are streamed straight from the cursor.
+"""
+import hashlib
+import json
+import time
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+
+from src.config.settings import API_MAX_COMMENTS, API_MAX_POSTS, API_RESPONSE_TTL, API_STREAM_THRESHOLD
+from src.database import queries
+from src.database.cache import LRUCache, MISSING
+from src.scraper.media import MediaStore
+from src.utils import metrics
+
+try:
+    import orjson
+
+    def dumps(value):
+        return orjson.dumps(value, default=str)
+except ImportError:
+    def dumps(value):
+        return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+router = APIRouter()
+
+# path + query string -> (body, etag); per worker process
+responses = LRUCache()
+
+
+def etag_for(body):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def not_modified(request, etag):
+    """True if the request's If-None-Match already names `etag`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+async def cached_json(request, build):
+    """Serve the JSON for `request` from the response cache, building it with `await build()` on a miss."""
+    key = request.url.path + "?" + request.url.query
+    cached = responses.get(key)
+    if cached is MISSING:
+        body = dumps(await build())
+        cached = (body, etag_for(body))
+        responses.set(key, cached, API_RESPONSE_TTL)
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": f"max-age={int(API_RESPONSE_TTL)}"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def stream_posts(cursor, username, limit):
+    """Yield {"username", "posts": [...], "next_cursor"} as JSON, one post at a time."""
+    yield b'{"username":' + dumps(username) + b',"posts":['
+    last, sent = None, 0
+    async for post in cursor:
+        if sent == limit:
+            # The limit+1th row only proves there is another page
+            token = queries.encode_cursor([last.get("timestamp"), last["_id"]])
+            yield b'],"next_cursor":' + dumps(token) + b"}"
+            return
+        yield (b"," if sent else b"") + dumps(post)
+        last, sent = post, sent + 1
+    yield b'],"next_cursor":null}'
+
+
+@router.get("/info/{username}")
+async def info(username: str, request: Request):
+    """Fetch profile data."""
+    database = request.app.state.db
+
+    async def build():
+        profile = await queries.find_profile_by_username(username, database).to_list(1)
+        if not profile:
+            raise HTTPException(status_code=404, detail=f"Profile not found: {username}")
+        return profile[0]
+
+    return await cached_json(request, build)
+
+
+@router.get("/posts/{username}")
+async def posts(username: str, request: Request, limit: int = Query(15, ge=1, le=API_MAX_POSTS),
+                cursor: str | None = None):
+    """Get a page of posts (oldest first) with their engagement counts; pass `next_cursor` back for the next page."""
+    database = request.app.state.db
+    try:
+        found = queries.find_posts_page(username, limit, cursor, database)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if limit > API_STREAM_THRESHOLD:
+        return StreamingResponse(stream_posts(found, username, limit), media_type="application/json")
+
+    async def build():
+        rows, next_token = queries.next_cursor(await found.to_list(limit + 1), limit, "timestamp")
+        return {"username": username, "posts": rows, "next_cursor": next_token}
+
+    return await cached_json(request, build)
+
+
+@router.get("/comments/{post_id}")
+async def comments(post_id: str, request: Request, limit: int = Query(50, ge=1, le=API_MAX_COMMENTS),
+                   cursor: str | None = None):
+    """Fetch a page of comments for a post; pass `next_cursor` back for the next page."""
+    database = request.app.state.db
+    try:
+        found = queries.find_comments_page(post_id, limit, cursor, database)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    async def build():
+        rows, next_token = queries.next_cursor(await found.to_list(limit + 1), limit)
+        return {"post_id": post_id, "comments": rows, "next_cursor": next_token}
+
+    return await cached_json(request, build)
+
+
+_media_store = None
+
+
+@router.get("/media")
+def media(url: str = Query(..., description="Original CDN URL of a profile picture, thumbnail or tweet media")):
+    """The locally stored copy of a media URL (404 until src.scraper.media has downloaded it)."""
+    global _media_store
+    if _media_store is None:
+        _media_store = MediaStore()
+    path = _media_store.path_for(url)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Media not downloaded")
+    # Files are named by content hash, so a path never changes content
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=86400"})
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """This worker's metrics in Prometheus text format (404 unless METRICS_ENABLED)."""
+    if not metrics.REGISTRY:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/health", include_in_schema=False)
+async def health(request: Request):
+    """Round-trip this worker's Mongo pool; 503 when it cannot reach the server."""
+    start = time.perf_counter()
+    try:
+        await request.app.state.db.command("ping")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"MongoDB unreachable: {e}")
+    return {"mongo": {"ok": True, "ms": round((time.perf_counter() - start) * 1000, 2)}}
@@ -0,0 +1,42 @@
+"""
+Async API server for the endpoints in src.api.routes.
+
+    python -m src.api.server               # or: uvicorn src.api.server:app --workers 4
+
+Each worker process opens its own pooled Motor client on startup.
+"""
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from src.api.routes import router
+from src.config.db import DB_URI, DB_NAME
+from src.config.settings import (API_MONGO_POOL_SIZE, API_WORKERS, APP_PORT, MONGO_MAX_IDLE_MS, MONGO_MIN_POOL_SIZE,
+                                 MONGO_TIMEOUT_MS)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    client = AsyncIOMotorClient(DB_URI, maxPoolSize=API_MONGO_POOL_SIZE, minPoolSize=MONGO_MIN_POOL_SIZE,
+                                maxIdleTimeMS=MONGO_MAX_IDLE_MS, serverSelectionTimeoutMS=MONGO_TIMEOUT_MS)
+    app.state.db = client[DB_NAME]
+    yield
+    client.close()
+
+
+def create_app():
+    app = FastAPI(title="Instagram Engagement API", lifespan=lifespan)
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+    app.include_router(router)
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("src.api.server:app", host="0.0.0.0", port=APP_PORT, workers=API_WORKERS, access_log=False)
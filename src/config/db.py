@@ -1,14 +1,154 @@
+"""
+Lazily opened, per-process MongoDB and MySQL connections.
+Nothing connects (or imports a driver) at import time: the first
+`get_db()` or `mysql_connection()` in a process opens a pooled client that
+every later call in that process reuses. Clients are tagged with the pid
+that opened them, so a forked worker opens its own pool on first use
+instead of sharing the parent's sockets.
+
+    db = get_db()                      # pymongo Database, pooled per process
+    conn = mysql_connection()          # from a per-process MySQL pool; close() returns it
+    health()                           # {"mongo": {"ok": True, "ms": 0.8}, ...}
+"""
 import os
+import threading
+import time
+
 from dotenv import load_dotenv
-from pymongo import MongoClient
+
+from src.config.settings import (
+    MONGO_MAX_IDLE_MS,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_POOL_SIZE,
+    MONGO_TIMEOUT_MS,
+    MYSQL_DATABASE,
+    MYSQL_HOST,
+    MYSQL_PASSWORD,
+    MYSQL_POOL_SIZE,
+    MYSQL_PORT,
+    MYSQL_USER,
+)
 
 load_dotenv()
 
 DB_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("MONGO_DB_NAME", "instagram_db")
 
-client = MongoClient(DB_URI)
-db = client[DB_NAME]
+_lock = threading.Lock()
+_mongo = None  # (pid, MongoClient, Database)
+_mysql = None  # (pid, MySQLConnectionPool)
+_override = None  # Database installed by use_database()
+
+
+def get_client():
+    """This process's MongoClient, opened on first use."""
+    global _mongo
+    state = _mongo
+    if state is None or state[0] != os.getpid():
+        with _lock:
+            state = _mongo
+            if state is None or state[0] != os.getpid():
+                from pymongo import MongoClient
+
+                # A client inherited across fork is dropped, not closed: its sockets belong to the parent
+                client = MongoClient(DB_URI, maxPoolSize=MONGO_POOL_SIZE, minPoolSize=MONGO_MIN_POOL_SIZE,
+                                     maxIdleTimeMS=MONGO_MAX_IDLE_MS, connectTimeoutMS=MONGO_TIMEOUT_MS,
+                                     serverSelectionTimeoutMS=MONGO_TIMEOUT_MS)
+                state = _mongo = (os.getpid(), client, client[DB_NAME])
+    return state[1]
+
 
 def get_db():
-    return db
\ No newline at end of file
+    """The application database on this process's client (or the one set by use_database)."""
+    if _override is not None:
+        return _override
+    state = _mongo
+    if state is None or state[0] != os.getpid():
+        get_client()
+        state = _mongo
+    return state[2]
+
+
+def use_database(database):
+    """Make `get_db()` return `database` (e.g. a test database); None restores the default."""
+    global _override
+    _override = database
+
+
+def _mysql_pool():
+    global _mysql
+    state = _mysql
+    if state is None or state[0] != os.getpid():
+        with _lock:
+            state = _mysql
+            if state is None or state[0] != os.getpid():
+                from mysql.connector import pooling
+
+                pool = pooling.MySQLConnectionPool(pool_name=f"insta-{os.getpid()}", pool_size=MYSQL_POOL_SIZE,
+                                                   host=MYSQL_HOST, port=MYSQL_PORT, user=MYSQL_USER,
+                                                   password=MYSQL_PASSWORD, database=MYSQL_DATABASE,
+                                                   connection_timeout=max(1, MONGO_TIMEOUT_MS // 1000))
+                state = _mysql = (os.getpid(), pool)
+    return state[1]
+
+
+def mysql_connection():
+    """A connection from this process's MySQL pool; `close()` hands it back.
+
+    The pool reconnects connections that dropped while idle before handing them out.
+    """
+    return _mysql_pool().get_connection()
+
+
+def _timed(check):
+    start = time.perf_counter()
+    try:
+        check()
+        return {"ok": True, "ms": round((time.perf_counter() - start) * 1000, 2)}
+    except Exception as e:
+        return {"ok": False, "ms": round((time.perf_counter() - start) * 1000, 2), "error": str(e)}
+
+
+def ping_mongo():
+    return _timed(lambda: get_db().command("ping"))
+
+
+def ping_mysql():
+    def check():
+        conn = mysql_connection()
+        try:
+            conn.ping(reconnect=False)
+        finally:
+            conn.close()
+
+    return _timed(check)
+
+
+def health(mysql=False):
+    """Round-trip each database; MySQL is only checked when asked (it is the migration source)."""
+    checks = {"mongo": ping_mongo()}
+    if mysql:
+        checks["mysql"] = ping_mysql()
+    return checks
+
+
+def close():
+    """Close this process's clients; the next call opens fresh ones."""
+    global _mongo, _mysql
+    with _lock:
+        if _mongo is not None and _mongo[0] == os.getpid():
+            _mongo[1].close()
+        if _mysql is not None and _mysql[0] == os.getpid():
+            _mysql[1]._remove_connections()
+        _mongo = _mysql = None
+
+
+def _after_fork():
+    global _lock, _mongo, _mysql
+    # The parent may have held the lock mid-fork; the child's clients are opened on first use
+    _lock = threading.Lock()
+    _mongo = _mysql = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
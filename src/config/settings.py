@@ -0,0 +1,111 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Scraper concurrency
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "16"))  # Global cap on in-flight requests
+FETCH_PER_HOST_LIMIT = int(os.getenv("FETCH_PER_HOST_LIMIT", "8"))  # Cap per API host
+
+# HTTP client
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # Seconds to establish a connection
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))  # Seconds to wait for a response
+HTTP_COMPRESSION = os.getenv("HTTP_COMPRESSION", "true").lower() == "true"  # Ask for gzip/deflate bodies
+
+# Rate limiting (0 disables a monthly quota)
+RAPIDAPI_RATE_PER_SEC = float(os.getenv("RAPIDAPI_RATE_PER_SEC", "5"))  # Sustained requests per endpoint
+RAPIDAPI_BURST = int(os.getenv("RAPIDAPI_BURST", "10"))
+RAPIDAPI_MONTHLY_QUOTA = int(os.getenv("RAPIDAPI_MONTHLY_QUOTA", "0"))
+TWITTER_RATE_PER_SEC = float(os.getenv("TWITTER_RATE_PER_SEC", "1"))
+TWITTER_BURST = int(os.getenv("TWITTER_BURST", "1"))
+TWITTER_MONTHLY_QUOTA = int(os.getenv("TWITTER_MONTHLY_QUOTA", "0"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("BACKOFF_BASE", "1"))  # Seconds before the first retry
+BACKOFF_CAP = float(os.getenv("BACKOFF_CAP", "60"))  # Longest single retry wait
+
+# Database writes
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))  # Upserts per bulk_write call
+COMMENT_PREVIEW_SIZE = int(os.getenv("COMMENT_PREVIEW_SIZE", "3"))  # Top comments kept on each post document
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"  # Skip records whose content hash is unchanged
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "100000"))  # Content hashes remembered per process
+DEDUP_CACHE_TTL = float(os.getenv("DEDUP_CACHE_TTL", "86400"))  # Seconds before a remembered hash is re-read
+
+# Incremental crawling: only fetch comments for new posts or posts whose comment_count changed
+INCREMENTAL_CRAWL = os.getenv("INCREMENTAL_CRAWL", "true").lower() == "true"
+
+# Streaming pipeline
+POSTS_MAX_PAGES = int(os.getenv("POSTS_MAX_PAGES", "1"))  # Post pages to follow per profile
+
+# Resumable crawl jobs
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "crawl_jobs.sqlite3")  # SQLite file holding job progress
+
+# Query cache ("memory", "redis" or "none"; redis by default when REDIS_URL is set); TTLs in seconds per query type
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis" if os.getenv("REDIS_URL") else "memory").lower()
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))  # LRU size for the in-process backend
+CACHE_TTL_PROFILE = float(os.getenv("CACHE_TTL_PROFILE", "300"))
+CACHE_TTL_PROFILES = float(os.getenv("CACHE_TTL_PROFILES", "60"))  # Profile lists, pages and searches
+CACHE_TTL_POSTS = float(os.getenv("CACHE_TTL_POSTS", "120"))
+CACHE_TTL_COMMENTS = float(os.getenv("CACHE_TTL_COMMENTS", "120"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Async API server (src.api.server)
+APP_PORT = int(os.getenv("APP_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "4"))  # Worker processes, each with its own Mongo pool
+API_MONGO_POOL_SIZE = int(os.getenv("API_MONGO_POOL_SIZE", "100"))  # Connections per worker
+API_RESPONSE_TTL = float(os.getenv("API_RESPONSE_TTL", "30"))  # Seconds a serialized response is reused
+API_STREAM_THRESHOLD = int(os.getenv("API_STREAM_THRESHOLD", "100"))  # Larger post pages are streamed
+API_MAX_POSTS = int(os.getenv("API_MAX_POSTS", "10000"))  # Largest allowed ?limit= for /posts
+API_MAX_COMMENTS = int(os.getenv("API_MAX_COMMENTS", "500"))  # Largest allowed ?limit= for /comments (not streamed)
+
+# Database connections (src.config.db), opened lazily and once per process
+MONGO_POOL_SIZE = int(os.getenv("MONGO_POOL_SIZE", "50"))  # Max pooled connections per process
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))  # Connections kept warm
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "300000"))  # Idle pooled connections are closed after this
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))  # Connect and server selection timeout
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "4"))  # Pooled MySQL connections per process (max 32)
+TWITTER_DB_NAME = os.getenv("TWITTER_DB_NAME", os.getenv("MONGO_DB_NAME", "twitter_data"))  # Holds user_<id>_apiv2 tweets
+
+# MySQL source for src.database.migration
+MYSQL_HOST = os.getenv("DB_HOST", "127.0.0.1")
+MYSQL_PORT = int(os.getenv("DB_PORT", "3306"))
+MYSQL_USER = os.getenv("DB_USER", "root")
+MYSQL_PASSWORD = os.getenv("DB_PASSWORD", "")
+MYSQL_DATABASE = os.getenv("DB_NAME", "insta_engagement")
+MIGRATION_WORKERS = int(os.getenv("MIGRATION_WORKERS", "4"))  # Worker processes, each streaming key ranges
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))  # Rows per fetch, bulk write and checkpoint
+
+# Parquet snapshots (src.database.export)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "50000"))  # Documents per Arrow batch / write
+
+# Crawl scheduler (src.scraper.scheduler)
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))  # Crawler processes sharing one rate budget
+SCHEDULER_TICK = float(os.getenv("SCHEDULER_TICK", "30"))  # Seconds between re-planning the queue
+REFRESH_MIN_HOURS = float(os.getenv("REFRESH_MIN_HOURS", "1"))  # Shortest refresh interval (busiest accounts)
+REFRESH_MAX_HOURS = float(os.getenv("REFRESH_MAX_HOURS", "168"))  # Longest refresh interval (dormant accounts)
+VELOCITY_DAYS = int(os.getenv("VELOCITY_DAYS", "7"))  # Days of engagement rollups behind the velocity score
+
+# Media downloads (src.scraper.media)
+MEDIA_DIR = os.getenv("MEDIA_DIR", "media")  # Content-addressed store and its SQLite index
+MEDIA_MAX_MB = int(os.getenv("MEDIA_MAX_MB", "2048"))  # Least recently used files are evicted above this
+MEDIA_MAX_FILE_MB = int(os.getenv("MEDIA_MAX_FILE_MB", "25"))  # Larger downloads are not stored
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "16"))  # Concurrent downloads
+MEDIA_PER_HOST_LIMIT = int(os.getenv("MEDIA_PER_HOST_LIMIT", "8"))  # Concurrent downloads per CDN host
+MEDIA_REFRESH_HOURS = float(os.getenv("MEDIA_REFRESH_HOURS", "24"))  # Cached files younger than this skip revalidation
+
+# Comment text analytics (src.analysis.comments)
+TEXT_WORKERS = int(os.getenv("TEXT_WORKERS", "0"))  # Analysis processes; 0 = one per CPU
+TEXT_CHUNK_SIZE = int(os.getenv("TEXT_CHUNK_SIZE", "20000"))  # Comments per task sent to a worker
+TEXT_TOP_TERMS = int(os.getenv("TEXT_TOP_TERMS", "10"))  # Terms, hashtags, mentions and emoji kept per summary
+
+# Engagement time series (src.analysis.timeseries)
+TIMESERIES_ENABLED = os.getenv("TIMESERIES_ENABLED", "true").lower() == "true"  # Snapshot counts on every crawl
+TIMESERIES_RAW_DAYS = int(os.getenv("TIMESERIES_RAW_DAYS", "7"))  # Raw samples kept before the TTL index drops them
+TIMESERIES_HOURLY_DAYS = int(os.getenv("TIMESERIES_HOURLY_DAYS", "90"))  # Hourly rollups kept; daily ones never expire
+
+# Logging and metrics (src.utils.logger, src.utils.metrics)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" or "json" (one object per line)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"  # Off: every metric is a no-op
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serve /metrics from long-running processes (0 = off)
+METRICS_DIR = os.getenv("METRICS_DIR", "")  # Write <process>-<pid>.prom files here for batch jobs and workers
@@ -0,0 +1,199 @@
+"""
+Read-through cache for src.database.queries.
+Results are cached per query type with their own TTL, either in-process
+(LRU, the default) or in a Redis-compatible server shared by every process
+(the default when REDIS_URL is set).
+Writes through src.scraper.save_to_db invalidate the entries they affect in
+the writing process's backend: with Redis that reaches every reader, while an
+in-process cache in another process keeps serving entries until their TTL.
+
+Cached values are shared between callers of the in-process backend; treat
+them as read-only.
+"""
+import functools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from src.config.settings import (
+    CACHE_BACKEND,
+    CACHE_MAX_ENTRIES,
+    CACHE_TTL_PROFILE,
+    CACHE_TTL_PROFILES,
+    CACHE_TTL_POSTS,
+    CACHE_TTL_COMMENTS,
+    REDIS_URL,
+)
+
+# Query types, also the first segment of every cache key
+PROFILE = "profile"    # profile:<username>
+PROFILES = "profiles"  # profiles:<args>  (lists, pages and searches over all profiles)
+POSTS = "posts"        # posts:<username>:<args>
+COMMENTS = "comments"  # comments:<post_id>:<args>
+
+TTLS = {PROFILE: CACHE_TTL_PROFILE, PROFILES: CACHE_TTL_PROFILES, POSTS: CACHE_TTL_POSTS,
+        COMMENTS: CACHE_TTL_COMMENTS}
+
+MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe in-process cache with per-entry expiry and LRU eviction."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """Cache in a Redis-compatible server; the server handles expiry and eviction."""
+
+    def __init__(self, url=REDIS_URL, namespace="insta:"):
+        import redis  # Optional dependency, only needed for CACHE_BACKEND=redis
+
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+
+    def get(self, key):
+        raw = self.client.get(self.namespace + key)
+        return MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.namespace + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.namespace + key)
+
+    def delete_prefix(self, prefix):
+        keys = list(self.client.scan_iter(match=self.namespace + prefix + "*", count=500))
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self):
+        self.delete_prefix("")
+
+
+class QueryCache:
+    """Read-through wrapper that counts hits and misses per query type."""
+
+    def __init__(self, backend=None, ttls=None):
+        self.backend = backend
+        self.ttls = {**TTLS, **(ttls or {})}
+        self._lock = threading.Lock()
+        self._stats = {kind: {"hits": 0, "misses": 0} for kind in self.ttls}
+
+    def cached(self, kind, key_args=None):
+        """Decorate a query function; `key_args(*args, **kwargs)` builds the key suffix."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return func(*args, **kwargs)
+                suffix = key_args(*args, **kwargs) if key_args else ":".join(map(repr, args + tuple(sorted(kwargs.items()))))
+                key = f"{kind}:{suffix}"
+                value = self.backend.get(key)
+                self._count(kind, "hits" if value is not MISSING else "misses")
+                if value is MISSING:
+                    value = func(*args, **kwargs)
+                    self.backend.set(key, value, self.ttls[kind])
+                return value
+            return wrapper
+        return decorator
+
+    def _count(self, kind, outcome):
+        with self._lock:
+            self._stats.setdefault(kind, {"hits": 0, "misses": 0})[outcome] += 1
+
+    def invalidate_profiles(self, usernames=None):
+        """Drop cached profiles for `usernames` (everyone when None) and every cached profile list/search."""
+        if self.backend is None:
+            return
+        if usernames is None:
+            self.backend.delete_prefix(f"{PROFILE}:")
+        else:
+            for username in usernames:
+                self.backend.delete_prefix(f"{PROFILE}:{username!r}")
+        self.backend.delete_prefix(f"{PROFILES}:")
+
+    def invalidate_posts(self, usernames=None):
+        """Drop cached posts for `usernames`, or for everyone when None."""
+        if self.backend is None:
+            return
+        if usernames is None:
+            self.backend.delete_prefix(f"{POSTS}:")
+            return
+        for username in usernames:
+            self.backend.delete_prefix(f"{POSTS}:{username!r}:")
+
+    def invalidate_comments(self, post_ids=None):
+        """Drop cached comment pages for `post_ids`, or for every post when None."""
+        if self.backend is None:
+            return
+        if post_ids is None:
+            self.backend.delete_prefix(f"{COMMENTS}:")
+            return
+        for post_id in post_ids:
+            self.backend.delete_prefix(f"{COMMENTS}:{post_id!r}:")
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        """Hits, misses and hit rate per query type."""
+        with self._lock:
+            stats = {kind: dict(counts) for kind, counts in self._stats.items()}
+        for counts in stats.values():
+            total = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = counts["hits"] / total if total else 0.0
+        return stats
+
+
+def make_backend(name=CACHE_BACKEND):
+    """Backend for CACHE_BACKEND: "memory", "redis" or "none"."""
+    if name == "memory":
+        return LRUCache()
+    if name == "redis":
+        return RedisCache()
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown CACHE_BACKEND: {name}")
+
+
+query_cache = QueryCache(make_backend())
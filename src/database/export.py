@@ -0,0 +1,218 @@
+"""
+Columnar Parquet snapshots of profiles, posts and comments.
+Each collection is written to a Hive-partitioned dataset under SNAPSHOT_DIR
+(`<collection>/date=YYYY-MM-DD/username=<account>/part-*.parquet`) so
+analysis jobs and notebooks can read compressed, memory-mapped columns
+instead of querying the live database.
+
+Profiles are partitioned by export date, so daily appends build a history of
+snapshots; posts by posting day and comments by comment day. `append` adds
+new part files (rows carry `exported_at`), `overwrite` swaps in a fresh
+dataset, and `compact` merges each partition's parts into one file, keeping
+the latest row per _id.
+
+    python -m src.database.export posts comments --since-days 7
+    python -m src.database.export --compact
+"""
+import argparse
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from src.config.db import get_db
+from src.config.settings import SNAPSHOT_DIR, EXPORT_BATCH_SIZE
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+PARTITIONING = ["date", "username"]
+
+# collection -> time field (for partition date and --since) and exported columns.
+# Rows are keyed by _id; partition columns live in the directory names, not the files.
+EXPORTS = {
+    "profiles": {
+        "time": None,
+        "columns": {"_id": "string", "username": "string", "full_name": "string", "follower_count": "int64",
+                    "following_count": "int64", "media_count": "int64", "is_verified": "bool",
+                    "is_private": "bool", "account_type": "string", "category": "string"},
+    },
+    "posts": {
+        "time": "timestamp",
+        "columns": {"_id": "string", "username": "string", "code": "string", "like_count": "int64",
+                    "comment_count": "int64", "caption": "string", "timestamp": "int64"},
+    },
+    "comments": {
+        "time": "created_at",
+        "columns": {"_id": "string", "post_id": "string", "comment_id": "string", "user": "string",
+                    "text": "string", "like_count": "int64", "created_at": "int64"},
+    },
+}
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+
+
+def schema_for(collection):
+    columns = dict(EXPORTS[collection]["columns"])
+    if collection == "comments":
+        columns["username"] = "string"  # The post's owner, looked up for partitioning
+    fields = [(name, pa.type_for_alias(kind)) for name, kind in columns.items()]
+    return pa.schema(fields + [("exported_at", pa.timestamp("s", tz="UTC")), ("date", pa.string())])
+
+
+def day(value):
+    if isinstance(value, datetime):
+        value = value.timestamp()
+    if not isinstance(value, (int, float)):
+        return None
+    return datetime.fromtimestamp(value, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def as_int(value):
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_batches(collection, since=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of documents from `collection`, projecting only exported fields."""
+    spec = EXPORTS[collection]
+    query = {}
+    if since is not None and spec["time"]:
+        query[spec["time"]] = {"$gte": int(since.timestamp())}
+    cursor = get_db()[collection].find(query, {name: 1 for name in spec["columns"]}, batch_size=batch_size)
+    batch = []
+    for document in cursor:
+        batch.append(document)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def post_owners(post_ids):
+    """post_id -> username for one batch of comments."""
+    return {post["_id"]: post.get("username")
+            for post in get_db().posts.find({"_id": {"$in": list(post_ids)}}, {"username": 1})}
+
+
+def to_table(collection, documents, exported_at):
+    """Build one Arrow table (with partition columns) from a batch of documents."""
+    spec = EXPORTS[collection]
+    schema = schema_for(collection)
+    columns = {name: [] for name in schema.names}
+    owners = post_owners({doc.get("post_id") for doc in documents}) if collection == "comments" else {}
+    export_day = exported_at.strftime("%Y-%m-%d")
+    for document in documents:
+        for name, kind in spec["columns"].items():
+            value = document.get(name)
+            if kind == "int64":
+                value = as_int(value)
+            elif kind == "string" and value is not None:
+                value = str(value)
+            columns[name].append(value)
+        if collection == "comments":
+            columns["username"].append(owners.get(document.get("post_id")))
+        columns["exported_at"].append(exported_at)
+        columns["date"].append(day(document.get(spec["time"])) if spec["time"] else export_day)
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def export_collection(collection, mode="append", since=None, root=SNAPSHOT_DIR):
+    """Write `collection` to its Parquet dataset; returns the number of rows written."""
+    require_pyarrow()
+    target = os.path.join(root, collection)
+    now = datetime.now(timezone.utc)
+    exported_at = now.replace(microsecond=0)
+    # Time-ordered down to the microsecond, so sorted part names are in export order
+    # even for runs within the same second (whose rows share `exported_at`)
+    run_id = f"{now:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+    # Overwrites are built next to the live dataset and swapped in at the end
+    out = f"{target}.tmp-{run_id}" if mode == "overwrite" else target
+    rows = 0
+    for number, documents in enumerate(iter_batches(collection, since)):
+        table = to_table(collection, documents, exported_at)
+        ds.write_dataset(
+            table, out, format="parquet", partitioning=PARTITIONING, partitioning_flavor="hive",
+            basename_template=f"part-{run_id}-{number}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore", max_partitions=1_000_000,
+            file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        )
+        rows += table.num_rows
+    if mode == "overwrite":
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        if os.path.isdir(out):
+            os.replace(out, target)
+    return rows
+
+
+def partition_dirs(target):
+    """Leaf partition directories of a dataset."""
+    for dirpath, dirnames, filenames in os.walk(target):
+        if not dirnames and any(name.endswith(".parquet") for name in filenames):
+            yield dirpath
+
+
+def compact(collection, root=SNAPSHOT_DIR):
+    """Merge each partition's part files into one, keeping the newest row per _id.
+
+    Returns the number of partitions rewritten.
+    """
+    require_pyarrow()
+    rewritten = 0
+    for directory in partition_dirs(os.path.join(root, collection)):
+        parts = sorted(name for name in os.listdir(directory) if name.endswith(".parquet"))
+        if len(parts) < 2:
+            continue
+        # Read the files on their own so partition columns are not pulled in from the path
+        table = pa.concat_tables(pq.ParquetFile(os.path.join(directory, name)).read() for name in parts)
+        frame = table.to_pandas().sort_values("exported_at", kind="stable").drop_duplicates("_id", keep="last")
+        # Named after the newest part so it keeps its place in export order
+        base = parts[-1].removesuffix(".parquet").removesuffix("-compacted")
+        compacted = os.path.join(directory, f"{base}-compacted.parquet")
+        pq.write_table(pa.Table.from_pandas(frame, schema=table.schema, preserve_index=False), compacted + ".tmp", compression="zstd")
+        os.replace(compacted + ".tmp", compacted)
+        for name in parts:
+            os.remove(os.path.join(directory, name))
+        rewritten += 1
+    return rewritten
+
+
+def load_snapshot(collection, columns=None, filters=None, root=SNAPSHOT_DIR):
+    """Read a snapshot dataset into pandas with memory-mapped files.
+
+    `filters` uses pyarrow's DNF form, e.g. [("username", "=", "zuck"), ("date", ">=", "2024-01-01")],
+    and prunes whole partitions before any data is read.
+    """
+    require_pyarrow()
+    table = pq.read_table(os.path.join(root, collection), columns=columns, filters=filters,
+                          memory_map=True, partitioning="hive")
+    return table.to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export collections to partitioned Parquet snapshots.")
+    parser.add_argument("collections", nargs="*", default=list(EXPORTS), choices=list(EXPORTS))
+    parser.add_argument("--mode", choices=["append", "overwrite"], default="append")
+    parser.add_argument("--since-days", type=int, help="Only posts/comments from the last N days")
+    parser.add_argument("--compact", action="store_true", help="Compact existing snapshots instead of exporting")
+    args = parser.parse_args()
+
+    for name in args.collections:
+        if args.compact:
+            print(f"🗜️ {name}: compacted {compact(name)} partitions")
+            continue
+        since = datetime.now(timezone.utc) - timedelta(days=args.since_days) if args.since_days else None
+        print(f"📦 {name}: exported {export_collection(name, args.mode, since):,} rows to {SNAPSHOT_DIR}/{name}")
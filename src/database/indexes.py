@@ -0,0 +1,153 @@
+"""
+MongoDB index declarations and query-plan checks.
+`ensure_indexes` creates every index the queries in src.database.queries
+rely on (safe to run on every startup), and `check_query_plans` explains
+each of those queries and fails if any falls back to a collection scan.
+
+    python -m src.database.indexes          # create indexes, run backfills, check plans
+"""
+import sys
+from datetime import datetime
+
+from pymongo import ASCENDING, IndexModel
+
+from src.analysis import timeseries
+from src.config.db import get_db
+from src.database import queries
+from src.scraper.save_to_db import BulkWriter, search_keys, comment_id, comment_preview
+
+INDEXES = {
+    "profiles": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("follower_count", ASCENDING), ("_id", ASCENDING)], name="follower_count_id"),
+        IndexModel([("search_keys", ASCENDING)], name="search_keys"),
+    ],
+    "posts": [
+        IndexModel([("username", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+                   name="username_timestamp_id"),
+    ],
+    "comments": [
+        IndexModel([("post_id", ASCENDING), ("_id", ASCENDING)], name="post_id_id"),
+    ],
+    "engagement_rollups": [
+        IndexModel([("username", ASCENDING), ("period", ASCENDING), ("bucket", ASCENDING)],
+                   name="username_period_bucket"),
+        # Scheduler's engagement velocity: recent day rollups across all accounts
+        IndexModel([("period", ASCENDING), ("bucket", ASCENDING)], name="period_bucket"),
+    ],
+    "metric_snapshots": [
+        IndexModel([("kind", ASCENDING), ("key", ASCENDING), ("start", ASCENDING)], name="kind_key_start"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "metric_rollups": [
+        IndexModel([("kind", ASCENDING), ("key", ASCENDING), ("resolution", ASCENDING), ("start", ASCENDING)],
+                   name="kind_key_resolution_start"),
+        # Hourly rollups carry expires_at; daily ones have none and are kept
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# One representative call per query in src.database.queries (and the time-series reads)
+QUERY_CHECKS = {
+    "get_profile_by_username": lambda: queries.find_profile_by_username("taylorswift"),
+    "get_all_profiles": lambda: queries.find_all_profiles(limit=15),
+    "search_profiles": lambda: queries.find_profiles_matching("taylor"),
+    "get_posts_by_username": lambda: queries.find_posts_by_username("taylorswift"),
+    "get_comments": lambda: queries.find_comments_page("3000000000000000000", cursor=queries.encode_cursor(["3000000000000000000:1"])),
+    "get_profiles_page": lambda: queries.find_profiles_page(cursor=queries.encode_cursor([1000, "0" * 24])),
+    "get_posts_page": lambda: queries.find_posts_page("taylorswift", cursor=queries.encode_cursor([1700000000, "0"])),
+    "metric_series": lambda: timeseries.find_series("profile", "taylorswift", "hour", datetime(2024, 1, 1)),
+}
+
+
+class CollectionScanError(RuntimeError):
+    """A query that should be index-backed was planned as a COLLSCAN."""
+
+
+def backfill_search_keys():
+    """Add search_keys to profiles stored before prefix search existed."""
+    missing = get_db().profiles.find({"search_keys": {"$exists": False}}, {"username": 1, "full_name": 1})
+    with BulkWriter() as writer:
+        for profile in missing:
+            writer.add_update("profiles", {"username": profile["username"]}, {"$set": {"search_keys": search_keys(profile)}})
+    return writer.totals()["modified"]
+
+
+def legacy_comments(comments):
+    """Embedded comments in the current shape, each with an id.
+
+    The MySQL migration stored `{"username", "comment"}` without ids, so those
+    get an id from author, text and position in the list.
+    """
+    upgraded = []
+    for position, comment in enumerate(comments or []):
+        comment = dict(comment)
+        if "user" not in comment and "username" in comment:
+            comment["user"] = comment.pop("username")
+        if "text" not in comment and "comment" in comment:
+            comment["text"] = comment.pop("comment")
+        comment["id"] = comment_id(comment, position)
+        upgraded.append(comment)
+    return upgraded
+
+
+def backfill_comments():
+    """Move comment arrays embedded in older post documents into the comments collection."""
+    embedded = get_db().posts.find({"comments": {"$exists": True}}, {"comments": 1})
+    with BulkWriter() as writer:
+        for post in embedded:
+            comments = legacy_comments(post["comments"])
+            writer.add_comments(post["_id"], comments)
+            writer.add_update("posts", {"_id": post["_id"]}, {"$set": {"comment_preview": comment_preview(comments)}})
+    if writer.totals()["errors"]:
+        return 0
+    # Only drop the embedded arrays once every comment is stored on its own
+    return get_db().posts.update_many({"comments": {"$exists": True}}, {"$unset": {"comments": ""}}).modified_count
+
+
+def ensure_indexes():
+    """Create all declared indexes (no-op for ones that already exist)."""
+    for collection, models in INDEXES.items():
+        get_db()[collection].create_indexes(models)
+
+
+def plan_stages(plan):
+    """Flatten the stage names of an explain() winning plan."""
+    stages = [plan.get("stage")] if plan.get("stage") else []
+    for child in [plan.get("inputStage"), *plan.get("inputStages", [])]:
+        if child:
+            stages.extend(plan_stages(child))
+    return stages
+
+
+def query_plans():
+    """Return {query name: [winning plan stages]} for every checked query."""
+    plans = {}
+    for name, build in QUERY_CHECKS.items():
+        planner = build().explain()["queryPlanner"]
+        winning = planner["winningPlan"]
+        # Slot-based engine plans nest the classic plan tree under queryPlan
+        plans[name] = plan_stages(winning.get("queryPlan", winning))
+    return plans
+
+
+def check_query_plans():
+    """Raise CollectionScanError if any query is planned as a collection scan."""
+    plans = query_plans()
+    scans = {name: stages for name, stages in plans.items() if "COLLSCAN" in stages}
+    if scans:
+        raise CollectionScanError(f"Queries falling back to COLLSCAN: {scans}")
+    return plans
+
+
+if __name__ == "__main__":
+    ensure_indexes()
+    print(f"Indexes ensured; search keys added to {backfill_search_keys()} profiles.")
+    print(f"Comments moved out of {backfill_comments()} post documents.")
+    try:
+        for name, stages in check_query_plans().items():
+            print(f"  {name}: {' <- '.join(stages)}")
+    except CollectionScanError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("✅ Every query is index-backed.")
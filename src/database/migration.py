@@ -1,49 +1,222 @@
+"""
+MySQL -> MongoDB migration.
+Each table is split into key ranges that worker processes stream through
+server-side cursors in key order, writing with bulk upserts. Child rows
+(bio links, comments) are read in one ordered pass per range and grouped by
+their parent key instead of being queried once per parent.
+
+Every write is an upsert keyed by the source primary key, so re-running is
+safe, and each range checkpoints its last finished key in a CrawlJob once
+the writes before it succeeded, so an interrupted or failed run picks up
+where it stopped.
+
+    python -m src.database.migration --workers 8
+"""
 import sys
 import os
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import groupby
+from operator import itemgetter
 
 # Ensure `src` is in sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-import mysql.connector
-from src.config.db import get_db  # Use absolute import
-
-db = get_db()
-
-
-# MySQL Connection
-mysql_conn = mysql.connector.connect(
-    host="127.0.0.1",
-    user="root",
-    password="MySQL@123",
-    database="insta_engagement"
-)
-cursor = mysql_conn.cursor(dictionary=True)
-
-# Migrate Profiles
-cursor.execute("SELECT * FROM instagram_profiles")
-profiles = cursor.fetchall()
-for profile in profiles:
-    username = profile["username"]
-    
-    # Get bio links
-    cursor.execute("SELECT title, url FROM bio_links WHERE username = %s", (username,))
-    profile["bio_links"] = cursor.fetchall()
-    
-    db.profiles.insert_one(profile)
-
-# Migrate Posts
-cursor.execute("SELECT * FROM instagram_posts")
-posts = cursor.fetchall()
-for post in posts:
-    post_id = post["id"]
-    
-    # Get comments
-    cursor.execute("SELECT username, comment FROM instagram_comments WHERE post_id = %s", (post_id,))
-    post["comments"] = cursor.fetchall()
-    
-    db.posts.insert_one(post)
-
-print("Migration completed successfully!")
-
-cursor.close()
-mysql_conn.close()
+from src.config.db import mysql_connection
+from src.config.settings import MIGRATION_WORKERS, MIGRATION_BATCH_SIZE
+from src.database.indexes import ensure_indexes
+from src.scraper.checkpoints import CrawlJob
+from src.scraper.records import epoch
+from src.scraper.save_to_db import BulkWriter, COMMENT_PREVIEW_SIZE, comment_preview
+from src.utils.logger import get_logger
+from src.utils import metrics
+
+log = get_logger(__name__)
+
+# Tables whose primary keys define the ranges every kind is split on
+RANGE_KEYS = {"instagram_profiles": "username", "instagram_posts": "id"}
+
+# kind -> (table, group key, tie-breaker, columns, range table)
+SOURCES = {
+    "profiles": ("instagram_profiles", "username", None, "*", "instagram_profiles"),
+    "bio_links": ("bio_links", "username", "id", "id, username, title, url", "instagram_profiles"),
+    "posts": ("instagram_posts", "id", None, "*", "instagram_posts"),
+    "comments": ("instagram_comments", "post_id", "id", "id, post_id, username, comment, created_at", "instagram_posts"),
+}
+
+
+def key_ranges(conn, table, key, parts):
+    """Split `table` into up to `parts` [lo, hi) ranges of `key` (None = open end)."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    total = cursor.fetchone()[0]
+    bounds = set()
+    for i in range(1, parts):
+        cursor.execute(f"SELECT {key} FROM {table} ORDER BY {key} LIMIT 1 OFFSET %s", (total * i // parts,))
+        row = cursor.fetchone()
+        if row:
+            bounds.add(row[0])
+    cursor.close()
+    edges = [None, *sorted(bounds), None]
+    return list(zip(edges, edges[1:]))
+
+
+def stream_rows(conn, kind, lo, hi, after, batch_size):
+    """Yield rows of one range in key order through an unbuffered (server-side) cursor."""
+    table, key, tiebreak, columns, _ = SOURCES[kind]
+    where, params = [], []
+    for op, value in ((">=", lo), ("<", hi), (">", after)):
+        if value is not None:
+            where.append(f"{key} {op} %s")
+            params.append(value)
+    sql = f"SELECT {columns} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {key}" + (f", {tiebreak}" if tiebreak else "")
+
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    cursor.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+
+class WriteFailed(RuntimeError):
+    """A range's bulk writes reported errors, so its progress was not checkpointed."""
+
+
+def check_written(writer, task):
+    """Flush `writer` and raise WriteFailed if any of its writes failed."""
+    writer.flush()
+    errors = writer.totals()["errors"]
+    if errors:
+        raise WriteFailed(f"{errors} writes failed in {task}")
+
+
+def write_profile(writer, username, rows):
+    profile = dict(next(rows))
+    if "id" in profile:
+        profile["mysql_id"] = profile.pop("id")  # The source table's autoincrement key, not an Instagram id
+    writer.add_profile(profile)
+    return 1
+
+
+def write_bio_links(writer, username, rows):
+    links = [{"title": row["title"], "url": row["url"]} for row in rows]
+    writer.add_update("profiles", {"username": username}, {"$set": {"bio_links": links}})
+    return len(links)
+
+
+def write_post(writer, post_id, rows):
+    row = next(rows)
+    writer.add_post(row["username"], {**row, "timestamp": epoch(row["timestamp"])})
+    return 1
+
+
+def write_comments(writer, post_id, rows):
+    """Upsert one post's comments as they stream by, keeping only the preview in memory."""
+    preview, count = [], 0
+    for row in rows:
+        comment = {"id": row["id"], "user": row["username"], "text": row["comment"], "created_at": row["created_at"]}
+        writer.add_comments(post_id, [comment])
+        if len(preview) < COMMENT_PREVIEW_SIZE:
+            preview.append(comment)
+        count += 1
+    writer.add_update("posts", {"_id": post_id}, {"$set": {"comment_preview": comment_preview(preview)}})
+    return count
+
+
+WRITERS = {"profiles": write_profile, "bio_links": write_bio_links, "posts": write_post, "comments": write_comments}
+
+
+def migrate_range(job_name, task, batch_size=MIGRATION_BATCH_SIZE):
+    """Migrate one key range; runs in a worker process. Returns the number of rows written."""
+    kind, lo, hi = json.loads(task)
+    key = SOURCES[kind][1]
+    job = CrawlJob(job_name)
+    conn = mysql_connection()
+    migrated = since_checkpoint = 0
+    rows = stream_rows(conn, kind, lo, hi, job.account_cursor(task), batch_size)
+    try:
+        with metrics.span("migrate_range", kind=kind), BulkWriter(batch_size) as writer:
+            # Checkpoint only between groups, so a resumed range never splits a post's comments
+            for group_key, group in groupby(rows, key=itemgetter(key)):
+                since_checkpoint += WRITERS[kind](writer, group_key, group)
+                if since_checkpoint >= batch_size:
+                    check_written(writer, task)
+                    job.save_page(task, group_key)
+                    migrated, since_checkpoint = migrated + since_checkpoint, 0
+            check_written(writer, task)
+        job.finish_account(task)
+        return migrated + since_checkpoint
+    finally:
+        rows.close()  # Release the server-side cursor before its connection
+        conn.close()
+        job.close()
+        metrics.write_textfile(process="migration")
+
+
+def plan_tasks(job, workers):
+    """Register one task per (kind, key range) the first time a job runs."""
+    counts = job.progress()
+    if any(count for status, count in counts.items() if status != "posts_done"):
+        return
+    conn = mysql_connection()
+    try:
+        # A few ranges per worker keeps them all busy when ranges finish unevenly
+        ranges = {table: key_ranges(conn, table, key, workers * 4) for table, key in RANGE_KEYS.items()}
+        for kind, source in SOURCES.items():
+            job.add_accounts([json.dumps([kind, lo, hi]) for lo, hi in ranges[source[4]]])
+    finally:
+        conn.close()
+
+
+def migrate(job_name="mysql-migration", workers=MIGRATION_WORKERS, batch_size=MIGRATION_BATCH_SIZE, restart=False):
+    """Run (or resume) the migration across `workers` processes."""
+    job = CrawlJob(job_name)
+    if restart:
+        job.reset()
+    plan_tasks(job, workers)
+    # The unique username index keeps the profiles and bio_links ranges from upserting the same profile twice
+    ensure_indexes()
+    tasks = job.pending_accounts()
+    log.info("📋 Ranges to migrate", extra={"fields": {"ranges": len(tasks), "workers": workers}})
+
+    rows = failed = 0
+    # Spawned workers open their own MySQL and Mongo pools and reuse them across ranges
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(migrate_range, job_name, task, batch_size): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                rows += future.result()
+                log.info("✅ Range migrated", extra={"fields": {"task": task}})
+            except Exception as e:
+                job.fail_account(task, e)
+                failed += 1
+                log.error("❌ Range failed", extra={"fields": {"task": task, "error": str(e)}})
+    job.close()
+    return {"rows": rows, "failed": failed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate MySQL data to MongoDB.")
+    parser.add_argument("--workers", type=int, default=MIGRATION_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--job", default="mysql-migration", help="Checkpoint name; rerun with the same name to resume")
+    parser.add_argument("--restart", action="store_true", help="Forget saved progress and migrate everything again")
+    args = parser.parse_args()
+
+    result = migrate(args.job, args.workers, args.batch_size, args.restart)
+    if result["failed"]:
+        print(f"⚠️ {result['failed']} ranges failed; rerun to retry them.")
+        sys.exit(1)
+    print(f"Migration completed successfully! ({result['rows']} rows)")
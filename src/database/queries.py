@@ -1,19 +1,123 @@
+import re
+import base64
+from datetime import datetime
+from bson import ObjectId, json_util
 from pymongo import ASCENDING
 from src.config.db import get_db
+from src.database.cache import query_cache, PROFILE, PROFILES, POSTS, COMMENTS
 
-db = get_db()
+# Cursor builders are shared with src.database.indexes, which explains them
+# to make sure every query here is served by an index, and with the async
+# API, which passes its own (Motor) `database`. The get_* functions below are
+# read through src.database.cache.
 
+# Bookkeeping fields the writers store that callers never need
+PROFILE_FIELDS = {"search_keys": 0, "content_hash": 0}
+RECORD_FIELDS = {"content_hash": 0}
+
+# Values a cursor may carry; anything else (e.g. {"$ne": null}) would become a query operator
+CURSOR_TYPES = (int, float, str, datetime, ObjectId)
+
+def _db(database):
+    return database if database is not None else get_db()
+
+def find_profile_by_username(username, database=None):
+    return _db(database).profiles.find({"username": username}, PROFILE_FIELDS).limit(1)
+
+def find_all_profiles(limit=15, offset=0):
+    return get_db().profiles.find({}, PROFILE_FIELDS).sort("follower_count", ASCENDING).skip(offset).limit(limit)
+
+def find_profiles_matching(search_term, limit=10):
+    # Anchored, case-sensitive regex on lowercased keys can use the search_keys index
+    prefix = "^" + re.escape(search_term.lower())
+    return get_db().profiles.find({"search_keys": {"$regex": prefix}}, PROFILE_FIELDS).limit(limit)
+
+def find_posts_by_username(username, limit=15):
+    return get_db().posts.find({"username": username}, RECORD_FIELDS).sort("timestamp", ASCENDING).limit(limit)
+
+def encode_cursor(values):
+    """Opaque continuation token for the last row of a page."""
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def decode_cursor(token):
+    """Values from `encode_cursor`; raises ValueError unless they are plain scalars (or null)."""
+    values = json_util.loads(base64.urlsafe_b64decode(token.encode()))
+    if not isinstance(values, list) or not all(
+            value is None or (isinstance(value, CURSOR_TYPES) and not isinstance(value, bool)) for value in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+def _after(field, value, last_id):
+    """Filter for rows sorted after (value, last_id) on (field, _id) ascending."""
+    if value is None:
+        # Nulls sort first, and $gt null matches nothing, so step past them explicitly
+        return {"$or": [{field: None, "_id": {"$gt": last_id}}, {field: {"$ne": None}}]}
+    return {"$or": [{field: {"$gt": value}}, {field: value, "_id": {"$gt": last_id}}]}
+
+def find_comments_page(post_id, limit=50, cursor=None, database=None):
+    # _id is "<post_id>:<comment_id>", so (post_id, _id) orders and resumes a thread
+    query = {"post_id": post_id}
+    if cursor:
+        (last_id,) = decode_cursor(cursor)
+        query["_id"] = {"$gt": last_id}
+    return _db(database).comments.find(query, RECORD_FIELDS).sort([("post_id", ASCENDING), ("_id", ASCENDING)]).limit(limit + 1)
+
+def find_profiles_page(limit=15, cursor=None, database=None):
+    query = {}
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        query = _after("follower_count", value, last_id)
+    return _db(database).profiles.find(query, PROFILE_FIELDS).sort([("follower_count", ASCENDING), ("_id", ASCENDING)]).limit(limit + 1)
+
+def find_posts_page(username, limit=15, cursor=None, database=None):
+    query = {"username": username}
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        query.update(_after("timestamp", value, last_id))
+    return _db(database).posts.find(query, RECORD_FIELDS).sort([("timestamp", ASCENDING), ("_id", ASCENDING)]).limit(limit + 1)
+
+def next_cursor(rows, limit, field=None):
+    """Trim a limit+1 row list to `limit`; return (rows, next token or None).
+
+    The token holds the last row's (field, _id), or just its _id without a field.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([last.get(field), last["_id"]] if field else [last["_id"]])
+
+def _page(cursor, limit, field=None):
+    return next_cursor(list(cursor), limit, field)
+
+@query_cache.cached(PROFILE, lambda username: repr(username))
 def get_profile_by_username(username):
-    return db.profiles.find_one({"username": username})
+    return next(find_profile_by_username(username), None)
 
+@query_cache.cached(PROFILES)
 def get_all_profiles(limit=15, offset=0):
-    return list(db.profiles.find().sort("follower_count", ASCENDING).skip(offset).limit(limit))
+    """Offset paging costs O(offset) on the server; prefer get_profiles_page for deep pages."""
+    return list(find_all_profiles(limit, offset))
+
+@query_cache.cached(PROFILES)
+def get_profiles_page(limit=15, cursor=None):
+    """Profiles by follower_count (then _id). Returns (profiles, next_cursor); next_cursor is None on the last page."""
+    return _page(find_profiles_page(limit, cursor), limit, "follower_count")
 
+@query_cache.cached(PROFILES)
 def search_profiles(search_term, limit=10):
-    return list(db.profiles.find(
-        {"$or": [{"username": {"$regex": search_term, "$options": "i"}},
-                 {"full_name": {"$regex": search_term, "$options": "i"}}]}
-    ).limit(limit))
+    return list(find_profiles_matching(search_term, limit))
 
+@query_cache.cached(POSTS, lambda username, limit=15: f"{username!r}:{limit}")
 def get_posts_by_username(username, limit=15):
-    return list(db.posts.find({"username": username}).sort("timestamp", ASCENDING).limit(limit))
+    return list(find_posts_by_username(username, limit))
+
+@query_cache.cached(POSTS, lambda username, limit=15, cursor=None: f"{username!r}:{limit}:{cursor}")
+def get_posts_page(username, limit=15, cursor=None):
+    """A profile's posts by timestamp (then _id). Returns (posts, next_cursor); next_cursor is None on the last page."""
+    return _page(find_posts_page(username, limit, cursor), limit, "timestamp")
+
+@query_cache.cached(COMMENTS, lambda post_id, limit=50, cursor=None: f"{post_id!r}:{limit}:{cursor}")
+def get_comments(post_id, limit=50, cursor=None):
+    """A post's comments. Returns (comments, next_cursor); next_cursor is None on the last page."""
+    return _page(find_comments_page(post_id, limit, cursor), limit)
@@ -0,0 +1,137 @@
+"""
+Resumable crawl checkpoints stored in a local SQLite file.
+A named job records which accounts are pending/done/failed, the pagination
+cursor reached for each account, and which posts already have their comments
+saved, so a restarted job continues where it stopped instead of re-spending
+API quota on finished work.
+"""
+import sqlite3
+import threading
+import time
+
+from src.config.settings import CHECKPOINT_DB
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS job_accounts (
+        job TEXT NOT NULL,
+        account TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        cursor TEXT,
+        error TEXT,
+        updated_at REAL,
+        PRIMARY KEY (job, account)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_posts (
+        job TEXT NOT NULL,
+        post_id TEXT NOT NULL,
+        account TEXT NOT NULL,
+        updated_at REAL,
+        PRIMARY KEY (job, post_id)
+    )
+    """,
+]
+
+
+class CrawlJob:
+    """Persistent progress for one named crawl job."""
+
+    def __init__(self, name, path=CHECKPOINT_DB):
+        self.name = name
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            for sql in SCHEMA:
+                self._conn.execute(sql)
+
+    def add_accounts(self, accounts):
+        """Register accounts for this job; ones already known keep their progress."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO job_accounts (job, account, updated_at) VALUES (?, ?, ?)",
+                [(self.name, account, time.time()) for account in accounts],
+            )
+
+    def pending_accounts(self):
+        """Accounts not yet finished, in the order they were added."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT account FROM job_accounts WHERE job = ? AND status != 'done' ORDER BY rowid",
+                (self.name,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def account_cursor(self, account):
+        """The pagination cursor to resume `account` from, or None to start at the beginning."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cursor FROM job_accounts WHERE job = ? AND account = ?",
+                (self.name, account),
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_page(self, account, cursor, post_ids=()):
+        """Record a written page: advance the account cursor and mark its posts done.
+
+        Call only after the page's records have been flushed to the database.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE job_accounts SET status = 'running', cursor = ?, updated_at = ? WHERE job = ? AND account = ?",
+                (cursor, now, self.name, account),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO job_posts (job, post_id, account, updated_at) VALUES (?, ?, ?, ?)",
+                [(self.name, post_id, account, now) for post_id in post_ids],
+            )
+
+    def done_posts(self, post_ids):
+        """The subset of `post_ids` whose comments this job already saved."""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return set()
+        placeholders = ",".join("?" * len(post_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT post_id FROM job_posts WHERE job = ? AND post_id IN ({placeholders})",
+                (self.name, *post_ids),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def finish_account(self, account):
+        self._set_status(account, "done")
+
+    def fail_account(self, account, error):
+        self._set_status(account, "failed", str(error))
+
+    def _set_status(self, account, status, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE job_accounts SET status = ?, error = ?, updated_at = ? WHERE job = ? AND account = ?",
+                (status, error, time.time(), self.name, account),
+            )
+
+    def progress(self):
+        """Count of accounts per status, plus posts completed."""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM job_accounts WHERE job = ? GROUP BY status",
+                (self.name,),
+            ).fetchall())
+            counts["posts_done"] = self._conn.execute(
+                "SELECT COUNT(*) FROM job_posts WHERE job = ?", (self.name,),
+            ).fetchone()[0]
+        return counts
+
+    def reset(self):
+        """Forget all progress for this job."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM job_accounts WHERE job = ?", (self.name,))
+            self._conn.execute("DELETE FROM job_posts WHERE job = ?", (self.name,))
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,65 @@
+"""
+Per-profile crawl state for incremental refreshes.
+Each profile keeps a high-water mark (latest post id/timestamp, last crawl
+time) and the like/comment counts seen for its posts, so the next crawl only
+fetches comments for new posts or posts whose comment_count changed. Writes
+merge per-post counts into the stored map, so a crawl that covered only some
+pages (e.g. a resumed job) keeps the counts of the others.
+"""
+from datetime import datetime, timezone
+from src.config.db import get_db
+
+
+def load_crawl_state(username):
+    """Return the stored crawl_state document for `username`, or {}."""
+    return get_db().crawl_state.find_one({"_id": username}) or {}
+
+
+def load_seen_posts(username):
+    """Return {post_id: {"like_count", "comment_count"}} from the last crawl, or {}."""
+    state = get_db().crawl_state.find_one({"_id": username}, {"posts": 1})
+    return (state or {}).get("posts", {})
+
+
+def stored_latest_post(state):
+    """The high-water mark of a stored crawl_state as a post-like dict, or None."""
+    if state.get("latest_post_id") is None:
+        return None
+    return {"id": state["latest_post_id"], "timestamp": state.get("latest_post_timestamp")}
+
+
+def post_counts(post):
+    """The per-post counts remembered between crawls."""
+    return {"like_count": post.get("like_count"), "comment_count": post.get("comment_count")}
+
+
+def newer_post(latest, post):
+    """Return whichever of two posts is more recent (`latest` may be None)."""
+    if latest is None or (post.get("timestamp") or 0) > (latest.get("timestamp") or 0):
+        return post
+    return latest
+
+
+def crawl_state_document(follower_count, posts_seen, latest_post):
+    """Build a crawl_state document from counts collected during a crawl."""
+    latest_post = latest_post or {}
+    return {
+        "last_crawl_at": datetime.now(timezone.utc),
+        "latest_post_id": latest_post.get("id"),
+        "latest_post_timestamp": latest_post.get("timestamp"),
+        "follower_count": follower_count,
+        "posts": posts_seen,
+    }
+
+
+def build_crawl_state(data):
+    """Build the crawl_state document for a successfully fetched profile record."""
+    posts = data.get("posts", [])
+    latest = None
+    for post in posts:
+        latest = newer_post(latest, post)
+    return crawl_state_document(
+        data.get("follower_count"),
+        {post["id"]: post_counts(post) for post in posts},
+        latest,
+    )
@@ -2,12 +2,19 @@ import requests
 import json
 import os
 from dotenv import load_dotenv
+from src.scraper.http_client import RapidAPIClient
+from src.scraper.rate_limit import rapidapi_limiter
+from src.scraper.records import instagram_profile, instagram_post, instagram_comment
+from src.config.settings import POSTS_MAX_PAGES
+from src.utils.logger import get_logger
+from src.utils.metrics import RECORDS_PARSED
 
 # Load environment variables
 load_dotenv()
 
 PROFILE_URL = os.getenv("SCRAPER_URL")  # Profile API URL
 POSTS_URL = os.getenv("SCRAPER_Post_URL")  # Separate Posts API URL
+COMMENTS_URL = "https://instagram-scraper-api2.p.rapidapi.com/v1/comments"
 API_KEY = os.getenv("SCRAPER_API_KEY")
 
 HEADERS = {
@@ -15,6 +22,11 @@ HEADERS = {
     "x-rapidapi-host": "instagram-scraper-api2.p.rapidapi.com"
 }
 
+# Shared keep-alive, rate-limited client used by every RapidAPI call
+client = RapidAPIClient(HEADERS, limiter=rapidapi_limiter)
+
+log = get_logger(__name__)
+
 def safe_get(data, *keys, default=None):
     """Safely retrieve nested dictionary keys."""
     current = data
@@ -27,95 +39,128 @@ def safe_get(data, *keys, default=None):
             return default
     return current if current is not None else default
 
+def build_post_record(post):
+    """Shape one raw post from the posts API."""
+    return {
+        **instagram_post(post).as_dict(keep_empty=True),
+        "comments": []  # Placeholder for comments
+    }
+
+def fetch_instagram_posts_page(username, pagination_token=None):
+    """Fetch one page of posts. Returns (posts, next_pagination_token); raises on HTTP errors."""
+    querystring = {"username_or_id_or_url": username}
+    if pagination_token:
+        querystring["pagination_token"] = pagination_token
+
+    response = client.get(POSTS_URL, params=querystring)
+    response.raise_for_status()  # Raise exception for HTTP errors
+    body = response.json()
+    post_data = body.get("data", {}).get("items", [])
+    RECORDS_PARSED.labels("instagram", "post").inc(len(post_data))
+    return [build_post_record(post) for post in post_data], body.get("pagination_token")
+
 def fetch_instagram_posts(username):
     """Fetch Instagram posts using the separate post API."""
-    querystring = {"username_or_id_or_url": username}
-    
     try:
-        response = requests.get(POSTS_URL, headers=HEADERS, params=querystring)
-        response.raise_for_status()  # Raise exception for HTTP errors
-        post_data = response.json().get("data", {}).get("items", [])
-        
-        posts = []
-        for post in post_data:
-            posts.append({
-                "id": safe_get(post, "id"),
-                "code": safe_get(post, "code"),
-                "thumbnail_url": safe_get(post, "thumbnail_url"),
-                "like_count": safe_get(post, "like_count", default=0),
-                "comment_count": safe_get(post, "comment_count", default=0),
-                "caption": safe_get(post, "caption", "text", default=""),
-                "timestamp": safe_get(post, "taken_at_timestamp"),
-                "comments": []  # Placeholder for comments
-            })
-        
+        posts, _ = fetch_instagram_posts_page(username)
         return posts
     except requests.exceptions.RequestException as e:
-        print(f"⚠️ Failed to fetch posts for {username}: {e}")
+        log.warning("⚠️ Failed to fetch posts", extra={"fields": {"username": username, "error": str(e)}})
         return []
 
+def iter_instagram_post_pages(username, max_pages=POSTS_MAX_PAGES, pagination_token=None):
+    """Yield (posts, next_pagination_token) per page, up to `max_pages`.
+
+    Pass a saved `pagination_token` to resume from the page it points at.
+    Raises on HTTP errors so callers can keep the cursor and retry later.
+    """
+    for _ in range(max_pages):
+        posts, pagination_token = fetch_instagram_posts_page(username, pagination_token)
+        yield posts, pagination_token
+        if not pagination_token:
+            return
+
 def fetch_comments_for_post(post_id):
     """Fetch comments for a specific Instagram post."""
-    url = "https://instagram-scraper-api2.p.rapidapi.com/v1/comments"
     querystring = {"code_or_id_or_url": post_id, "sort_by": "popular"}
 
     try:
-        response = requests.get(url, headers=HEADERS, params=querystring)
+        response = client.get(COMMENTS_URL, params=querystring)
         response.raise_for_status()
         data = response.json().get("data", {})
 
         comments = data.get("items", [])
-        comments_list = [
-            {
-                "user": comment.get("user", {}).get("username", "Unknown"),
-                "text": comment.get("text", "No text")
-            }
-            for comment in comments
-        ]
-
-        return comments_list
+        RECORDS_PARSED.labels("instagram", "comment").inc(len(comments))
+        return [instagram_comment(post_id, comment).as_dict(keep_empty=True) for comment in comments]
     except requests.exceptions.RequestException as e:
-        print(f"⚠️ Failed to fetch comments for post {post_id}: {e}")
+        log.warning("⚠️ Failed to fetch comments", extra={"fields": {"post_id": post_id, "error": str(e)}})
         return []
 
-def fetch_instagram_data(username):
-    """Fetch Instagram profile data and posts with comments."""
+def needs_comments(post, seen_posts):
+    """A post needs its comments (re)fetched if it is new or its comment_count moved."""
+    seen = seen_posts.get(post["id"])
+    return seen is None or seen.get("comment_count") != post.get("comment_count")
+
+def skip_unchanged_comments(posts, seen_posts):
+    """Drop the comments placeholder from posts whose comments are already stored.
+
+    Without a `comments` key the post upsert leaves the stored comments alone.
+    Returns the posts whose comments still need fetching.
+    """
+    if seen_posts is None:
+        return posts
+    to_fetch = []
+    for post in posts:
+        if needs_comments(post, seen_posts):
+            to_fetch.append(post)
+        else:
+            post.pop("comments", None)
+    return to_fetch
+
+def fetch_instagram_profile(username):
+    """Fetch raw Instagram profile data. Raises on HTTP errors."""
     querystring = {"username_or_id_or_url": username}
+    response = client.get(PROFILE_URL, params=querystring)
+    response.raise_for_status()
+    RECORDS_PARSED.labels("instagram", "profile").inc()
+    return response.json().get('data', {})
 
+def build_profile_record(data, posts):
+    """Shape raw profile data and its posts into the record saved to the DB."""
+    return {
+        **instagram_profile(data).as_dict(keep_empty=True),
+        "posts": posts,
+        "status": "success"
+    }
+
+def build_failed_record(username, error):
+    """Shape a failed fetch into the same record layout callers check."""
+    return {
+        "username": username,
+        "error": True,
+        "status_code": getattr(error.response, 'status_code', None),
+        "message": str(error),
+        "status": "failed"
+    }
+
+def fetch_instagram_data(username, seen_posts=None):
+    """Fetch Instagram profile data and posts with comments.
+
+    With `seen_posts` (from the last crawl), comments are only fetched for new
+    posts or posts whose comment_count changed. QuotaExhausted is raised, not
+    turned into a failed record, since every later account would fail too.
+    """
     try:
         # Fetch profile data
-        response = requests.get(PROFILE_URL, headers=HEADERS, params=querystring)
-        response.raise_for_status()
-        data = response.json().get('data', {})
+        data = fetch_instagram_profile(username)
 
         # Fetch post data separately
         posts = fetch_instagram_posts(username)
 
-        # Fetch comments for each post
-        for post in posts:
+        # Fetch comments for each new or changed post
+        for post in skip_unchanged_comments(posts, seen_posts):
             post["comments"] = fetch_comments_for_post(post["id"])
 
-        return {
-            "username": data.get("username"),
-            "full_name": data.get("full_name"),
-            "follower_count": data.get("follower_count"),
-            "following_count": data.get("following_count"),
-            "media_count": data.get("media_count"),
-            "is_verified": data.get("is_verified"),
-            "category": data.get("category"),
-            "biography": data.get("biography"),
-            "profile_pic_url_hd": data.get("profile_pic_url_hd"),
-            "external_url": data.get("external_url"),
-            "is_private": data.get("is_private"),
-            "account_type": "Business" if data.get("is_business") else "Personal",
-            "posts": posts,
-            "status": "success"
-        }
+        return build_profile_record(data, posts)
     except requests.exceptions.RequestException as e:
-        return {
-            "username": username,
-            "error": True,
-            "status_code": getattr(e.response, 'status_code', None),
-            "message": str(e),
-            "status": "failed"
-        }
+        return build_failed_record(username, e)
@@ -0,0 +1,119 @@
+"""
+Concurrent fetch engine for Instagram scraping.
+Runs the profile, posts and per-post comment requests for many usernames at
+once on a bounded thread pool, with a global and a per-host concurrency limit.
+Records have the same shape as `fetch_instagram_data` returns.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
+
+from src.config.settings import FETCH_MAX_WORKERS, FETCH_PER_HOST_LIMIT
+from src.scraper.fetch_data import (
+    PROFILE_URL,
+    POSTS_URL,
+    COMMENTS_URL,
+    fetch_instagram_profile,
+    fetch_instagram_posts,
+    fetch_comments_for_post,
+    build_profile_record,
+    build_failed_record,
+    skip_unchanged_comments,
+)
+from src.utils.metrics import QUEUE_DEPTH
+
+
+class HostLimiter:
+    """Hands out one bounded semaphore per host so no host sees more than `limit` requests at once."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._slots.get(host)
+            if semaphore is None:
+                semaphore = self._slots[host] = threading.BoundedSemaphore(self.limit)
+        return semaphore
+
+
+class FetchEngine:
+    """Fetch many Instagram profiles, their posts and comments concurrently."""
+
+    def __init__(self, max_workers=FETCH_MAX_WORKERS, per_host_limit=FETCH_PER_HOST_LIMIT):
+        self.max_workers = max_workers
+        self.hosts = HostLimiter(per_host_limit)
+
+    def _call(self, url, func, *args):
+        with self.hosts.slot(url):
+            return func(*args)
+
+    def iter_fetch(self, usernames, seen_posts=None):
+        """Yield (username, record) pairs as soon as each profile is complete.
+
+        At most `max_workers` usernames are in flight at a time, so memory stays
+        bounded by the pool size rather than the roster size. `seen_posts` is an
+        optional callable mapping a username to the post counts seen on the last
+        crawl; when given, unchanged posts skip their comment requests.
+        A username listed more than once is fetched once.
+        """
+        usernames = iter(dict.fromkeys(usernames))
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fetch") as pool:
+            pending = {}  # future -> (kind, username, post)
+            jobs = {}  # username -> in-progress job state
+
+            def admit():
+                for username in usernames:
+                    jobs[username] = {"data": None, "posts": None, "error": None, "waiting": 2,
+                                      "seen": seen_posts(username) if seen_posts else None}
+                    pending[pool.submit(self._call, PROFILE_URL, fetch_instagram_profile, username)] = ("profile", username, None)
+                    pending[pool.submit(self._call, POSTS_URL, fetch_instagram_posts, username)] = ("posts", username, None)
+                    if len(jobs) >= self.max_workers:
+                        return
+
+            admit()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, username, post = pending.pop(future)
+                    job = jobs[username]
+                    job["waiting"] -= 1
+
+                    if kind == "profile":
+                        try:
+                            job["data"] = future.result()
+                        except requests.exceptions.RequestException as e:
+                            job["error"] = e
+                    elif kind == "posts":
+                        job["posts"] = future.result()
+                    else:
+                        post["comments"] = future.result()
+
+                    # Comments are only fetched once the profile exists, whichever request finished first
+                    if kind != "comments" and job["data"] is not None and job["posts"] is not None:
+                        for item in skip_unchanged_comments(job["posts"], job["seen"]):
+                            job["waiting"] += 1
+                            pending[pool.submit(self._call, COMMENTS_URL, fetch_comments_for_post, item["id"])] = ("comments", username, item)
+
+                    if job["waiting"] == 0:
+                        del jobs[username]
+                        if job["error"] is not None:
+                            yield username, build_failed_record(username, job["error"])
+                        else:
+                            yield username, build_profile_record(job["data"], job["posts"])
+                admit()
+                QUEUE_DEPTH.labels("fetch_requests").set(len(pending))
+
+    def fetch(self, usernames, seen_posts=None):
+        """Fetch all usernames and return a dict of username -> record."""
+        return dict(self.iter_fetch(usernames, seen_posts))
+
+
+def fetch_many_instagram_data(usernames, max_workers=FETCH_MAX_WORKERS, per_host_limit=FETCH_PER_HOST_LIMIT):
+    """Concurrent drop-in for calling `fetch_instagram_data` on each username."""
+    return FetchEngine(max_workers, per_host_limit).fetch(usernames)
@@ -0,0 +1,133 @@
+"""
+Shared HTTP client for the scraper APIs.
+Owns a pooled `requests.Session` so TCP+TLS connections are kept alive and
+reused across requests, and records how many handshakes that saved.
+Requests go through an optional RateLimiter and are retried with jittered
+exponential backoff on 429/503 and connection errors.
+"""
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config.settings import (
+    FETCH_PER_HOST_LIMIT,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_COMPRESSION,
+    HTTP_MAX_RETRIES,
+)
+from src.scraper.rate_limit import backoff_delay, retry_after_seconds
+from src.utils.metrics import HTTP_LATENCY, HTTP_REQUESTS, HTTP_RETRIES, HTTP_THROTTLED
+
+RETRY_STATUSES = (429, 503)
+
+
+class RapidAPIClient:
+    """Keep-alive HTTP client with default headers, timeouts and request stats."""
+
+    def __init__(self, headers=None, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                 compression=HTTP_COMPRESSION, pool_size=FETCH_PER_HOST_LIMIT,
+                 limiter=None, max_retries=HTTP_MAX_RETRIES):
+        self.timeout = timeout
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        if not compression:
+            self.session.headers["Accept-Encoding"] = "identity"
+
+        # One connection per concurrent request to a host, so workers never wait on the pool
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._retries = 0
+        self._throttled = 0
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        """Send a rate-limited GET, retrying throttled and failed attempts."""
+        endpoint = urlparse(url).path
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire(endpoint)
+            try:
+                response = self._send(url, params, timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                HTTP_REQUESTS.labels(endpoint, "error").inc()
+                if attempt >= self.max_retries:
+                    raise
+                self._count_retry(throttled=False)
+                HTTP_RETRIES.labels(endpoint, "connection").inc()
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            HTTP_REQUESTS.labels(endpoint, response.status_code).inc()
+            HTTP_LATENCY.labels(endpoint).observe(response.elapsed.total_seconds())
+            if response.status_code == 429:
+                HTTP_THROTTLED.labels(endpoint).inc()
+            if self.limiter is not None:
+                self.limiter.observe(endpoint, response.headers)
+            if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                return response
+
+            self._count_retry(throttled=response.status_code == 429)
+            HTTP_RETRIES.labels(endpoint, response.status_code).inc()
+            if self.limiter is not None:
+                # The pause makes the next acquire() wait, for every thread on this endpoint
+                self.limiter.throttled(endpoint, response.headers, attempt)
+            else:
+                delay = retry_after_seconds(response.headers)
+                time.sleep(delay if delay is not None else backoff_delay(attempt))
+            attempt += 1
+
+    def _count_retry(self, throttled):
+        with self._lock:
+            self._retries += 1
+            self._throttled += throttled
+
+    def _send(self, url, params, timeout, **kwargs):
+        """Send a GET through the pooled session and record its latency."""
+        start = time.perf_counter()
+        try:
+            return self.session.get(url, params=params, timeout=timeout or self.timeout, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._requests += 1
+                self._total_latency += elapsed
+                self._max_latency = max(self._max_latency, elapsed)
+
+    def _connections_opened(self):
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def stats(self):
+        """Return request count, connections opened, handshakes avoided, latency and retries."""
+        with self._lock:
+            requests_sent = self._requests
+            total_latency = self._total_latency
+            max_latency = self._max_latency
+            retries = self._retries
+            throttled = self._throttled
+        connections = self._connections_opened()
+        return {
+            "requests": requests_sent,
+            "connections_opened": connections,
+            "handshakes_avoided": max(requests_sent - connections, 0),
+            "avg_latency_ms": round(total_latency / requests_sent * 1000, 1) if requests_sent else 0.0,
+            "max_latency_ms": round(max_latency * 1000, 1),
+            "retries": retries,
+            "throttled": throttled,
+        }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,311 @@
+"""
+Media downloads into a content-addressed local store.
+Profile pictures, post thumbnails and tweet media are fetched concurrently
+(bounded per CDN host) and saved under MEDIA_DIR as
+`<ab>/<cd>/<sha256><ext>`, so the same image posted by several accounts is
+stored once. A SQLite index maps each URL to its file with the ETag /
+Last-Modified it was served with: files younger than MEDIA_REFRESH_HOURS
+are used as they are, older ones are revalidated with a conditional GET,
+and a URL that has since expired on the CDN keeps its last copy. When the
+store grows past MEDIA_MAX_MB the least recently used files are evicted.
+
+    python -m src.scraper.media --limit 1000     # download media for stored profiles and posts
+"""
+import argparse
+import hashlib
+import mimetypes
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config.db import get_db
+from src.config.settings import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    MEDIA_DIR,
+    MEDIA_MAX_FILE_MB,
+    MEDIA_MAX_MB,
+    MEDIA_PER_HOST_LIMIT,
+    MEDIA_REFRESH_HOURS,
+    MEDIA_WORKERS,
+    TWITTER_DB_NAME,
+)
+from src.scraper.fetch_engine import HostLimiter
+from src.scraper.save_to_db import TWEET_COLLECTION
+from src.utils.logger import get_logger
+from src.utils import metrics
+
+log = get_logger(__name__)
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS blobs (
+        hash TEXT PRIMARY KEY,
+        ext TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        content_type TEXT,
+        last_access REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access)",
+    """
+    CREATE TABLE IF NOT EXISTS urls (
+        url TEXT PRIMARY KEY,
+        hash TEXT NOT NULL REFERENCES blobs (hash) ON DELETE CASCADE,
+        etag TEXT,
+        last_modified TEXT,
+        fetched_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS urls_hash ON urls (hash)",
+    "CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO totals (id, bytes) VALUES (0, 0)",
+]
+
+# Reads refresh a file's LRU position at most this often, so serving a hot file rarely writes
+TOUCH_INTERVAL = 60
+# Evict down to this fraction of the limit, so eviction does not run on every download
+EVICT_TO = 0.9
+# Bytes read from a response at a time; a download over the file cap stops within one chunk of it
+READ_CHUNK = 64 * 1024
+
+MEDIA_DOWNLOADS = metrics.counter("media_downloads_total", "Media requests by outcome", ["outcome"])
+MEDIA_BYTES = metrics.gauge("media_store_bytes", "Bytes held in the media store")
+
+
+def media_urls(document):
+    """Every media URL on a stored profile or post (Instagram or Twitter)."""
+    urls = [document.get("profile_pic_url_hd"), document.get("thumbnail_url")]
+    for medium in document.get("media") or ():
+        urls.extend((medium.get("url"), medium.get("preview_url")))
+    return [url for url in urls if url]
+
+
+class MediaStore:
+    """Content-addressed files under `root`, indexed by URL, with byte-size LRU eviction."""
+
+    def __init__(self, root=MEDIA_DIR, max_bytes=MEDIA_MAX_MB * 2**20):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self._conn:
+            for sql in SCHEMA:
+                self._conn.execute(sql)
+
+    def blob_path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + ext)
+
+    def lookup(self, url):
+        """(path, etag, last_modified, fetched_at) for a stored URL, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT b.hash, b.ext, u.etag, u.last_modified, u.fetched_at FROM urls u JOIN blobs b ON b.hash = u.hash"
+                " WHERE u.url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        path = self.blob_path(row[0], row[1])
+        return (path, *row[2:]) if os.path.exists(path) else None
+
+    def path_for(self, url):
+        """Local file for `url` (marking it recently used), or None if it was never stored or is evicted."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT b.hash, b.ext, b.last_access FROM urls u JOIN blobs b ON b.hash = u.hash WHERE u.url = ?",
+                (url,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[2] > TOUCH_INTERVAL:
+                with self._conn:
+                    self._conn.execute("UPDATE blobs SET last_access = ? WHERE hash = ?", (now, row[0]))
+        path = self.blob_path(row[0], row[1])
+        return path if os.path.exists(path) else None
+
+    def put(self, url, body, content_type=None, etag=None, last_modified=None):
+        """Store `body` for `url` (once per distinct content) and return its path."""
+        digest = hashlib.sha256(body).hexdigest()
+        ext = mimetypes.guess_extension((content_type or "").split(";")[0].strip()) or ""
+        path = self.blob_path(digest, ext)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, path)  # Readers only ever see whole files
+        now = time.time()
+        with self._lock, self._conn:
+            added = self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (hash, ext, size, content_type, last_access) VALUES (?, ?, ?, ?, ?)",
+                (digest, ext, len(body), content_type, now)).rowcount
+            if added:
+                self._conn.execute("UPDATE totals SET bytes = bytes + ? WHERE id = 0", (len(body),))
+            else:
+                self._conn.execute("UPDATE blobs SET last_access = ? WHERE hash = ?", (now, digest))
+            self._conn.execute(
+                "INSERT INTO urls (url, hash, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (url) DO UPDATE SET hash = excluded.hash, etag = excluded.etag,"
+                " last_modified = excluded.last_modified, fetched_at = excluded.fetched_at",
+                (url, digest, etag, last_modified, now))
+        if added:
+            self.evict()
+        return path
+
+    def revalidated(self, url):
+        """Record a 304: the stored copy is current and recently used."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE urls SET fetched_at = ? WHERE url = ?", (now, url))
+            self._conn.execute("UPDATE blobs SET last_access = ? WHERE hash = (SELECT hash FROM urls WHERE url = ?)",
+                               (now, url))
+
+    def total_bytes(self):
+        with self._lock:
+            return self._conn.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+
+    def evict(self):
+        """Delete least recently used files until the store is under its size limit. Returns bytes freed."""
+        freed = 0
+        with self._lock:
+            total = self._conn.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+            if total <= self.max_bytes:
+                MEDIA_BYTES.set(total)
+                return 0
+            victims = []
+            for digest, ext, size in self._conn.execute("SELECT hash, ext, size FROM blobs ORDER BY last_access"):
+                if total - freed <= self.max_bytes * EVICT_TO:
+                    break
+                victims.append((digest, ext))
+                freed += size
+            with self._conn:
+                # Their URLs go too, so the next download is a plain GET rather than a 304 for a missing file
+                self._conn.executemany("DELETE FROM blobs WHERE hash = ?", [(digest,) for digest, _ in victims])
+                self._conn.execute("UPDATE totals SET bytes = bytes - ? WHERE id = 0", (freed,))
+            MEDIA_BYTES.set(total - freed)
+        for digest, ext in victims:
+            try:
+                os.remove(self.blob_path(digest, ext))
+            except FileNotFoundError:
+                pass
+        log.info("🧹 Evicted media", extra={"fields": {"files": len(victims), "bytes": freed}})
+        return freed
+
+    def close(self):
+        self._conn.close()
+
+
+class MediaFetcher:
+    """Download media URLs into a MediaStore on a bounded thread pool."""
+
+    def __init__(self, store=None, max_workers=MEDIA_WORKERS, per_host_limit=MEDIA_PER_HOST_LIMIT,
+                 refresh_hours=MEDIA_REFRESH_HOURS, max_file_bytes=MEDIA_MAX_FILE_MB * 2**20):
+        self.store = store or MediaStore()
+        # A plain keep-alive session: CDN URLs are unique per file, too many to label API metrics with
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=per_host_limit)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.max_workers = max_workers
+        self.hosts = HostLimiter(per_host_limit)
+        self.refresh_seconds = refresh_hours * 3600
+        self.max_file_bytes = max_file_bytes
+
+    def fetch(self, url):
+        """(outcome, path) for one URL; outcome is fresh, not_modified, downloaded, too_large or failed."""
+        known = self.store.lookup(url)
+        if known and time.time() - known[3] < self.refresh_seconds:
+            return "fresh", known[0]
+        headers = {}
+        if known:
+            path, etag, last_modified, _ = known
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        try:
+            with self.hosts.slot(url), self.session.get(url, headers=headers, stream=True,
+                                                        timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)) as response:
+                if response.status_code == 304 and known:
+                    self.store.revalidated(url)
+                    return "not_modified", known[0]
+                if response.status_code != 200:
+                    # An expired CDN link keeps serving the copy we already have
+                    return "failed", known[0] if known else None
+                body = self._read(response)
+        except requests.RequestException as e:
+            log.warning("⚠️ Media download failed", extra={"fields": {"url": url, "error": str(e)}})
+            return "failed", known[0] if known else None
+        if body is None:
+            return "too_large", None
+        path = self.store.put(url, body, response.headers.get("Content-Type"),
+                              response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return "downloaded", path
+
+    def _read(self, response):
+        """The response body, or None as soon as it is known to exceed max_file_bytes."""
+        length = response.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) > self.max_file_bytes:
+            return None
+        body = bytearray()
+        for chunk in response.iter_content(READ_CHUNK):
+            body += chunk
+            if len(body) > self.max_file_bytes:
+                return None
+        return bytes(body)
+
+    def fetch_many(self, urls):
+        """Fetch every distinct URL concurrently; returns ({url: path or None}, {outcome: count})."""
+        urls = list(dict.fromkeys(urls))
+        paths, outcomes = {}, {}
+        with metrics.span("fetch_media", urls=len(urls)), \
+                ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="media") as pool:
+            for url, (outcome, path) in zip(urls, pool.map(self.fetch, urls)):
+                paths[url] = path
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                MEDIA_DOWNLOADS.labels(outcome).inc()
+        return paths, outcomes
+
+
+def stored_media_urls(limit=None, tweets_db=None):
+    """Media URLs on stored profiles, then posts and tweets (newest first).
+
+    Tweets are read from every user_<id>_apiv2 collection in `tweets_db`
+    (default: TWITTER_DB_NAME on the application's client); `limit` applies
+    to profiles, posts and each tweet collection separately.
+    """
+    db = get_db()
+    tweets_db = tweets_db if tweets_db is not None else db.client[TWITTER_DB_NAME]
+    fields = {"profile_pic_url_hd": 1, "thumbnail_url": 1, "media.url": 1, "media.preview_url": 1}
+    urls = []
+    for profile in db.profiles.find({"profile_pic_url_hd": {"$ne": None}}, fields, limit=limit or 0):
+        urls.extend(media_urls(profile))
+    for post in db.posts.find({}, fields).sort("timestamp", -1).limit(limit or 0):
+        urls.extend(media_urls(post))
+    for name in sorted(tweets_db.list_collection_names()):
+        if TWEET_COLLECTION.match(name):
+            tweets = tweets_db[name].find({"media": {"$exists": True, "$ne": []}}, fields)
+            for tweet in tweets.sort("timestamp", -1).limit(limit or 0):
+                urls.extend(media_urls(tweet))
+    return urls
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download profile pictures, thumbnails and tweet media.")
+    parser.add_argument("--limit", type=int, help="Profiles, posts and tweets per account to scan (default: all)")
+    parser.add_argument("--workers", type=int, default=MEDIA_WORKERS)
+    args = parser.parse_args()
+
+    fetcher = MediaFetcher(max_workers=args.workers)
+    started = time.perf_counter()
+    paths, outcomes = fetcher.fetch_many(stored_media_urls(args.limit))
+    print(f"🖼️ {len(paths):,} media URLs in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{count:,} {outcome}" for outcome, count in sorted(outcomes.items())))
+    print(f"💾 Store holds {fetcher.store.total_bytes() / 2**20:,.1f} MiB in {fetcher.store.root}")
@@ -0,0 +1,145 @@
+"""
+Streaming Instagram pipeline: fetch -> batched DB writer (+ optional NDJSON sink).
+Records are yielded one page of posts at a time and handed straight to the
+BulkWriter, so memory stays flat however many posts a profile has, and every
+flushed batch survives a later failure.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.config.settings import FETCH_PER_HOST_LIMIT, POSTS_MAX_PAGES
+from src.scraper.fetch_data import (
+    fetch_instagram_profile,
+    fetch_comments_for_post,
+    iter_instagram_post_pages,
+    build_profile_record,
+    skip_unchanged_comments,
+)
+from src.scraper.crawl_state import (
+    load_crawl_state,
+    stored_latest_post,
+    post_counts,
+    newer_post,
+    crawl_state_document,
+)
+from src.scraper.rate_limit import QuotaExhausted
+from src.utils.logger import get_logger
+from src.utils.metrics import span
+
+log = get_logger(__name__)
+
+
+def iter_instagram_records(username, seen_posts=None, max_pages=POSTS_MAX_PAGES, pool=None,
+                           pagination_token=None, done_posts=None):
+    """Yield ("profile", record), then ("post", post) for every post, page by page.
+
+    After each page a ("page", {"cursor", "post_ids"}) marker is yielded so
+    callers can checkpoint. Comments for a page are fetched on `pool` when
+    given, skipping posts that are unchanged since `seen_posts` or that the
+    `done_posts(post_ids)` callable reports as already saved. Raises
+    RequestException if the profile or a page of posts cannot be fetched,
+    and QuotaExhausted once the monthly API quota is used up.
+    """
+    profile = build_profile_record(fetch_instagram_profile(username), posts=[])
+    del profile["posts"]
+    yield "profile", profile
+
+    fetch = pool.map if pool is not None else map
+    for page, next_token in iter_instagram_post_pages(username, max_pages, pagination_token):
+        to_fetch = skip_unchanged_comments(page, seen_posts)
+        if done_posts is not None:
+            done = done_posts(post["id"] for post in to_fetch)
+            for post in to_fetch:
+                if post["id"] in done:
+                    post.pop("comments", None)
+            to_fetch = [post for post in to_fetch if post["id"] not in done]
+        for post, comments in zip(to_fetch, fetch(fetch_comments_for_post, [post["id"] for post in to_fetch])):
+            post["comments"] = comments
+        for post in page:
+            yield "post", post
+        yield "page", {"cursor": next_token, "post_ids": [post["id"] for post in page]}
+
+
+def stream_instagram(usernames, writer, sink=None, incremental=True, max_pages=POSTS_MAX_PAGES,
+                     max_workers=FETCH_PER_HOST_LIMIT, job=None, tracker=None):
+    """Stream every username's profile and posts into `writer` (and `sink`).
+
+    With a CrawlJob, finished accounts are skipped, each account resumes from
+    its saved pagination cursor, and progress is checkpointed after every page
+    once that page is flushed. An EngagementTracker, when given, receives
+    every post to keep the precomputed metrics current. Returns counts of profiles saved, profiles
+    failed and posts written. Stops by raising QuotaExhausted once the monthly API quota is used up;
+    the account being crawled keeps its job cursor and is resumed by the next run.
+    """
+    if job is not None:
+        job.add_accounts(usernames)
+        usernames = job.pending_accounts()
+
+    stats = {"profiles": 0, "failed": 0, "posts": 0}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="comments") as pool:
+        for username in usernames:
+            with span("stream_profile", username=username):
+                state = load_crawl_state(username)
+                seen_posts = state.get("posts", {})
+                start_token = job.account_cursor(username) if job is not None else None
+                done_posts = job.done_posts if job is not None else None
+                # A resumed account skips its newest pages, so keep the stored high-water mark in play
+                profile, posts_seen = None, {}
+                latest = stored_latest_post(state) if start_token is not None else None
+                if tracker is not None:
+                    tracker.replay(state.get("pending_metrics"))  # Deltas of a crawl that stopped after its state
+                try:
+                    records = iter_instagram_records(username, seen_posts if incremental else None,
+                                                     max_pages, pool, start_token, done_posts)
+                    for kind, record in records:
+                        if kind == "page":
+                            if job is not None:
+                                _flush(writer, sink)
+                                job.save_page(username, record["cursor"], record["post_ids"])
+                            continue
+                        if kind == "profile":
+                            profile = record
+                            writer.add_profile(record)
+                        else:
+                            writer.add_post(profile["username"], record)
+                            if tracker is not None:
+                                tracker.record_post(profile["username"], record, seen_posts)
+                            posts_seen[record["id"]] = post_counts(record)
+                            latest = newer_post(latest, record)
+                            stats["posts"] += 1
+                        if sink is not None:
+                            sink.write({"type": kind, "username": username, **record})
+                except requests.exceptions.RequestException as e:
+                    log.error("❌ Failed to fetch profile", extra={"fields": {"username": username, "error": str(e)}})
+                    if job is not None:
+                        job.fail_account(username, e)
+                    if tracker is not None and profile is not None:
+                        tracker.discard(profile["username"])
+                    stats["failed"] += 1
+                    continue
+                except QuotaExhausted:
+                    log.warning("⏸️ API quota exhausted, stopping", extra={"fields": {"username": username, **stats}})
+                    if tracker is not None and profile is not None:
+                        tracker.discard(profile["username"])
+                    raise
+
+                state = crawl_state_document(profile.get("follower_count"), posts_seen, latest)
+                if tracker is not None:
+                    tracker.finish_profile(profile["username"], profile.get("follower_count"), state, username)
+                else:
+                    writer.add_crawl_state(username, state)
+                if job is not None:
+                    _flush(writer, sink)
+                    job.finish_account(username)
+                elif sink is not None:
+                    sink.flush()
+                stats["profiles"] += 1
+                log.info("✅ Profile streamed", extra={"fields": {"username": username, "posts": len(posts_seen)}})
+    return stats
+
+
+def _flush(writer, sink):
+    writer.flush()
+    if sink is not None:
+        sink.flush()
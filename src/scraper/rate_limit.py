@@ -0,0 +1,298 @@
+"""
+Rate limiting shared by the RapidAPI (Instagram) and Twitter backends.
+Each backend has a token bucket per endpoint, a monthly quota counter, and
+helpers that read `Retry-After` / `x-ratelimit-*` headers and compute
+jittered exponential backoff between retries. `RateLimiter.share` moves a
+limiter's state into shared memory so worker processes draw from one budget.
+"""
+import functools
+import multiprocessing
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from src.config.settings import (
+    RAPIDAPI_RATE_PER_SEC,
+    RAPIDAPI_BURST,
+    RAPIDAPI_MONTHLY_QUOTA,
+    TWITTER_RATE_PER_SEC,
+    TWITTER_BURST,
+    TWITTER_MONTHLY_QUOTA,
+    BACKOFF_BASE,
+    BACKOFF_CAP,
+)
+from src.utils.metrics import HTTP_LATENCY, HTTP_REQUESTS
+
+
+class QuotaExhausted(Exception):
+    """Raised instead of sending a request once the monthly quota is used up.
+
+    Not a RequestException: handlers that skip a failed post or account would
+    just hit it again on the next one, so crawls stop (or defer) instead.
+    """
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate if self.rate > 0 else 1.0
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold every caller for `seconds`, e.g. after a 429 or an exhausted window."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket whose state lives in shared memory, for use across worker processes.
+
+    Pass it to workers when they are created (e.g. as a pool initializer argument).
+    """
+
+    def __init__(self, rate, capacity, context=multiprocessing):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        # tokens, last refill, paused until (time.monotonic is system-wide)
+        self._state = context.Array("d", [float(self.capacity), time.monotonic(), 0.0])
+        self._lock = self._state.get_lock()
+
+    _tokens = property(lambda self: self._state[0], lambda self, value: self._state.__setitem__(0, value))
+    _updated = property(lambda self: self._state[1], lambda self, value: self._state.__setitem__(1, value))
+    _paused_until = property(lambda self: self._state[2], lambda self, value: self._state.__setitem__(2, value))
+
+
+class QuotaTracker:
+    """Count requests against a monthly quota. A limit of 0 means unlimited."""
+
+    def __init__(self, monthly_limit=0):
+        self.monthly_limit = monthly_limit
+        self._month = None
+        self._used = 0
+        self._remaining = None  # Last value reported by the API, if any
+        self._lock = threading.Lock()
+
+    def _roll(self):
+        month = datetime.now(timezone.utc).strftime("%Y-%m")
+        if month != self._month:
+            self._month, self._used, self._remaining = month, 0, None
+
+    def consume(self):
+        """Count one request, or raise QuotaExhausted if none are left."""
+        with self._lock:
+            self._roll()
+            if self._remaining is not None and self._remaining <= 0:
+                raise QuotaExhausted(f"Monthly quota exhausted ({self._used} requests this month)")
+            if self.monthly_limit and self._used >= self.monthly_limit:
+                raise QuotaExhausted(f"Monthly quota of {self.monthly_limit} requests reached")
+            self._used += 1
+            if self._remaining is not None:
+                self._remaining -= 1
+
+    def sync(self, remaining, limit=None):
+        """Adopt the remaining/limit figures the API reported."""
+        with self._lock:
+            self._roll()
+            self._remaining = remaining
+            if limit:
+                self.monthly_limit = limit
+                self._used = max(limit - remaining, 0)
+
+    def stats(self):
+        with self._lock:
+            self._roll()
+            return {"month": self._month, "used": self._used,
+                    "limit": self.monthly_limit, "remaining": self._remaining}
+
+
+class SharedQuotaTracker(QuotaTracker):
+    """QuotaTracker counting in shared memory, so worker processes share one monthly quota."""
+
+    def __init__(self, monthly_limit=0, context=multiprocessing):
+        # limit, used, remaining (-1 = not reported), month as YYYYMM
+        self._shared = context.Array("d", [monthly_limit, 0, -1, 0])
+        self._lock = self._shared.get_lock()
+
+    @property
+    def monthly_limit(self):
+        return int(self._shared[0])
+
+    @monthly_limit.setter
+    def monthly_limit(self, value):
+        self._shared[0] = value
+
+    @property
+    def _used(self):
+        return int(self._shared[1])
+
+    @_used.setter
+    def _used(self, value):
+        self._shared[1] = value
+
+    @property
+    def _remaining(self):
+        return None if self._shared[2] < 0 else int(self._shared[2])
+
+    @_remaining.setter
+    def _remaining(self, value):
+        self._shared[2] = -1 if value is None else value
+
+    @property
+    def _month(self):
+        month = int(self._shared[3])
+        return f"{month // 100}-{month % 100:02d}" if month else None
+
+    def _roll(self):
+        month = int(datetime.now(timezone.utc).strftime("%Y%m"))
+        if month != self._shared[3]:
+            self._shared[3], self._shared[1], self._shared[2] = month, 0, -1
+
+
+def _header_int(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(float(value))
+            except ValueError:
+                continue
+    return None
+
+
+def _reset_seconds(value):
+    """Reset headers carry either seconds-until-reset or an epoch timestamp."""
+    if value is None:
+        return None
+    if value > 1_000_000_000:
+        return max(value - time.time(), 0)
+    return max(value, 0)
+
+
+def retry_after_seconds(headers):
+    """Seconds the server asked us to wait via `Retry-After`, if present."""
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full-jitter exponential backoff for the given 0-based retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RateLimiter:
+    """Per-endpoint token buckets and a monthly quota for one API backend."""
+
+    def __init__(self, name, rate, burst, monthly_quota=0):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.quota = QuotaTracker(monthly_quota)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, endpoint):
+        with self._lock:
+            bucket = self._buckets.get(endpoint)
+            if bucket is None:
+                bucket = self._buckets[endpoint] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def share(self, endpoints, context=multiprocessing):
+        """Move the quota and the buckets for `endpoints` into shared memory.
+
+        Returns the state to hand to worker processes' `use_shared`. Endpoints
+        not listed keep a per-process bucket.
+        """
+        quota = SharedQuotaTracker(self.quota.monthly_limit, context)
+        buckets = {endpoint: SharedTokenBucket(self.rate, self.burst, context) for endpoint in endpoints}
+        self.use_shared((quota, buckets))
+        return quota, buckets
+
+    def use_shared(self, shared):
+        """Adopt state created by `share` in another process."""
+        quota, buckets = shared
+        with self._lock:
+            self.quota = quota
+            self._buckets.update(buckets)
+
+    def acquire(self, endpoint):
+        """Wait for a token on `endpoint` and charge the monthly quota."""
+        self.bucket(endpoint).acquire()
+        self.quota.consume()
+
+    def limited(self, endpoint, func):
+        """Wrap an API call (e.g. a Tweepy client method) so each call acquires a token first."""
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            self.acquire(endpoint)
+            start, status = time.perf_counter(), "error"
+            try:
+                result = func(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                HTTP_REQUESTS.labels(endpoint, status).inc()
+                HTTP_LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+        return call
+
+    def observe(self, endpoint, headers):
+        """Update buckets and quota from a response's rate-limit headers."""
+        # RapidAPI reports the plan quota as x-ratelimit-requests-*
+        remaining = _header_int(headers, "x-ratelimit-requests-remaining")
+        if remaining is not None:
+            self.quota.sync(remaining, _header_int(headers, "x-ratelimit-requests-limit"))
+
+        # Short-window limits: RapidAPI x-ratelimit-*, Twitter x-rate-limit-*
+        remaining = _header_int(headers, "x-ratelimit-remaining", "x-rate-limit-remaining")
+        if remaining is not None and remaining <= 0:
+            reset = _reset_seconds(_header_int(headers, "x-ratelimit-reset", "x-rate-limit-reset"))
+            if reset:
+                self.bucket(endpoint).pause(reset)
+
+    def throttled(self, endpoint, headers, attempt):
+        """Pause `endpoint` after a 429/503 and return how long callers will wait."""
+        delay = retry_after_seconds(headers)
+        if delay is None:
+            delay = backoff_delay(attempt)
+        self.bucket(endpoint).pause(delay)
+        return delay
+
+
+rapidapi_limiter = RateLimiter("rapidapi", RAPIDAPI_RATE_PER_SEC, RAPIDAPI_BURST, RAPIDAPI_MONTHLY_QUOTA)
+twitter_limiter = RateLimiter("twitter", TWITTER_RATE_PER_SEC, TWITTER_BURST, TWITTER_MONTHLY_QUOTA)
@@ -0,0 +1,318 @@
+"""
+Compact record model shared by the Instagram and Twitter scrapers.
+Profile / Post / Comment / Media are slotted dataclasses (no per-instance
+__dict__), built by one normalizer per source so both scrapers hand the same
+shapes to BulkWriter and the sinks. `as_dict` drops empty fields (or keeps
+them as None for stores that must clear them), and
+`dumps` / `packb` encode with orjson / msgpack when installed.
+"""
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Record:
+    __slots__ = ()
+
+    def as_dict(self, keep_empty=False):
+        """Fields that hold a value, with nested records converted too.
+
+        With `keep_empty`, empty fields that the record's source provides (see
+        SOURCE_FIELDS) are kept as None, so a store can clear values a previous
+        crawl saved (BulkWriter turns them into $unset).
+        """
+        provided = SOURCE_FIELDS.get((getattr(self, "source", None), type(self)), ()) if keep_empty else ()
+        document = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is None or value == ():
+                if name in provided:
+                    document[name] = None
+                continue
+            if isinstance(value, tuple) and isinstance(value[0], Record):
+                value = [item.as_dict() for item in value]
+            document[name] = value
+        return document
+
+
+@dataclass(slots=True)
+class Media(Record):
+    key: str
+    type: str | None = None
+    url: str | None = None
+    preview_url: str | None = None
+    duration_ms: int | None = None
+    view_count: int | None = None
+    alt_text: str | None = None
+
+
+@dataclass(slots=True)
+class Reference(Record):
+    """A tweet that a tweet replies to, quotes or retweets."""
+    type: str
+    id: str
+    text: str | None = None
+    author_id: str | None = None
+    author_username: str | None = None
+
+
+@dataclass(slots=True)
+class Profile(Record):
+    source: str
+    username: str
+    id: str | None = None
+    full_name: str | None = None
+    follower_count: int | None = None
+    following_count: int | None = None
+    media_count: int | None = None
+    is_verified: bool | None = None
+    is_private: bool | None = None
+    category: str | None = None
+    biography: str | None = None
+    external_url: str | None = None
+    profile_pic_url_hd: str | None = None
+    account_type: str | None = None
+
+
+@dataclass(slots=True)
+class Post(Record):
+    source: str
+    id: str
+    username: str | None = None
+    caption: str | None = None
+    timestamp: int | None = None  # Epoch seconds
+    like_count: int | None = None
+    comment_count: int | None = None
+    share_count: int | None = None
+    view_count: int | None = None
+    code: str | None = None
+    thumbnail_url: str | None = None
+    lang: str | None = None
+    conversation_id: str | None = None
+    referenced: tuple = ()  # Reference records (replies, quotes, retweets)
+    media: tuple = ()
+    # Twitter only
+    author_id: str | None = None
+    author_name: str | None = None
+    author_verified: bool | None = None
+    in_reply_to_user_id: str | None = None
+    source_app: str | None = None  # Client the tweet was posted from (the API's `source`)
+    entities: dict | None = None  # Hashtags, mentions, URLs and cashtags as the API sends them
+
+
+@dataclass(slots=True)
+class Comment(Record):
+    source: str
+    post_id: str
+    id: str | None = None
+    user: str | None = None
+    text: str | None = None
+    like_count: int | None = None
+    created_at: int | None = None  # Epoch seconds
+
+
+# Fields each source's normalizer fills in; the rest of a record's slots never hold its data
+SOURCE_FIELDS = {
+    ("instagram", Profile): frozenset(Profile.__slots__),
+    ("instagram", Post): frozenset(("id", "code", "thumbnail_url", "like_count", "comment_count", "caption",
+                                    "timestamp")),
+    ("instagram", Comment): frozenset(Comment.__slots__),
+    ("twitter", Post): frozenset(Post.__slots__) - {"code", "thumbnail_url"},
+}
+
+
+def epoch(value):
+    """datetime -> epoch seconds (naive values are UTC, as MySQL and the APIs send them)."""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return value
+
+
+def _str(value):
+    return str(value) if value is not None else None
+
+
+# --- Instagram (RapidAPI) ---
+
+def instagram_profile(data):
+    return Profile(
+        source="instagram",
+        username=data.get("username"),
+        id=_str(data.get("id")),
+        full_name=data.get("full_name"),
+        follower_count=data.get("follower_count"),
+        following_count=data.get("following_count"),
+        media_count=data.get("media_count"),
+        is_verified=data.get("is_verified"),
+        is_private=data.get("is_private"),
+        category=data.get("category"),
+        biography=data.get("biography"),
+        external_url=data.get("external_url"),
+        profile_pic_url_hd=data.get("profile_pic_url_hd"),
+        account_type="Business" if data.get("is_business") else "Personal",
+    )
+
+
+def instagram_post(post):
+    caption = post.get("caption")
+    return Post(
+        source="instagram",
+        id=_str(post.get("id")),
+        code=post.get("code"),
+        thumbnail_url=post.get("thumbnail_url"),
+        like_count=post.get("like_count") or 0,
+        comment_count=post.get("comment_count") or 0,
+        caption=(caption.get("text") if isinstance(caption, dict) else None) or "",
+        timestamp=post.get("taken_at_timestamp"),
+    )
+
+
+def instagram_comment(post_id, comment):
+    return Comment(
+        source="instagram",
+        post_id=_str(post_id),
+        id=_str(comment.get("id") or comment.get("pk")),
+        user=(comment.get("user") or {}).get("username", "Unknown"),
+        text=comment.get("text", "No text"),
+        like_count=comment.get("like_count"),
+        created_at=comment.get("created_at"),
+    )
+
+
+# --- Twitter (Tweepy API v2 objects) ---
+
+def tweet_media(medium):
+    metrics = getattr(medium, "public_metrics", None) or {}
+    return Media(
+        key=medium.media_key,
+        type=medium.type,
+        url=getattr(medium, "url", None),
+        preview_url=getattr(medium, "preview_image_url", None),
+        duration_ms=getattr(medium, "duration_ms", None),
+        view_count=metrics.get("view_count"),
+        alt_text=getattr(medium, "alt_text", None),
+    )
+
+
+def tweet_counts(metrics):
+    """like/comment/share/view counts from a tweet's public_metrics."""
+    metrics = metrics or {}
+    return {
+        "like_count": metrics.get("like_count"),
+        "comment_count": metrics.get("reply_count"),
+        "share_count": (metrics.get("retweet_count") or 0) + (metrics.get("quote_count") or 0) if metrics else None,
+        "view_count": metrics.get("impression_count"),
+    }
+
+
+def tweet_reference(ref, tweets=None, users=None):
+    """A referenced tweet, with its text and author when the `referenced_tweets.id` expansions included them."""
+    referenced = (tweets or {}).get(ref.id)
+    author = (users or {}).get(referenced.author_id) if referenced else None
+    return Reference(
+        type=ref.type,
+        id=str(ref.id),
+        text=referenced.text if referenced else None,
+        author_id=_str(referenced.author_id) if referenced else None,
+        author_username=author.username if author else None,
+    )
+
+
+def tweet_post(tweet, users=None, media=None, tweets=None):
+    """Normalize a Tweepy Tweet; `users` / `media` / `tweets` are the response includes keyed by id / media_key."""
+    author = (users or {}).get(tweet.author_id)
+    media_keys = (tweet.attachments or {}).get("media_keys", [])
+    return Post(
+        source="twitter",
+        id=str(tweet.id),
+        username=author.username if author else None,
+        caption=tweet.text,
+        timestamp=epoch(tweet.created_at),
+        **tweet_counts(tweet.public_metrics),
+        lang=tweet.lang,
+        conversation_id=_str(tweet.conversation_id),
+        referenced=tuple(tweet_reference(ref, tweets, users) for ref in tweet.referenced_tweets or ()),
+        media=tuple(tweet_media(media[key]) for key in media_keys if key in (media or {})),
+        author_id=_str(tweet.author_id),
+        author_name=author.name if author else None,
+        author_verified=getattr(author, "verified", None),
+        in_reply_to_user_id=_str(tweet.in_reply_to_user_id),
+        source_app=tweet.source,
+        entities=tweet.entities or None,
+    )
+
+
+def legacy_tweet(document):
+    """Rebuild a tweet stored in the layout used before records (text, public_metrics, attachments, ...)."""
+    return Post(
+        source="twitter",
+        id=str(document["_id"]),
+        username=document.get("author_username"),
+        caption=document.get("text"),
+        timestamp=epoch(document.get("created_at")),
+        **tweet_counts(document.get("public_metrics")),
+        lang=document.get("language"),
+        conversation_id=document.get("conversation_id"),
+        referenced=tuple(Reference(type=ref["type"], id=str(ref["id"]), text=ref.get("text"),
+                                   author_id=ref.get("author_id"), author_username=ref.get("author_username"))
+                         for ref in document.get("referenced_tweets") or ()),
+        media=tuple(Media(key=medium["media_key"], type=medium.get("type"), url=medium.get("url"),
+                          preview_url=medium.get("preview_image_url"), duration_ms=medium.get("duration_ms"),
+                          view_count=(medium.get("public_metrics") or {}).get("view_count"),
+                          alt_text=medium.get("alt_text"))
+                    for medium in document.get("attachments") or ()),
+        author_id=document.get("author_id"),
+        author_name=document.get("author_name"),
+        author_verified=document.get("author_verified"),
+        in_reply_to_user_id=document.get("in_reply_to_user_id"),
+        source_app=document.get("source"),
+        entities=document.get("entities"),
+    )
+
+
+# --- Serialization ---
+
+def _plain(value):
+    return value.as_dict() if isinstance(value, Record) else value
+
+
+def dumps(value):
+    """Encode a record, dict or list of them as JSON bytes (orjson when installed)."""
+    if isinstance(value, list):
+        value = [_plain(item) for item in value]
+    else:
+        value = _plain(value)
+    if orjson is not None:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, ensure_ascii=False, default=str).encode()
+
+
+def packb(value):
+    """Encode a record, dict or list of them as msgpack bytes."""
+    if msgpack is None:
+        raise RuntimeError("msgpack encoding needs msgpack: pip install msgpack")
+    if isinstance(value, list):
+        value = [_plain(item) for item in value]
+    return msgpack.packb(_plain(value), default=str, use_bin_type=True)
+
+
+def from_dict(cls, document):
+    """Rebuild a record from `as_dict` output (e.g. a decoded NDJSON line)."""
+    values = {name: document[name] for name in cls.__slots__ if name in document}
+    if "media" in values:
+        values["media"] = tuple(Media(**item) for item in values["media"])
+    if "referenced" in values:
+        values["referenced"] = tuple(Reference(**item) for item in values["referenced"])
+    return cls(**values)
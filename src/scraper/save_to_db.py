@@ -1,16 +1,304 @@
+import hashlib
+import json
+import re
+import time
+from collections import Counter, defaultdict
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from src.config.db import get_db
+from src.config.settings import (WRITE_BATCH_SIZE, COMMENT_PREVIEW_SIZE, DEDUP_ENABLED, DEDUP_CACHE_SIZE,
+                                 DEDUP_CACHE_TTL)
+from src.database.cache import LRUCache, MISSING, query_cache
+from src.scraper.records import Profile, Post, Comment, orjson
+from src.utils.metrics import DB_BATCH_LATENCY, DB_OPERATIONS, DB_WRITE_ERRORS, DB_WRITES_SKIPPED
+
+# Collections whose records carry a content_hash (-> the field they are keyed by); partial updates clear it
+HASHED_COLLECTIONS = {"profiles": "username", "posts": "_id", "comments": "_id"}
+
+# Per-account tweet collections written by src.scraper.twitter
+TWEET_COLLECTION = re.compile(r"^user_\d+_apiv2$")
+
+# Collections of $inc deltas that a crawl_state entry records; written after crawl_state
+DELTA_COLLECTIONS = ("profile_metrics", "engagement_rollups")
+
+# "<database>:<collection>:<key>" -> content hash of the last write this process made or read
+seen_hashes = LRUCache(DEDUP_CACHE_SIZE)
+
+
+def search_keys(profile):
+    """Lowercased username, full name and full-name words, for indexed prefix search."""
+    keys = set()
+    for value in (profile.get("username"), profile.get("full_name")):
+        if value:
+            value = value.lower()
+            keys.add(value)
+            keys.update(value.split())
+    return sorted(keys)
+
+
+def profile_document(data):
+    """Profile fields to store; posts live in their own collection."""
+    profile = {key: value for key, value in data.items() if key != "posts"}
+    profile["search_keys"] = search_keys(profile)
+    return profile
+
+
+def comment_id(comment, position=None):
+    """The API's comment id, or a stable hash of author and text for comments without one.
+
+    Pass the comment's `position` in a stored list to keep identical comments by one author apart.
+    """
+    if comment.get("id") is not None:
+        return str(comment["id"])
+    key = f"{comment.get('user')}\0{comment.get('text')}" + (f"\0{position}" if position is not None else "")
+    return hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+
+def content_hash(document):
+    """Stable 64-bit hash of a document's fields (key order does not matter)."""
+    if orjson is not None:
+        encoded = orjson.dumps(document, default=str, option=orjson.OPT_SORT_KEYS)
+    else:
+        encoded = json.dumps(document, default=str, sort_keys=True, separators=(",", ":")).encode()
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "big", signed=True)
+
+
+def comment_document(post_id, comment):
+    """A comments-collection document, keyed by (post_id, comment_id)."""
+    cid = comment_id(comment)
+    document = {key: value for key, value in comment.items() if key != "id"}
+    return {**document, "_id": f"{post_id}:{cid}", "post_id": post_id, "comment_id": cid}
+
+
+def comment_preview(comments):
+    """The first (most popular) comments, trimmed to author and text."""
+    return [{"user": comment.get("user"), "text": comment.get("text")} for comment in comments[:COMMENT_PREVIEW_SIZE]]
+
+
+def post_document(username, post):
+    """Post fields to store: the comments list is replaced by a top-N preview."""
+    document = {key: value for key, value in post.items() if key != "comments"}
+    document["username"] = username
+    if "comments" in post:
+        document["comment_preview"] = comment_preview(post["comments"])
+    return document
+
+
+class BulkWriter:
+    """Collect profile and post upserts and send them as unordered bulk_write batches.
+
+    A post's comments go to the comments collection (one upsert each, so a
+    re-crawl appends new comments and refreshes known ones); the post itself
+    only keeps its counts and a short preview. Cached query results for the
+    profiles, posts and comments in a batch are invalidated once it is written.
+
+    Profiles, posts, comments and documents are stored with a `content_hash`.
+    Before a batch is sent, records whose hash matches the stored one (read
+    back in one projected query per batch) are dropped, so an identical
+    re-crawl costs reads instead of writes; `totals()` and
+    db_writes_skipped_total count them. `seen_hashes` only spares the read for
+    records it already knows have changed. Off with DEDUP_ENABLED=false.
+    """
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, database=None, dedup=DEDUP_ENABLED):
+        self.batch_size = batch_size
+        self.db = database if database is not None else get_db()
+        self.dedup = dedup
+        self.batches = []  # One result dict per bulk_write call
+        self.skipped = Counter()  # collection -> unchanged records dropped
+        self._pending = {"profiles": [], "posts": []}  # collection -> [(operation, (key field, key, hash) or None)]
+        self._touched = defaultdict(set)  # collection -> usernames written; None inside = unknown
+
+    def add_profile(self, data):
+        profile = profile_document(data)
+        self._add_hashed("profiles", "username", profile["username"], profile, profile["username"])
+
+    def add_post(self, username, post):
+        self._add_hashed("posts", "_id", post["id"], post_document(username, post), username)
+        if post.get("comments"):
+            self.add_comments(post["id"], post["comments"])
+
+    def add_posts(self, username, posts):
+        for post in posts:
+            self.add_post(username, post)
+
+    def add_comments(self, post_id, comments):
+        for comment in comments:
+            document = comment_document(post_id, comment)
+            self._add_hashed("comments", "_id", document["_id"], document, post_id)
+
+    def add_record(self, record, collection=None):
+        """Queue a Profile, Post or Comment from src.scraper.records.
+
+        Posts go to `posts` unless another `collection` is given (e.g. a tweets
+        collection), where they are stored keyed by their id.
+        """
+        document = record.as_dict(keep_empty=True)
+        if isinstance(record, Profile):
+            self.add_profile(document)
+        elif isinstance(record, Post) and collection:
+            self.add_document(collection, {"_id": record.id, **document})
+        elif isinstance(record, Post):
+            self.add_post(record.username, document)
+        elif isinstance(record, Comment):
+            self.add_comments(record.post_id, [document])
+        else:
+            raise TypeError(f"Not a record: {record!r}")
+
+    def add_document(self, collection, document):
+        """Upsert any document keyed by its `_id` (e.g. tweets)."""
+        self._add_hashed(collection, "_id", document["_id"], document)
+
+    def add_update(self, collection, filter, update):
+        """Queue an arbitrary upserting update (e.g. $inc counters)."""
+        if collection in HASHED_COLLECTIONS:
+            # A partial update leaves the stored hash describing content that is no longer there
+            update = {**update, "$set": {**update.get("$set", {}), "content_hash": None}}
+            key = filter.get(HASHED_COLLECTIONS[collection])
+            if key is None or isinstance(key, dict):
+                # The filter doesn't name one record, so no cached hash can be trusted
+                seen_hashes.delete_prefix(f"{self.db.name}:{collection}:")
+            else:
+                seen_hashes.delete(f"{self.db.name}:{collection}:{key}")
+        self._add(collection, UpdateOne(filter, update, upsert=True))
+
+    def add_crawl_state(self, username, state):
+        """Upsert crawl state; its per-post counts are merged into the stored map, not replacing it."""
+        update = {key: value for key, value in state.items() if key != "posts"}
+        update.update({f"posts.{post_id}": counts for post_id, counts in state.get("posts", {}).items()})
+        self._add("crawl_state", UpdateOne({"_id": username}, {"$set": update}, upsert=True))
+
+    def _add_hashed(self, collection, key_field, key, document, username=None):
+        # None means "no value": clear what an earlier write stored instead of saving nulls
+        values = {name: value for name, value in document.items() if value is not None}
+        update = {"$set": values}
+        if len(values) < len(document):
+            update["$unset"] = {name: "" for name, value in document.items() if value is None}
+        if not self.dedup:
+            self._add(collection, UpdateOne({key_field: key}, update, upsert=True), username)
+            return
+        digest = content_hash(values)
+        update["$set"] = {**values, "content_hash": digest}
+        self._add(collection, UpdateOne({key_field: key}, update, upsert=True), username, (key_field, key, digest))
+
+    def _add(self, collection, operation, username=None, dedup=None):
+        self._pending.setdefault(collection, []).append((operation, dedup))
+        self._touched[collection].add(username)
+        if len(self._pending[collection]) >= self.batch_size:
+            if collection == "crawl_state" or collection in DELTA_COLLECTIONS:
+                # Write the posts a state entry vouches for before it, and the deltas it records after it
+                self.flush()
+            else:
+                self._flush(collection)
+
+    def _unchanged(self, collection, entries):
+        """Indexes of entries whose content hash matches the stored one.
+
+        A cached hash that differs proves the record changed, but one that
+        matches is confirmed against the stored document: another process (or
+        a manual fix) may have rewritten it since this one cached it.
+        """
+        prefix = f"{self.db.name}:{collection}:"
+        stored, confirm = {}, defaultdict(set)
+        for _, dedup in entries:
+            if dedup is not None:
+                key_field, key, digest = dedup
+                cached = seen_hashes.get(prefix + str(key))
+                if cached is MISSING or cached == digest:
+                    confirm[key_field].add(key)
+        for key_field, keys in confirm.items():
+            for document in self.db[collection].find({key_field: {"$in": list(keys)}},
+                                                     {key_field: 1, "content_hash": 1}):
+                stored[document[key_field]] = document.get("content_hash")
+                seen_hashes.set(prefix + str(document[key_field]), document.get("content_hash"), DEDUP_CACHE_TTL)
+        return {i for i, (_, dedup) in enumerate(entries)
+                if dedup is not None and stored.get(dedup[1], MISSING) == dedup[2]}
+
+    def _flush(self, collection):
+        entries, self._pending[collection] = self._pending[collection], []
+        if not entries:
+            return
+        if any(dedup is not None for _, dedup in entries):
+            unchanged = self._unchanged(collection, entries)
+            if unchanged:
+                self.skipped[collection] += len(unchanged)
+                DB_WRITES_SKIPPED.labels(collection).inc(len(unchanged))
+                entries = [entry for i, entry in enumerate(entries) if i not in unchanged]
+            if not entries:
+                self._touched.pop(collection, None)
+                return
+        operations = [operation for operation, _ in entries]
+        batch = {"collection": collection, "operations": len(operations),
+                 "matched": 0, "modified": 0, "upserted": 0, "errors": 0}
+        start = time.perf_counter()
+        try:
+            result = self.db[collection].bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            batch["errors"] = len(details.get("writeErrors", []))
+            DB_WRITE_ERRORS.labels(collection).inc(batch["errors"])
+        failed = {error["index"] for error in details.get("writeErrors", [])}
+        for i, (_, dedup) in enumerate(entries):
+            if dedup is not None and i not in failed:
+                seen_hashes.set(f"{self.db.name}:{collection}:{dedup[1]}", dedup[2], DEDUP_CACHE_TTL)
+        DB_BATCH_LATENCY.labels(collection).observe(time.perf_counter() - start)
+        DB_OPERATIONS.labels(collection).inc(len(operations))
+        batch["matched"] = details.get("nMatched", 0)
+        batch["modified"] = details.get("nModified", 0)
+        batch["upserted"] = details.get("nUpserted", 0)
+        self.batches.append(batch)
+        invalidate_cached(collection, self._touched.pop(collection, set()))
+
+    def flush(self):
+        """Send everything still buffered: records, then crawl_state, then the deltas it records."""
+        order = {"crawl_state": 1, **{collection: 2 for collection in DELTA_COLLECTIONS}}
+        for collection in sorted(self._pending, key=lambda collection: order.get(collection, 0)):
+            self._flush(collection)
+
+    def totals(self):
+        """Sum the per-batch counts."""
+        totals = {"batches": len(self.batches), "operations": 0, "matched": 0,
+                  "modified": 0, "upserted": 0, "errors": 0, "skipped": sum(self.skipped.values())}
+        for batch in self.batches:
+            for key in ("operations", "matched", "modified", "upserted", "errors"):
+                totals[key] += batch[key]
+        return totals
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+
+def invalidate_cached(collection, usernames):
+    """Drop cached query results for the profiles/posts/comments just written (all of them if a key is unknown).
+
+    `usernames` holds post ids for the comments collection.
+    """
+    usernames = None if None in usernames else usernames
+    if collection == "profiles":
+        query_cache.invalidate_profiles(usernames)
+    elif collection == "posts":
+        query_cache.invalidate_posts(usernames)
+    elif collection == "comments":
+        query_cache.invalidate_comments(usernames)
 
-db = get_db()
 
 def save_profile(data):
-    """Insert or update a profile in MongoDB."""
-    db.profiles.update_one({"username": data["username"]}, {"$set": data}, upsert=True)
+    """Insert or update a profile in MongoDB (skipped when unchanged)."""
+    with BulkWriter() as writer:
+        writer.add_profile(data)
 
 def save_posts(username, posts):
     """Save Instagram posts along with comments."""
-    for post in posts:
-        db.posts.update_one({"_id": post["id"]}, {"$set": post}, upsert=True)
+    with BulkWriter() as writer:
+        writer.add_posts(username, posts)
 
 def save_comments(post_id, comments):
-    """Update comments for a specific post."""
-    db.posts.update_one({"_id": post_id}, {"$set": {"comments": comments}}, upsert=True)
+    """Append or refresh comments for a specific post and update its preview."""
+    with BulkWriter() as writer:
+        writer.add_comments(post_id, comments)
+        writer.add_update("posts", {"_id": post_id}, {"$set": {"comment_preview": comment_preview(comments)}})
@@ -0,0 +1,207 @@
+"""
+Crawl scheduler for tracked Instagram accounts.
+Every account in `tracked_accounts` gets a refresh interval from its follower
+count and recent engagement velocity (likes + comments per day over the last
+VELOCITY_DAYS of day rollups): busy accounts are refreshed as often as every
+REFRESH_MIN_HOURS, dormant ones as rarely as every REFRESH_MAX_HOURS.
+
+Accounts whose staleness has passed their interval are queued by how overdue
+they are and crawled by a pool of worker processes. The RapidAPI rate limiter
+is moved into shared memory first, so all workers draw from one per-endpoint
+budget and one monthly quota.
+
+    python scripts/run_scheduler.py --add zuck natgeo
+    python scripts/run_scheduler.py --workers 8
+"""
+import heapq
+import math
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+from src.config.db import get_db
+from src.config.settings import (
+    SCHEDULER_WORKERS,
+    SCHEDULER_TICK,
+    REFRESH_MIN_HOURS,
+    REFRESH_MAX_HOURS,
+    VELOCITY_DAYS,
+)
+from src.scraper.fetch_data import PROFILE_URL, POSTS_URL, COMMENTS_URL
+from src.scraper.pipeline import stream_instagram
+from src.scraper.rate_limit import QuotaExhausted, rapidapi_limiter
+from src.scraper.save_to_db import BulkWriter
+from src.analysis.engagement import EngagementTracker
+from src.utils.logger import get_logger
+from src.utils import metrics
+
+log = get_logger(__name__)
+
+
+def track(usernames):
+    """Add accounts to the schedule; already tracked ones are left alone."""
+    with BulkWriter() as writer:
+        for username in usernames:
+            writer.add_update("tracked_accounts", {"_id": username},
+                              {"$setOnInsert": {"added_at": datetime.now(timezone.utc)}})
+    return writer.totals()["upserted"]
+
+
+def untrack(usernames):
+    return get_db().tracked_accounts.delete_many({"_id": {"$in": list(usernames)}}).deleted_count
+
+
+def refresh_interval(follower_count, velocity):
+    """Seconds between crawls for an account with `velocity` interactions per day.
+
+    Each tenfold increase in velocity halves the interval, as does each
+    hundredfold increase in followers.
+    """
+    activity = math.log10(1 + max(velocity or 0, 0)) + 0.5 * math.log10(1 + max(follower_count or 0, 0))
+    return max(REFRESH_MIN_HOURS, REFRESH_MAX_HOURS * 2 ** -activity) * 3600
+
+
+def priority(staleness, interval):
+    """How overdue an account is: 1.0 means due now, never crawled is infinite."""
+    if staleness is None:
+        return math.inf
+    return staleness / interval
+
+
+def engagement_velocity(days=VELOCITY_DAYS):
+    """{username: likes + comments per day} from the last `days` of day rollups."""
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+    rows = get_db().engagement_rollups.aggregate([
+        {"$match": {"period": "day", "bucket": {"$gte": since}}},
+        {"$group": {"_id": "$username",
+                    "interactions": {"$sum": {"$add": [{"$ifNull": ["$likes", 0]}, {"$ifNull": ["$comments", 0]}]}}}},
+    ])
+    return {row["_id"]: row["interactions"] / days for row in rows}
+
+
+def _utc(value):
+    # PyMongo hands back naive UTC datetimes unless the client is tz_aware
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def plan(now=None, skip=()):
+    """Heap of (-priority, -followers, username) for every account that is due, except those in `skip`."""
+    now = now or datetime.now(timezone.utc)
+    db = get_db()
+    tracked = {doc["_id"]: doc for doc in db.tracked_accounts.find({}, {"last_attempt_at": 1})}
+    states = {doc["_id"]: doc for doc in db.crawl_state.find({"_id": {"$in": list(tracked)}},
+                                                             {"last_crawl_at": 1, "follower_count": 1})}
+    velocity = engagement_velocity()
+
+    queue = []
+    for username, account in tracked.items():
+        if username in skip:
+            continue  # Queued or being crawled already
+        state = states.get(username, {})
+        # A failed crawl waits a full interval too, rather than retrying every tick
+        crawled = [_utc(value) for value in (state.get("last_crawl_at"), account.get("last_attempt_at")) if value]
+        staleness = (now - max(crawled)).total_seconds() if crawled else None
+        followers = state.get("follower_count") or 0
+        score = priority(staleness, refresh_interval(followers, velocity.get(username, 0)))
+        if score >= 1:
+            queue.append((-score, -followers, username))
+    heapq.heapify(queue)
+    return queue
+
+
+def shared_endpoints():
+    """RapidAPI endpoint paths whose buckets the workers share."""
+    return [urlparse(url).path for url in (PROFILE_URL, POSTS_URL, COMMENTS_URL) if url]
+
+
+def init_worker(shared):
+    rapidapi_limiter.use_shared(shared)
+
+
+def crawl_account(username):
+    """Crawl one account incrementally; runs in a worker process."""
+    try:
+        with metrics.span("crawl_account", username=username), BulkWriter() as writer:
+            return stream_instagram([username], writer, tracker=EngagementTracker(writer))
+    finally:
+        metrics.write_textfile(process="scheduler-worker")
+
+
+class Scheduler:
+    """Keep `workers` processes busy crawling the most overdue accounts."""
+
+    def __init__(self, workers=SCHEDULER_WORKERS, tick=SCHEDULER_TICK):
+        self.workers = workers
+        self.tick = tick
+        self.stats = {"profiles": 0, "failed": 0, "posts": 0}
+        self.attempted = {}  # username -> time.monotonic() its last crawl finished
+        self.quota_exhausted = False
+
+    def run(self, once=False):
+        """Crawl due accounts until interrupted, or until the current due set is done with `once`.
+
+        Stops once the monthly API quota is used up, after the crawls in flight finish.
+        """
+        context = multiprocessing.get_context("spawn")
+        shared = rapidapi_limiter.share(shared_endpoints(), context)
+        planned_at, queue = time.monotonic(), plan()
+        log.info("📋 Accounts due", extra={"fields": {"accounts": len(queue), "workers": self.workers}})
+        metrics.serve()
+
+        running = {}
+        with ProcessPoolExecutor(self.workers, mp_context=context,
+                                 initializer=init_worker, initargs=(shared,)) as pool:
+            while True:
+                if not once and time.monotonic() - planned_at >= self.tick:
+                    planned_at, queue = time.monotonic(), plan(skip=set(running.values()))
+                if not self.quota_exhausted:
+                    self._submit_due(pool, queue, running, planned_at)
+                metrics.QUEUE_DEPTH.labels("scheduler_due").set(len(queue))
+                metrics.QUEUE_DEPTH.labels("scheduler_running").set(len(running))
+                if (once or self.quota_exhausted) and not running:
+                    break
+
+                if not running:
+                    time.sleep(self.tick)  # Nothing is due yet
+                    continue
+                done, _ = wait(running, timeout=self.tick, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._finished(running.pop(future), future)
+        return self.stats
+
+    def _submit_due(self, pool, queue, running, planned_at):
+        """Pop the most overdue accounts into `running` (future -> username).
+
+        A couple of tasks per worker queued ahead keeps every process busy.
+        Entries are only as current as the plan made at `planned_at`, so
+        accounts already submitted or crawled since then are dropped.
+        """
+        in_flight = set(running.values())
+        while queue and len(running) < self.workers * 2:
+            _, _, username = heapq.heappop(queue)
+            if username in in_flight or self.attempted.get(username, -math.inf) >= planned_at:
+                continue
+            running[pool.submit(crawl_account, username)] = username
+            in_flight.add(username)
+
+    def _finished(self, username, future):
+        self.attempted[username] = time.monotonic()
+        try:
+            stats = future.result()
+        except QuotaExhausted as e:
+            # Not the account's fault: it stays due and goes first once the quota resets
+            if not self.quota_exhausted:
+                log.warning("⏸️ API quota exhausted, stopping", extra={"fields": {"error": str(e)}})
+            self.quota_exhausted = True
+            return
+        except Exception as e:
+            log.error("❌ Crawl failed", extra={"fields": {"username": username, "error": str(e)}})
+            stats = {"failed": 1}
+        get_db().tracked_accounts.update_one({"_id": username},
+                                             {"$set": {"last_attempt_at": datetime.now(timezone.utc)}})
+        for key, value in stats.items():
+            self.stats[key] += value
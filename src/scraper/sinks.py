@@ -0,0 +1,35 @@
+"""
+Append-only NDJSON sink for scraped records.
+Each record (a dict or a src.scraper.records record) is written as one JSON
+line and the file is flushed every `flush_every` records, so a crash keeps
+nearly everything written before it and memory does not grow with the crawl.
+"""
+from src.scraper.records import dumps
+
+
+class NDJSONSink:
+    """Append records to a newline-delimited JSON file."""
+
+    def __init__(self, path, flush_every=100):
+        self.path = path
+        self.flush_every = flush_every
+        self.count = 0
+        self._file = open(path, "ab")
+
+    def write(self, record):
+        self._file.write(dumps(record) + b"\n")
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
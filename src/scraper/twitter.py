@@ -1,6 +1,7 @@
 import tweepy
-import json
+import argparse
 import os
+import sys
 import time
 from dotenv import load_dotenv
 from pprint import pprint
@@ -8,6 +9,20 @@ from pymongo import MongoClient, errors as pymongo_errors
 import traceback
 from datetime import datetime
 
+# Add project root to path to fix imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.config.settings import TWITTER_DB_NAME
+from src.scraper.rate_limit import twitter_limiter, QuotaExhausted
+from src.scraper.save_to_db import BulkWriter, TWEET_COLLECTION
+from src.scraper.sinks import NDJSONSink
+from src.scraper.checkpoints import CrawlJob
+from src.scraper.records import legacy_tweet, tweet_post
+from src.utils.logger import get_logger
+from src.utils import metrics
+
+log = get_logger(__name__)
+
 # --- Configuration ---
 
 # Load environment variables from .env file
@@ -38,8 +53,7 @@ RESULTS_PER_PAGE = min(MAX_TWEETS_TO_FETCH, 10) # Fetch fewer per page if max_tw
 # Reference: https://developer.twitter.com/en/docs/twitter-api/data-dictionary/object-model/tweet
 TWEET_FIELDS = [
     "created_at", "public_metrics", "author_id", "conversation_id",
-    "in_reply_to_user_id", "lang", "source", "referenced_tweets",
-    "attachments", "entities",
+    "in_reply_to_user_id", "lang", "source", "referenced_tweets", "attachments", "entities",
     # Add more fields as needed: "geo", "context_annotations", etc.
     # Check if your API access level permits requested fields.
 ]
@@ -57,55 +71,67 @@ USER_FIELDS = ["username", "name", "profile_image_url", "verified", "public_metr
 # Reference: https://developer.twitter.com/en/docs/twitter-api/data-dictionary/object-model/media
 MEDIA_FIELDS = ["media_key", "type", "url", "preview_image_url", "public_metrics", "duration_ms", "alt_text"]
 
+# Fields of the layout tweets were stored in before records; `--upgrade-stored` rewrites them
+# (`source` is not listed: records overwrite it with "twitter" and keep the client app in `source_app`)
+LEGACY_FIELDS = ["text", "created_at", "author_username", "language", "public_metrics", "referenced_tweets",
+                 "attachments"]
+
 
 # --- API Interaction & Data Processing ---
 
-def fetch_tweets_with_api_v2(bearer_token, user_id, max_tweets, results_per_page,
-                              tweet_fields, expansions, user_fields, media_fields):
+def iter_tweets_with_api_v2(bearer_token, user_id, max_tweets, results_per_page,
+                            tweet_fields, expansions, user_fields, media_fields,
+                            pagination_token=None, on_page=None):
     """
     Fetches tweets for a user ID using Tweepy and the Twitter API v2,
     handles pagination, rate limits gracefully (within reason), manages common API errors,
-    uses expansions, and structures data.
+    uses expansions, and yields each tweet as a compact Post record as its page arrives,
+    so callers can write them out without holding the whole timeline in memory.
+    Pass a saved `pagination_token` to resume; `on_page(next_token)` is called
+    after each page's tweets have been yielded so callers can checkpoint.
     """
     # Initialize Tweepy Client with Bearer Token
     # wait_on_rate_limit=True tells Tweepy to automatically wait if rate limited (HTTP 429)
     # NOTE: This might not save you from monthly quota limits, only short-term rate limits.
-    print("[*] Initializing Tweepy Client...")
+    log.info("Initializing Tweepy client")
     try:
         client = tweepy.Client(bearer_token, wait_on_rate_limit=True)
         # Verify authentication works by fetching basic user info (consumes API call)
-        print("[*] Verifying authentication...")
-        client.get_user(id=user_id)
-        print("[+] Authentication successful.")
+        log.info("Verifying authentication")
+        twitter_limiter.limited("users", client.get_user)(id=user_id)
+        log.info("Authentication successful")
     except tweepy.errors.TweepyException as e:
-        print(f"[!] Error initializing Tweepy client or authenticating: {e}")
-        print("[!] Check your Bearer Token and API access level.")
-        return []
+        log.error("Error initializing Tweepy client or authenticating; check your Bearer Token and API access level",
+                  extra={"fields": {"error": str(e)}})
+        return
+    except QuotaExhausted as e:
+        log.error("Quota exhausted, skipping fetch", extra={"fields": {"error": str(e)}})
+        return
     except Exception as e:
-        print(f"[!] An unexpected error occurred during client initialization: {e}")
-        return []
+        log.exception("Unexpected error during client initialization", extra={"fields": {"error": str(e)}})
+        return
 
-    tweets_data_for_db = []
     fetched_tweets_count = 0 # Keep track for logging
 
     # Ensure results_per_page is valid (5-100 for this endpoint)
     valid_results_per_page = max(5, min(100, results_per_page))
 
-    print(f"[*] Starting fetch for user ID: {user_id}. Target: {max_tweets} tweets.")
-    print(f"[*] Tweets per API page request: {valid_results_per_page}")
-    print("[!] WARNING: Free API tier limits are very strict. Fetch may stop early.")
+    log.info("Starting fetch (free API tier limits are very strict; the fetch may stop early)",
+             extra={"fields": {"user_id": user_id, "max_tweets": max_tweets, "page_size": valid_results_per_page}})
 
     # Use Tweepy's Paginator for easy handling of multiple pages
     # The Paginator's 'limit' parameter controls the TOTAL number of items (tweets) to return.
+    # Every page request waits on the shared Twitter token bucket and counts against the monthly quota
     paginator = tweepy.Paginator(
-        client.get_users_tweets,
+        twitter_limiter.limited("users_tweets", client.get_users_tweets),
         id=user_id,
         max_results=valid_results_per_page,
         tweet_fields=tweet_fields,
         expansions=expansions,
         user_fields=user_fields,
         media_fields=media_fields,
-        limit=max_tweets  # <-- CORRECTED: Let Paginator handle the total tweet limit
+        limit=max_tweets,  # <-- CORRECTED: Let Paginator handle the total tweet limit
+        pagination_token=pagination_token  # Resume point from a checkpoint, if any
     )
 
     try:
@@ -114,120 +140,95 @@ def fetch_tweets_with_api_v2(bearer_token, user_id, max_tweets, results_per_page
         # or there are no more tweets from the API.
         for response in paginator:
             page_count += 1
-            print(f"[*] Processing page {page_count}...")
+            log.debug("Processing page", extra={"fields": {"page": page_count}})
 
             # --- Log API Errors/Warnings ---
             if response.errors:
-                print(f"[!] API Errors/Warnings on page {page_count}:")
                 for error in response.errors:
-                    print(f"  - {error}")
+                    log.warning("API error/warning on page", extra={"fields": {"page": page_count, "error": error}})
                     # Handle specific errors if needed
 
             # --- Safely Prepare Included Data Lookups ---
             includes = response.includes if response.includes else {}
             users = {user.id: user for user in includes.get('users', [])}
             media = {m.media_key: m for m in includes.get('media', [])}
-            referenced_tweets_lookup = {tweet.id: tweet for tweet in includes.get('tweets', [])}
+            referenced_tweets = {t.id: t for t in includes.get('tweets', [])}
 
             # --- Process Main Tweet Data ---
             tweets_on_page = response.data if response.data else []
+            metrics.RECORDS_PARSED.labels("twitter", "tweet").inc(len(tweets_on_page))
             if not tweets_on_page and not response.errors: # Check for empty page without errors
-                print("  -> No tweet data found on this page (may be end of timeline or gap).")
+                log.info("No tweet data on this page (may be end of timeline or gap)",
+                         extra={"fields": {"page": page_count}})
                 # Paginator should handle stopping, but we can log this.
                 # If there were errors, they were logged above.
 
-            # --- Structure Each Tweet on the Page ---
+            # --- Normalize Each Tweet on the Page ---
+            # Compact Post records (see src.scraper.records) instead of copies of the Tweepy objects
             for tweet in tweets_on_page:
-                # No need for manual max_tweets check here, Paginator handles the limit.
-
-                author_info = users.get(tweet.author_id)
-
-                # Process attachments
-                attachments_info = []
-                if tweet.attachments and 'media_keys' in tweet.attachments:
-                    for key in tweet.attachments['media_keys']:
-                        medium = media.get(key)
-                        if medium:
-                            attachments_info.append(medium)
-
-                # Process referenced tweets
-                referenced_tweets_info = []
-                if tweet.referenced_tweets:
-                    for ref in tweet.referenced_tweets:
-                        ref_tweet_details = referenced_tweets_lookup.get(ref.id)
-                        ref_author_info = None
-                        if ref_tweet_details:
-                            ref_author_info = users.get(ref_tweet_details.author_id)
-
-                        referenced_tweets_info.append({
-                            "type": ref.type,
-                            "id": str(ref.id), # Ensure string ID
-                            "text": ref_tweet_details.text if ref_tweet_details else None,
-                            "author_id": str(ref_tweet_details.author_id) if ref_tweet_details else None,
-                            "author_username": ref_author_info.username if ref_author_info else None,
-                            "error": "Referenced tweet details not found/included by API." if not ref_tweet_details else None
-                        })
-
-                # Construct the tweet document for storage
-                tweet_doc = {
-                    "_id": str(tweet.id), # Use tweet ID as MongoDB _id (ensure string)
-                    "text": tweet.text,
-                    "created_at": tweet.created_at,
-                    "author_id": str(tweet.author_id), # Ensure string
-                    "author_username": author_info.username if author_info else None,
-                    "author_name": author_info.name if author_info else None,
-                    "author_verified": author_info.verified if author_info else None,
-                    "conversation_id": str(tweet.conversation_id), # Ensure string
-                    "language": tweet.lang,
-                    "source": tweet.source,
-                    "public_metrics": tweet.public_metrics, # dict
-                    "entities": tweet.entities, # dict (if requested)
-                    "in_reply_to_user_id": str(tweet.in_reply_to_user_id) if tweet.in_reply_to_user_id else None, # Ensure string
-                    "referenced_tweets": referenced_tweets_info or None,
-                    "attachments": [
-                        {
-                            "media_key": medium.media_key,
-                            "type": medium.type,
-                            "url": getattr(medium, 'url', None),
-                            "preview_image_url": getattr(medium, 'preview_image_url', None),
-                            "public_metrics": getattr(medium, 'public_metrics', None),
-                            "duration_ms": getattr(medium, 'duration_ms', None),
-                            "alt_text": getattr(medium, 'alt_text', None),
-                        } for medium in attachments_info
-                    ] or None,
-                }
-                tweets_data_for_db.append(tweet_doc)
                 fetched_tweets_count += 1 # Increment count for logging
+                yield tweet_post(tweet, users, media, referenced_tweets)
 
             # --- End of processing tweets on the page ---
-            print(f"  -> Collected {fetched_tweets_count} tweets so far.")
+            log.info("Page collected", extra={"fields": {"page": page_count, "tweets": fetched_tweets_count}})
+            if on_page is not None:
+                on_page((response.meta or {}).get("next_token"))
             # No need for outer break check based on count, Paginator handles stopping at its limit.
 
     except tweepy.errors.TweepyException as e:
-        print(f"\n[!] Error during pagination/API request: {e}")
         # Provide more details if available from the exception
-        if hasattr(e, 'api_codes'):
-             print(f"  API Error Codes: {e.api_codes}")
-        if hasattr(e, 'api_messages'):
-             print(f"  API Error Messages: {e.api_messages}")
+        fields = {"error": str(e), "api_codes": getattr(e, "api_codes", None),
+                  "api_messages": getattr(e, "api_messages", None)}
+        log.error("Error during pagination/API request", extra={"fields": fields})
         if isinstance(e, tweepy.errors.Forbidden):
-             print("[!] Received Forbidden (403). You may not have permission for this endpoint/user/field with your API access level.")
+             log.error("Received Forbidden (403). You may not have permission for this endpoint/user/field with your API access level.")
         if isinstance(e, tweepy.errors.TooManyRequests):
-             print("[!] Received Too Many Requests (429). Tweepy's wait_on_rate_limit might not be enough, or you hit a non-hourly limit (like monthly quota).")
+             twitter_limiter.observe("users_tweets", e.response.headers)
+             metrics.HTTP_THROTTLED.labels("users_tweets").inc()
+             log.error("Received Too Many Requests (429). Tweepy's wait_on_rate_limit might not be enough, or you hit a non-hourly limit (like monthly quota).")
         # Add check for Unauthorized (401) - indicates token issue
         if isinstance(e, tweepy.errors.Unauthorized):
-             print("[!] Received Unauthorized (401). Your Bearer Token is likely invalid or expired.")
+             log.error("Received Unauthorized (401). Your Bearer Token is likely invalid or expired.")
+    except QuotaExhausted as e:
+        log.warning("Quota exhausted, stopping with the tweets collected so far", extra={"fields": {"error": str(e)}})
     except Exception as e:
-        print(f"\n[!] An unexpected error occurred: {e}")
-        traceback.print_exc()
+        log.exception("Unexpected error while fetching tweets", extra={"fields": {"error": str(e)}})
+
+    log.info("Finished fetching", extra={"fields": {"user_id": user_id, "tweets": fetched_tweets_count}})
+    if fetched_tweets_count < max_tweets:
+         log.info("Fewer tweets collected than the target limit. This could be due to API monthly quota exhaustion, reaching the actual end of the user's timeline, or errors during the fetch.")
+
+
+def upgrade_stored_tweets(database):
+    """Rewrite tweets stored in the pre-record layout (`text`, `public_metrics`, `attachments`, ...)
+    as Post records in every user_<id>_apiv2 collection of `database`. Returns the count per collection.
+    """
+    upgraded = {}
+    with BulkWriter(database=database) as writer:
+        for name in sorted(database.list_collection_names()):
+            if not TWEET_COLLECTION.match(name):
+                continue
+            for document in database[name].find({"text": {"$exists": True}}):
+                writer.add_record(legacy_tweet(document), name)
+                writer.add_update(name, {"_id": document["_id"]}, {"$unset": {field: "" for field in LEGACY_FIELDS}})
+                upgraded[name] = upgraded.get(name, 0) + 1
+    return upgraded
 
-    print(f"\n[*] Finished fetching. Total tweets collected: {len(tweets_data_for_db)}")
-    if len(tweets_data_for_db) < max_tweets:
-         print("[!] Note: Fewer tweets collected than the target limit. This could be due to API monthly quota exhaustion, reaching the actual end of the user's timeline, or errors during the fetch.")
-    return tweets_data_for_db
+
+def fetch_tweets_with_api_v2(bearer_token, user_id, max_tweets, results_per_page,
+                              tweet_fields, expansions, user_fields, media_fields):
+    """Collect every tweet from `iter_tweets_with_api_v2` into a list."""
+    return list(iter_tweets_with_api_v2(bearer_token, user_id, max_tweets, results_per_page,
+                                        tweet_fields, expansions, user_fields, media_fields))
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch a user's tweets with the Twitter API v2.")
+    parser.add_argument("--job", help="Name of a resumable crawl job; a restart continues from its last saved page")
+    parser.add_argument("--upgrade-stored", action="store_true",
+                        help="Rewrite tweets stored in the old layout as records, then exit")
+    args = parser.parse_args()
+
     # Ensure prerequisites are met before running:
     # 1. Twitter Developer Account & Approved Project/App
     # 2. BEARER_TOKEN set in .env file
@@ -235,70 +236,96 @@ if __name__ == "__main__":
     print(f"--- Starting Twitter API v2 Fetch ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) ---")
     print(f"--- Target User ID: {USER_ID_TO_SCRAPE}, Max Tweets: {MAX_TWEETS_TO_FETCH} ---")
 
-    scraped_data = fetch_tweets_with_api_v2(
-        bearer_token=BEARER_TOKEN,
-        user_id=USER_ID_TO_SCRAPE,
-        max_tweets=MAX_TWEETS_TO_FETCH,
-        results_per_page=RESULTS_PER_PAGE,
-        tweet_fields=TWEET_FIELDS,
-        expansions=EXPANSIONS,
-        user_fields=USER_FIELDS,
-        media_fields=MEDIA_FIELDS
-    )
-
-    if scraped_data:
-        print(f"\n--- Sample Scraped Data (First {min(5, len(scraped_data))} Tweets) ---")
-        pprint(scraped_data[:5])
+    # Ensure MONGO_URI and TWITTER_DB_NAME (or MONGO_DB_NAME) are set in your .env file if not using defaults
+    DB_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+    DB_NAME = TWITTER_DB_NAME
 
-        # Optional: Save the full 'scraped_data' list to a file
-        output_filename = f"tweets_apiv2_{USER_ID_TO_SCRAPE}_{int(time.time())}.json"
+    if args.upgrade_stored:
+        mongo_client = MongoClient(DB_URI)
         try:
-            with open(output_filename, "w", encoding="utf-8") as f:
-                json.dump(scraped_data, f, ensure_ascii=False, indent=4, default=str) # Use default=str for datetime
-            print(f"\n[*] Successfully saved {len(scraped_data)} tweets to {output_filename}")
-        except Exception as e:
-            print(f"\n[!] Error saving to JSON file ({output_filename}): {e}")
-
-        # --- Storing in MongoDB Placeholder ---
-        print("\n--- MongoDB Integration ---")
-        try:
-            # Ensure MONGO_URI and MONGO_DB_NAME are set in your .env file if not using defaults
-            DB_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-            DB_NAME = os.getenv("MONGO_DB_NAME", "twitter_data")
-            COLLECTION_NAME = f'user_{USER_ID_TO_SCRAPE}_apiv2' # Collection name specific to API v2
-
-            if not DB_URI or not DB_NAME:
-                 print("[!] MongoDB URI or DB_NAME not found in environment variables. Skipping DB insert.")
-            else:
-                mongo_client = MongoClient(DB_URI)
-                db = mongo_client[DB_NAME]
-                collection = db[COLLECTION_NAME]
-
-                if scraped_data:
-                    print(f"[*] Attempting to insert {len(scraped_data)} documents into MongoDB collection '{collection.name}'...")
-                    try:
-                        insert_result = collection.insert_many(scraped_data, ordered=False)
-                        print(f"[*] Successfully inserted {len(insert_result.inserted_ids)} new documents.")
-                    except pymongo_errors.BulkWriteError as bwe:
-                        inserted_count = bwe.details.get('nInserted', 0)
-                        duplicate_count = len(bwe.details.get('writeErrors', []))
-                        print(f"[*] MongoDB BulkWriteError: Inserted: {inserted_count}, Duplicates ignored: {duplicate_count}")
-                        if inserted_count == 0 and duplicate_count > 0:
-                             print("[*] It seems all fetched tweets were already in the database.")
-                else:
-                    print("[*] No data to insert into MongoDB.")
-
-                mongo_client.close()
-                print("[*] MongoDB connection closed.")
-
-        except ImportError:
-            print("\n[!] pymongo not installed ('pip install pymongo'). Cannot store in MongoDB.")
-        except pymongo_errors.ConnectionFailure as e:
-             print(f"\n[!] Error connecting to MongoDB: {e}")
-        except Exception as e:
-            print(f"\n[!] Error storing data in MongoDB: {e}")
-            traceback.print_exc()
-    else:
-        print("\n[!] No data was scraped. Check logs for API errors, limit issues, or connection problems.")
-
-    print(f"--- Script finished ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) ---")
\ No newline at end of file
+            upgraded = upgrade_stored_tweets(mongo_client[DB_NAME])
+        finally:
+            mongo_client.close()
+        for name, count in upgraded.items():
+            print(f"[*] Upgraded {count} tweets in '{name}' to the record layout.")
+        if not upgraded:
+            print("[*] No tweets in the old layout. Nothing to do.")
+        sys.exit(0)
+
+    COLLECTION_NAME = f'user_{USER_ID_TO_SCRAPE}_apiv2' # Collection name specific to API v2
+    output_filename = f"tweets_apiv2_{USER_ID_TO_SCRAPE}_{int(time.time())}.ndjson"
+
+    job = CrawlJob(args.job) if args.job else None
+    job_account = f"twitter:{USER_ID_TO_SCRAPE}"
+    start_token = None
+    if job is not None:
+        job.add_accounts([job_account])
+        if job_account not in job.pending_accounts():
+            print(f"[*] Job '{args.job}' already finished {job_account}. Nothing to do.")
+            sys.exit(0)
+        start_token = job.account_cursor(job_account)
+        if start_token:
+            print(f"[*] Resuming job '{args.job}' from pagination token {start_token}")
+        output_filename = f"tweets_apiv2_{USER_ID_TO_SCRAPE}_{args.job}.ndjson"  # Appended across restarts
+
+    # Tweets stream page by page into an append-only NDJSON file and batched MongoDB upserts,
+    # so memory stays flat and everything fetched before a failure is kept.
+    metrics.serve()
+    mongo_client = MongoClient(DB_URI)
+    sample_tweets = []
+    try:
+        with NDJSONSink(output_filename) as sink, BulkWriter(database=mongo_client[DB_NAME]) as writer:
+            last_page = {"next_token": start_token, "pages": 0}
+
+            def checkpoint(next_token):
+                # Only advance the cursor once the page is safely written
+                writer.flush()
+                sink.flush()
+                last_page.update(next_token=next_token, pages=last_page["pages"] + 1)
+                if job is not None:
+                    job.save_page(job_account, next_token)
+
+            for tweet in iter_tweets_with_api_v2(
+                bearer_token=BEARER_TOKEN,
+                user_id=USER_ID_TO_SCRAPE,
+                max_tweets=MAX_TWEETS_TO_FETCH,
+                results_per_page=RESULTS_PER_PAGE,
+                tweet_fields=TWEET_FIELDS,
+                expansions=EXPANSIONS,
+                user_fields=USER_FIELDS,
+                media_fields=MEDIA_FIELDS,
+                pagination_token=start_token,
+                on_page=checkpoint
+            ):
+                sink.write(tweet)
+                writer.add_record(tweet, COLLECTION_NAME)
+                if len(sample_tweets) < 5:
+                    sample_tweets.append(tweet)
+
+        # The account is finished once the timeline is exhausted; otherwise the
+        # next run continues from the saved cursor (e.g. after an error or the page limit)
+        if job is not None and last_page["pages"] and last_page["next_token"] is None:
+            job.finish_account(job_account)
+
+        if sink.count:
+            print(f"\n--- Sample Scraped Data (First {len(sample_tweets)} Tweets) ---")
+            pprint(sample_tweets)
+            print(f"\n[*] Successfully saved {sink.count} tweets to {output_filename}")
+
+            totals = writer.totals()
+            print(f"[*] MongoDB collection '{COLLECTION_NAME}': {totals['upserted']} new, "
+                  f"{totals['matched']} already stored, {totals['errors']} errors.")
+        else:
+            print("\n[!] No data was scraped. Check logs for API errors, limit issues, or connection problems.")
+
+    except pymongo_errors.ConnectionFailure as e:
+         print(f"\n[!] Error connecting to MongoDB: {e}")
+    except Exception as e:
+        print(f"\n[!] Error storing scraped data: {e}")
+        traceback.print_exc()
+    finally:
+        mongo_client.close()
+        print("[*] MongoDB connection closed.")
+        metrics.write_textfile(process="twitter")
+
+    print(f"--- Script finished ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) ---")
@@ -0,0 +1,63 @@
+"""
+Logging shared by the scraper, API and batch jobs.
+`get_logger(__name__)` returns a standard logger under the `src` namespace,
+writing to stderr as text or, with LOG_FORMAT=json, as one JSON object per
+line. Structured fields go in `extra={"fields": {...}}` and come out as
+key=value pairs (text) or top-level keys (JSON).
+"""
+import json
+import logging
+import sys
+import threading
+from datetime import datetime, timezone
+
+from src.config.settings import LOG_FORMAT, LOG_LEVEL
+
+_configured = False
+_lock = threading.Lock()
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Attach the stderr handler to the `src` logger (once per process)."""
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter())
+        root = logging.getLogger("src")
+        root.addHandler(handler)
+        root.setLevel(level)
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name):
+    configure()
+    return logging.getLogger(name if name.startswith("src") else f"src.{name}")
@@ -0,0 +1,292 @@
+"""
+Counters, gauges, histograms and spans for every pipeline stage.
+The metrics are declared once at the bottom of this module and exported in
+Prometheus text format: served on METRICS_PORT by long-running processes,
+from the API's /metrics route, or written to METRICS_DIR as
+`<process>-<pid>.prom` files (for a node_exporter textfile collector) by
+batch jobs and worker processes.
+
+With METRICS_ENABLED=false every metric is one shared no-op object, so an
+instrumented call costs a method lookup, and `span` only times and logs
+when metrics or DEBUG logging are on.
+"""
+import bisect
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.config.settings import METRICS_DIR, METRICS_ENABLED, METRICS_PORT
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# Seconds; covers fast local writes up to slow API pages
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        return _Child(self, tuple(str(value) for value in values))
+
+    def render(self, extra=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, key, extra)} {value}")
+        return lines
+
+
+class _Child:
+    """A metric bound to one set of label values."""
+    __slots__ = ("metric", "key")
+
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount=1):
+        self.metric._inc(self.key, amount)
+
+    def dec(self, amount=1):
+        self.metric._inc(self.key, -amount)
+
+    def set(self, value):
+        self.metric._set(self.key, value)
+
+    def observe(self, value):
+        self.metric._observe(self.key, value)
+
+    def time(self):
+        return _timer(self)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def inc(self, amount=1):
+        self._inc((), amount)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def _set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def set(self, value):
+        self._set((), value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def observe(self, value):
+        self._observe((), value)
+
+    def time(self):
+        return _timer(self)
+
+    def render(self, extra=()):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            for bound, cumulative in zip([*self.buckets, "+Inf"], itertools.accumulate(counts)):
+                labels = _labels(self.label_names, key, [*extra, ("le", bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.label_names, key, extra)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {sum(counts)}")
+        return lines
+
+
+@contextmanager
+def _timer(target):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        target.observe(time.perf_counter() - start)
+
+
+class _NoOp:
+    """Stands in for every metric when metrics are disabled."""
+
+    def labels(self, *values):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    dec = inc
+
+    def set(self, value):
+        pass
+
+    observe = set
+
+    @contextmanager
+    def time(self):
+        yield
+
+
+NOOP = _NoOp()
+
+
+def counter(name, help, labels=()):
+    return Counter(name, help, labels) if METRICS_ENABLED else NOOP
+
+
+def gauge(name, help, labels=()):
+    return Gauge(name, help, labels) if METRICS_ENABLED else NOOP
+
+
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS):
+    return Histogram(name, help, labels, buckets) if METRICS_ENABLED else NOOP
+
+
+# --- Spans ---
+
+_current_span = ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+@contextmanager
+def span(stage, **fields):
+    """Time a pipeline stage into pipeline_stage_seconds and log it at DEBUG.
+
+    Nested spans carry their parent's id and the root's trace id, so a
+    stage's log lines can be tied back to the crawl or job they ran in.
+    """
+    if not METRICS_ENABLED and not log.isEnabledFor(logging.DEBUG):
+        yield
+        return
+    parent = _current_span.get()
+    span_id = f"{os.getpid()}-{next(_span_ids)}"
+    trace_id = parent["trace_id"] if parent else span_id
+    token = _current_span.set({"id": span_id, "trace_id": trace_id})
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_span.reset(token)
+        STAGE_LATENCY.labels(stage, status).observe(elapsed)
+        log.debug("span", extra={"fields": {"stage": stage, "status": status, "duration_ms": round(elapsed * 1000, 2),
+                                            "span_id": span_id, "parent_id": parent["id"] if parent else None,
+                                            "trace_id": trace_id, **fields}})
+
+
+# --- Export ---
+
+def render(extra_labels=()):
+    """Every metric in Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(extra_labels))
+    return "\n".join(lines) + "\n"
+
+
+def serve(port=METRICS_PORT):
+    """Serve /metrics on `port` from a daemon thread; returns the server, or None when off."""
+    if not (METRICS_ENABLED and port):
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    log.info("Serving metrics", extra={"fields": {"port": port}})
+    return server
+
+
+def write_textfile(directory=METRICS_DIR, process=None):
+    """Write this process's metrics to `<directory>/<process>-<pid>.prom` (no-op when off)."""
+    if not (METRICS_ENABLED and directory):
+        return None
+    process = process or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{process}-{os.getpid()}.prom")
+    # Each process writes its own series, told apart by pid
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(render([("pid", os.getpid())]))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+# --- Metrics ---
+
+HTTP_REQUESTS = counter("scraper_http_requests_total", "API requests by endpoint and response status",
+                        ["endpoint", "status"])
+HTTP_LATENCY = histogram("scraper_http_request_seconds", "API request latency", ["endpoint"])
+HTTP_RETRIES = counter("scraper_http_retries_total", "Retried API requests", ["endpoint", "reason"])
+HTTP_THROTTLED = counter("scraper_http_throttled_total", "429 responses", ["endpoint"])
+RECORDS_PARSED = counter("scraper_records_parsed_total", "Records parsed from API responses", ["source", "kind"])
+DB_BATCH_LATENCY = histogram("db_batch_seconds", "bulk_write latency per batch", ["collection"])
+DB_OPERATIONS = counter("db_operations_total", "Operations sent in bulk writes", ["collection"])
+DB_WRITE_ERRORS = counter("db_write_errors_total", "Failed operations in bulk writes", ["collection"])
+DB_WRITES_SKIPPED = counter("db_writes_skipped_total", "Unchanged records dropped before bulk writes", ["collection"])
+QUEUE_DEPTH = gauge("pipeline_queue_depth", "Items waiting or in flight", ["queue"])
+STAGE_LATENCY = histogram("pipeline_stage_seconds", "Duration of pipeline stages (spans)", ["stage", "status"])
@@ -0,0 +1,180 @@
+"""
+Shared fixtures: the replay server, a Mongo stand-in and stage metrics.
+
+Tests run offline against tests/replay.py. MongoDB is mongomock unless
+TEST_MONGO_URI points at a disposable mongod, in which case each test gets
+its own database that is dropped afterwards. Benchmarks need
+pytest-benchmark and report requests/sec, records/sec, p50/p99 request
+latency and peak memory per stage in the terminal summary (and in
+`extra_info` of `--benchmark-json`).
+
+    python -m pytest tests -q
+    python -m pytest tests --benchmark-only --benchmark-json bench.json
+"""
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Read by src.scraper at import; real values from .env take precedence
+os.environ.setdefault("SCRAPER_URL", "https://instagram-scraper-api2.p.rapidapi.com/v1/info")
+os.environ.setdefault("SCRAPER_Post_URL", "https://instagram-scraper-api2.p.rapidapi.com/v1.2/posts")
+os.environ.setdefault("SCRAPER_API_KEY", "replay")
+os.environ.setdefault("BEARER_TOKEN", "replay")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+from replay import ReplayServer
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    @pytest.fixture
+    def benchmark():
+        pytest.skip("benchmarks need pytest-benchmark: pip install pytest-benchmark")
+
+# stage -> metrics, printed after the run
+STAGES = {}
+
+
+@pytest.fixture(scope="session")
+def replay_server():
+    server = ReplayServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def replay(replay_server, monkeypatch):
+    """The replay server with default settings, wired into the RapidAPI and Tweepy sessions.
+
+    Rate limiters are opened up so the stub server, not the token buckets, sets the pace.
+    """
+    from src.scraper import fetch_data, twitter
+    from src.scraper.rate_limit import QuotaTracker, rapidapi_limiter, twitter_limiter
+
+    for name, value in dict(latency=0.0, jitter=0.0, error_rate=0.0, throttle_every=0, pages=3,
+                            posts_per_page=12, comments_per_post=15, tweets_per_page=10).items():
+        monkeypatch.setattr(replay_server, name, value)
+    replay_server.reset_stats()
+
+    adapter = replay_server.adapter()
+    monkeypatch.setitem(fetch_data.client.session.adapters, "https://", adapter)
+
+    class ReplayClient(twitter.tweepy.Client):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.session.mount("https://", adapter)
+
+    monkeypatch.setattr(twitter.tweepy, "Client", ReplayClient)
+    for limiter in (rapidapi_limiter, twitter_limiter):
+        monkeypatch.setattr(limiter, "rate", 1e6)
+        monkeypatch.setattr(limiter, "burst", 1_000_000)
+        monkeypatch.setattr(limiter, "_buckets", {})
+        monkeypatch.setattr(limiter, "quota", QuotaTracker())
+    return replay_server
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """A throwaway database returned by `get_db()` for the length of the test."""
+    from src.config import db as connections
+    from src.database.cache import query_cache
+    from src.scraper.save_to_db import seen_hashes
+
+    uri = os.getenv("TEST_MONGO_URI")
+    if uri:
+        from pymongo import MongoClient
+        client = MongoClient(uri)
+        database = client[f"test_{uuid.uuid4().hex[:12]}"]
+    else:
+        mongomock = pytest.importorskip("mongomock")
+        client = None
+        database = mongomock.MongoClient().db
+
+    connections.use_database(database)
+    query_cache.clear()
+    seen_hashes.clear()
+    yield database
+    query_cache.clear()
+    seen_hashes.clear()
+    connections.use_database(None)
+    if client is not None:
+        client.drop_database(database.name)
+        client.close()
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+
+@pytest.fixture
+def measure(request):
+    """Benchmark one pipeline stage and record its throughput, latency and memory.
+
+    `measure(name, func, records=N)` times `func` with pytest-benchmark,
+    where each call handles `records` records; `setup` runs untimed before
+    every call. Request counts and latency percentiles come from the replay
+    server when the test uses it.
+    """
+    benchmark = request.getfixturevalue("benchmark")
+    server = request.getfixturevalue("replay") if "replay" in request.fixturenames else None
+
+    def run(name, func, records=0, rounds=5, setup=None):
+        def prepare():
+            if setup is not None:
+                setup()
+
+        # Peak memory from one traced call, kept out of the timed rounds
+        prepare()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        if server is not None:
+            server.reset_stats()
+        start = time.perf_counter()
+        result = benchmark.pedantic(func, setup=prepare, rounds=rounds, iterations=1)
+        elapsed = time.perf_counter() - start
+        if benchmark.stats:
+            seconds, calls = benchmark.stats.stats.mean, rounds
+        else:
+            seconds, calls = elapsed, 1  # --benchmark-disable calls func once
+
+        metrics = {"seconds": seconds, "records_per_sec": records / seconds if records else None,
+                   "peak_mib": peak / 2**20}
+        if server is not None:
+            latencies = list(server.client_latencies)
+            metrics.update(requests_per_sec=server.requests_served() / calls / seconds,
+                           p50_ms=percentile(latencies, 50) * 1000 if latencies else None,
+                           p99_ms=percentile(latencies, 99) * 1000 if latencies else None)
+        benchmark.extra_info.update(metrics)
+        STAGES[name] = metrics
+        return result
+
+    return run
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not STAGES:
+        return
+    from tabulate import tabulate
+
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+
+    rows = [[name, fmt(m.get("requests_per_sec"), ",.0f"), fmt(m["records_per_sec"], ",.0f"),
+             fmt(m.get("p50_ms"), ".2f"), fmt(m.get("p99_ms"), ".2f"), fmt(m["peak_mib"], ".1f")]
+            for name, m in STAGES.items()]
+    terminalreporter.write_sep("-", "pipeline stages")
+    terminalreporter.write_line(tabulate(rows, headers=["Stage", "Requests/s", "Records/s", "p50 ms", "p99 ms",
+                                                        "Peak MiB"]))
@@ -0,0 +1,241 @@
+"""
+Local stub server replaying recorded RapidAPI (Instagram) and Twitter v2 responses.
+The recordings in tests/recordings are expanded into as many pages, posts,
+comments and tweets as a test asks for (each with a unique id), so the
+scraper can be run and benchmarked without spending API quota. Latency,
+server errors and 429s are configurable.
+
+`ReplayAdapter` mounts on a requests Session and sends every request to the
+server whatever host it was addressed to, so the hard-coded API URLs in
+src.scraper need no changes.
+
+    python tests/replay.py --port 8765 --latency 0.05 --throttle-every 20
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import HTTPAdapter
+
+RECORDINGS = os.path.join(os.path.dirname(__file__), "recordings")
+
+
+def load_recording(name):
+    with open(os.path.join(RECORDINGS, f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cycle(items, count):
+    """`count` deep copies of `items`, repeating them in order."""
+    return [copy.deepcopy(items[i % len(items)]) for i in range(count)]
+
+
+class ReplayServer:
+    """Threaded HTTP server answering with expanded recordings.
+
+    `latency` (+ up to `jitter`) seconds are added to every response,
+    `error_rate` of requests fail with a 500, and every `throttle_every`th
+    request is answered with a 429 and `Retry-After: 0`.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, throttle_every=0,
+                 pages=3, posts_per_page=12, comments_per_post=15, tweets_per_page=10, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_every = throttle_every
+        self.pages = pages
+        self.posts_per_page = posts_per_page
+        self.comments_per_post = comments_per_post
+        self.tweets_per_page = tweets_per_page
+        self.recordings = {name: load_recording(name) for name in
+                           ("instagram_info", "instagram_posts", "instagram_comments", "twitter_user", "twitter_tweets")}
+        self.statuses = Counter()
+        self.client_latencies = []  # Seconds per request as seen by ReplayAdapter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._count = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="replay-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.statuses.clear()
+            self._count = 0
+        self.client_latencies.clear()
+
+    def requests_served(self):
+        with self._lock:
+            return sum(self.statuses.values())
+
+    def adapter(self):
+        return ReplayAdapter(self)
+
+    # --- Responses ---
+
+    def _outcome(self):
+        """Decide up front whether this request is throttled or fails."""
+        with self._lock:
+            self._count += 1
+            if self.throttle_every and self._count % self.throttle_every == 0:
+                return 429
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 500
+        return 200
+
+    def respond(self, path, query):
+        """Return (status, headers, body dict) for one request."""
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        status = self._outcome()
+        if status == 429:
+            return status, {"Retry-After": "0"}, {"message": "Too many requests"}
+        if status == 500:
+            return status, {}, {"message": "Replayed server error"}
+
+        body = self._route(path, {key: values[0] for key, values in query.items()})
+        if body is None:
+            return 404, {}, {"message": f"No recording for {path}"}
+        return 200, {"x-ratelimit-requests-remaining": "1000000"}, body
+
+    def _route(self, path, query):
+        if match := re.fullmatch(r"/2/users/(\w+)/tweets", path):
+            return self.tweets_page(match.group(1), query.get("pagination_token"))
+        if re.fullmatch(r"/2/users/(\w+)", path):
+            return self.recordings["twitter_user"]
+        if path.endswith("/info"):
+            return self.profile(query.get("username_or_id_or_url", "replay_user"))
+        if path.endswith("/posts"):
+            return self.posts_page(query.get("username_or_id_or_url", "replay_user"), query.get("pagination_token"))
+        if path.endswith("/comments"):
+            return self.comments(query.get("code_or_id_or_url", "0"))
+        return None
+
+    def profile(self, username):
+        body = copy.deepcopy(self.recordings["instagram_info"])
+        body["data"]["username"] = username
+        return body
+
+    def posts_page(self, username, token):
+        page = int(token.removeprefix("page-")) if token else 0
+        body = copy.deepcopy(self.recordings["instagram_posts"])
+        items = cycle(body["data"]["items"], self.posts_per_page)
+        for i, post in enumerate(items):
+            post["id"] = f"{zlib.crc32(username.encode()) % 10**6}{page:04d}{i:04d}"
+            post["taken_at_timestamp"] -= page * 86400
+        body["data"].update(items=items, count=len(items))
+        body["pagination_token"] = f"page-{page + 1}" if page + 1 < self.pages else None
+        return body
+
+    def comments(self, post_id):
+        body = copy.deepcopy(self.recordings["instagram_comments"])
+        items = cycle(body["data"]["items"], self.comments_per_post)
+        for i, comment in enumerate(items):
+            comment["id"] = f"{post_id}{i:04d}"
+        body["data"].update(items=items, count=len(items))
+        return body
+
+    def tweets_page(self, user_id, token):
+        page = int(token.removeprefix("page-")) if token else 0
+        body = copy.deepcopy(self.recordings["twitter_tweets"])
+        tweets = cycle(body["data"], self.tweets_per_page)
+        for i, tweet in enumerate(tweets):
+            tweet["id"] = f"{user_id}{page:04d}{i:04d}"
+            created = datetime.fromisoformat(tweet["created_at"].replace("Z", "+00:00")) - timedelta(days=page)
+            tweet["created_at"] = created.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        body["data"] = tweets
+        body["meta"].update(result_count=len(tweets), next_token=f"page-{page + 1}" if page + 1 < self.pages else None)
+        if body["meta"]["next_token"] is None:
+            del body["meta"]["next_token"]
+        return body
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                status, headers, body = server.respond(url.path, parse_qs(url.query))
+                with server._lock:
+                    server.statuses[status] += 1
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Transport adapter sending every request to a ReplayServer, timing each one."""
+
+    def __init__(self, server, **kwargs):
+        super().__init__(pool_maxsize=32, **kwargs)
+        self.server = server
+
+    def send(self, request, stream=False, **kwargs):
+        url = urlsplit(request.url)
+        request.url = self.server.url + url.path + (f"?{url.query}" if url.query else "")
+        start = time.perf_counter()
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+            if not stream:
+                response.content  # Time the whole body, not just the headers
+            return response
+        finally:
+            self.server.client_latencies.append(time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded RapidAPI and Twitter v2 responses.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds, at random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth request with a 429")
+    parser.add_argument("--pages", type=int, default=3, help="Pages of posts / tweets per account")
+    args = parser.parse_args()
+
+    replay = ReplayServer(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          throttle_every=args.throttle_every, pages=args.pages)
+    print(f"🔁 Replaying recordings on {replay.url}")
+    try:
+        replay._httpd.serve_forever()
+    except KeyboardInterrupt:
+        replay._httpd.server_close()
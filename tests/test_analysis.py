@@ -0,0 +1,171 @@
+"""Engagement metric tests and roster analytics benchmarks."""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis.comments import analyze_comments, sentiment, summarize_chunk, tokenize
+from src.analysis.engagement import EngagementTracker, engagement_summary, get_profile_metrics, get_rollups
+from src.analysis.roster import normalize_frames, roster_metrics
+from src.analysis.timeseries import SnapshotRecorder, raw_samples, trend, velocity
+from src.scraper.crawl_state import build_crawl_state, load_crawl_state
+from src.scraper.save_to_db import BulkWriter, save_comments, save_posts
+
+
+def synthetic_frames(profiles, posts, seed=0):
+    rng = np.random.default_rng(seed)
+    users = np.arange(profiles).astype(str)
+    post_frame = pd.DataFrame({
+        "_id": np.arange(posts).astype(str),
+        "username": rng.choice(users, posts),
+        "like_count": rng.poisson(100, posts),
+        "comment_count": rng.poisson(5, posts),
+        "timestamp": rng.integers(1_600_000_000, 1_700_000_000, posts).astype(float),
+    })
+    profile_frame = pd.DataFrame({"username": users, "follower_count": rng.integers(0, 10**6, profiles)})
+    return normalize_frames(profile_frame, post_frame)
+
+
+def test_engagement_summary():
+    summary = engagement_summary({"_id": "alice", "post_count": 4, "total_likes": 400, "total_comments": 40,
+                                  "follower_count": 1000})
+    assert summary["avg_likes"] == 100
+    assert summary["engagement_rate"] == pytest.approx(11.0)
+    assert engagement_summary({"_id": "bob"})["engagement_rate"] == 0.0
+
+
+def test_tracker_counts_only_deltas(mongo):
+    posts = [{"id": "p1", "like_count": 10, "comment_count": 2, "timestamp": 1_700_000_000},
+             {"id": "p2", "like_count": 5, "comment_count": 1, "timestamp": 1_700_100_000}]
+    with BulkWriter() as writer:
+        EngagementTracker(writer).record_profile("alice", 100, posts)
+    seen = {post["id"]: {"like_count": post["like_count"], "comment_count": post["comment_count"]} for post in posts}
+    posts[0]["like_count"] = 20
+    with BulkWriter() as writer:
+        EngagementTracker(writer).record_profile("alice", 100, posts, seen)
+
+    metrics = get_profile_metrics("alice")
+    assert (metrics["post_count"], metrics["total_likes"], metrics["total_comments"]) == (2, 25, 3)
+    assert sum(rollup["likes"] for rollup in get_rollups("alice", "day")) == 25
+
+
+def test_recorded_deltas_are_applied_once(mongo):
+    posts = [{"id": "p1", "like_count": 10, "comment_count": 2, "timestamp": 1_700_000_000},
+             {"id": "p2", "like_count": 5, "comment_count": 1, "timestamp": 1_700_100_000}]
+    crashed = BulkWriter()
+    state = build_crawl_state({"follower_count": 100, "posts": posts})
+    EngagementTracker(crashed).record_profile("alice", 100, posts, None, state)
+    crashed._flush("crawl_state")  # The process stops before the deltas are sent
+    assert get_profile_metrics("alice") is None
+
+    for _ in range(2):  # The next crawls replay what crawl_state recorded
+        with BulkWriter() as writer:
+            EngagementTracker(writer).replay(load_crawl_state("alice")["pending_metrics"])
+    crashed.flush()  # Deltas that did get out late add nothing either
+    metrics = get_profile_metrics("alice")
+    assert (metrics["post_count"], metrics["total_likes"], metrics["total_comments"]) == (2, 15, 3)
+    assert sum(rollup["likes"] for rollup in get_rollups("alice", "week")) == 15
+    with BulkWriter() as writer:
+        assert EngagementTracker(writer).replay(load_crawl_state("alice")["pending_metrics"]) == 0
+
+
+def test_snapshots_roll_up_by_hour_and_day(mongo):
+    start = datetime(2024, 5, 1, 10, 15, tzinfo=timezone.utc)
+    with BulkWriter() as writer:
+        recorder = SnapshotRecorder(writer)
+        for i, followers in enumerate([1000, 1060, 1120, 1300]):
+            at = start + timedelta(minutes=30 * i)
+            recorder.record_post("alice", {"id": "p1", "like_count": 10 * i, "comment_count": None}, at)
+            recorder.finish_profile("alice", followers, at)
+        recorder.record_post("alice", {"id": "p1", "like_count": 99}, start)
+        recorder.discard("alice")
+
+    hours = list(mongo.metric_rollups.find({"kind": "profile", "resolution": "hour"}).sort("start", 1))
+    assert [(row["samples"], row["first"]["followers"], row["last"]["followers"]) for row in hours] == \
+        [(2, 1000, 1060), (2, 1120, 1300)]
+    day = mongo.metric_rollups.find_one({"_id": "post:p1:day:2024-05-01T00"})
+    assert (day["min"]["likes"], day["max"]["likes"], "comments" in day["last"]) == (0, 30, False)
+    assert "expires_at" in hours[0] and "expires_at" not in day
+
+    assert trend("profile", "alice", "followers", "hour") == [(datetime(2024, 5, 1, 10, tzinfo=timezone.utc), 1060),
+                                                              (datetime(2024, 5, 1, 11, tzinfo=timezone.utc), 1300)]
+    assert velocity("profile", "alice", "followers", hours=24, now=start + timedelta(hours=2)) == \
+        pytest.approx(300 / 1.5)
+    assert velocity("profile", "bob", "followers") is None
+    assert [sample["likes"] for sample in raw_samples("post", "p1")] == [0, 10, 20, 30]
+
+
+def test_tracker_snapshots_changed_posts_only(mongo):
+    posts = [{"id": "p1", "like_count": 10, "comment_count": 2, "timestamp": 1_700_000_000},
+             {"id": "p2", "like_count": 5, "comment_count": 1, "timestamp": 1_700_100_000}]
+    seen = {post["id"]: {"like_count": post["like_count"], "comment_count": post["comment_count"]} for post in posts}
+    posts[0]["like_count"] = 20
+    with BulkWriter() as writer:
+        EngagementTracker(writer).record_profile("alice", 100, posts, seen)
+    assert {row["key"] for row in mongo.metric_snapshots.find()} == {"p1", "alice"}
+
+
+def test_tokenize_and_sentiment():
+    words, hashtags, mentions, emoji = tokenize("Not bad at ALL @taylor.swift. #Eras 🔥🔥 love it")
+    assert words == ["not", "bad", "at", "all", "love", "it"]
+    assert (hashtags, mentions, emoji) == (["#eras"], ["@taylor.swift"], ["🔥", "🔥"])
+    assert sentiment(["not", "bad"]) > 0
+    assert sentiment(["worst", "concert"], ["👎"]) < 0
+    assert sentiment(["ok"]) == 0.0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_analyze_comments_per_post_and_profile(mongo, workers):
+    save_posts("alice", [{"id": "p1"}, {"id": "p2"}])
+    texts = {"p1": ["Love this 😍 #tour", "amazing #tour @bob", "so boring"], "p2": ["terrible 👎", "hate it"]}
+    for post_id, comments in texts.items():
+        save_comments(post_id, [{"id": f"{post_id}-{i}", "user": "fan", "text": text} for i, text in enumerate(comments)])
+
+    stats = analyze_comments(workers=workers, chunk_size=2)
+    assert stats == {"comments": 5, "posts": 2, "profiles": 1, "chunks": 2}
+    p1 = mongo.comment_analytics.find_one({"_id": "p1"})
+    assert (p1["username"], p1["positive"], p1["negative"]) == ("alice", 2, 1)
+    assert p1["hashtags"] == [["#tour", 2]]
+    assert mongo.comment_analytics.find_one({"_id": "p2"})["sentiment"] < 0
+    profile = mongo.profile_comment_analytics.find_one({"_id": "alice"})
+    assert (profile["comments"], profile["positive"], profile["negative"]) == (5, 2, 3)
+
+
+def test_subset_runs_keep_full_profile_totals(mongo):
+    save_posts("alice", [{"id": "p1"}, {"id": "p2"}])
+    save_posts("bob", [{"id": "p3"}])
+    save_comments("p1", [{"id": "a", "user": "fan", "text": "love it"}, {"id": "b", "user": "fan", "text": "great"}])
+    save_comments("p2", [{"id": "c", "user": "fan", "text": "hate it"}])
+    save_comments("p3", [{"id": "d", "user": "fan", "text": "nice"}])
+    analyze_comments(workers=1)
+
+    stats = analyze_comments(workers=1, query={"post_id": {"$in": ["p2", "p3"]}})
+    assert stats["posts"] == 2 and stats["profiles"] == 1  # Only bob's comments were all analyzed
+    assert mongo.profile_comment_analytics.find_one({"_id": "alice"})["comments"] == 3
+    assert mongo.profile_comment_analytics.find_one({"_id": "bob"})["comments"] == 1
+
+
+def test_roster_metrics_flags_outliers():
+    profiles, posts = synthetic_frames(20, 2000)
+    posts.loc[0, "like_count"] = 10**6
+    metrics, outliers = roster_metrics(profiles, posts)
+    assert len(metrics) == 20
+    assert metrics["post_count"].sum() == 2000
+    assert "0" in set(outliers["_id"])
+
+
+# --- Benchmarks ---
+
+@pytest.mark.benchmark(group="analysis")
+def test_bench_roster_metrics(measure):
+    profiles, posts = synthetic_frames(3000, 500_000)
+    measure("roster_metrics", lambda: roster_metrics(profiles, posts), records=len(posts), rounds=3)
+
+
+@pytest.mark.benchmark(group="analysis")
+def test_bench_comment_text(measure):
+    samples = ["Love this 😍🔥 #eras @taylorswift", "not bad at all, great show", "worst outfit ever 👎",
+               "who else is here in 2024?? 😂", "Congrats queen 👑 so proud of you"]
+    chunk = [(f"p{i}", [samples[(i + j) % len(samples)] for j in range(50)]) for i in range(400)]
+    measure("comment_text", lambda: summarize_chunk(chunk), records=400 * 50, rounds=3)
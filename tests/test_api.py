@@ -0,0 +1,99 @@
+"""API routes on the Mongo stand-in: cursors, ETag/304, streamed pages and hidden fields."""
+import os
+
+import pytest
+
+pytest.importorskip("httpx")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import routes
+from src.database import queries
+from src.scraper.save_to_db import BulkWriter
+
+
+@pytest.fixture
+def api(mongo):
+    """A client for the routes, reading through Motor from the same data as `mongo`."""
+    if os.getenv("TEST_MONGO_URI"):
+        pytest.skip("the API tests read the mongomock database through mongomock_motor")
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.state.db = mongomock_motor.AsyncMongoMockClient(mock_mongo_client=mongo.client)[mongo.name]
+    routes.responses.clear()
+    yield TestClient(app)
+    routes.responses.clear()
+
+
+def seed_posts(count, username="alice"):
+    with BulkWriter() as writer:
+        writer.add_profile({"username": username, "full_name": "Alice A", "follower_count": 10})
+        writer.add_posts(username, [{"id": f"p{i:04d}", "timestamp": 1_700_000_000 + i // 2, "like_count": i,
+                                     "comments": [{"id": f"c{j}", "user": f"fan{j}", "text": "hi"} for j in range(3)]}
+                                    for i in range(count)])
+
+
+def test_profile_hides_internal_fields(api):
+    seed_posts(1)
+    profile = api.get("/info/alice").json()
+    assert profile["full_name"] == "Alice A"
+    assert not {"search_keys", "content_hash"} & set(profile)
+    assert api.get("/info/nobody").status_code == 404
+
+
+@pytest.mark.parametrize("limit", [7, 150], ids=["cached", "streamed"])
+def test_posts_cursor_visits_every_post_once(api, limit, monkeypatch):
+    monkeypatch.setattr(routes, "API_STREAM_THRESHOLD", 100)
+    seed_posts(320)
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = api.get("/posts/alice", params=params)
+        assert response.status_code == 200
+        assert ("etag" in response.headers) == (limit <= 100)  # Streamed pages skip the response cache
+        body = response.json()
+        assert len(body["posts"]) <= limit and "content_hash" not in body["posts"][0]
+        seen.extend(post["_id"] for post in body["posts"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == [f"p{i:04d}" for i in range(320)] and len(seen) == 320
+    assert pages == -(-320 // limit)
+
+
+def test_comments_cursor_and_limit(api):
+    seed_posts(1)
+    with BulkWriter() as writer:
+        writer.add_comments("p0000", [{"id": f"x{j:02d}", "user": "bob", "text": "more"} for j in range(10)])
+    first = api.get("/comments/p0000", params={"limit": 8}).json()
+    rest = api.get("/comments/p0000", params={"limit": 8, "cursor": first["next_cursor"]}).json()
+    assert len(first["comments"]) == 8 and len(rest["comments"]) == 5 and rest["next_cursor"] is None
+    assert "content_hash" not in first["comments"][0]
+    assert api.get("/comments/p0000", params={"limit": routes.API_MAX_COMMENTS + 1}).status_code == 422
+    assert api.get("/comments/p0000", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_cursor_values_cannot_be_query_operators(api):
+    seed_posts(3)
+    for values in ([{"$ne": None}, "x"], [1_700_000_000, {"$gt": ""}], [[1], "x"], {"$gt": ""}):
+        cursor = queries.encode_cursor(values)
+        assert api.get("/posts/alice", params={"cursor": cursor}).status_code == 400
+    assert api.get("/comments/p0000", params={"cursor": queries.encode_cursor([{"$gt": ""}])}).status_code == 400
+
+
+def test_etag_answers_304_until_the_cache_expires(api):
+    seed_posts(3)
+    first = api.get("/posts/alice")
+    etag = first.headers["etag"]
+    again = api.get("/posts/alice", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert api.get("/posts/alice", headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+
+    seed_posts(4)  # A new post, but the serialized page is reused for API_RESPONSE_TTL...
+    assert api.get("/posts/alice", headers={"If-None-Match": etag}).status_code == 304
+    routes.responses.clear()  # ...and rebuilt once it expires
+    changed = api.get("/posts/alice", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag and len(changed.json()["posts"]) == 4
@@ -0,0 +1,234 @@
+"""Write-path and query tests, plus save_to_db benchmarks, on the Mongo stand-in."""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.config import db as connections
+from src.database.cache import MISSING
+from src.database import indexes, queries
+from src.scraper.records import Post
+from src.scraper.save_to_db import BulkWriter, save_comments, save_posts, save_profile, seen_hashes
+
+
+def make_profiles(count):
+    return [{"username": f"user{i:05d}", "full_name": f"User {i}", "follower_count": i * 10} for i in range(count)]
+
+
+def make_posts(count, comments_per_post=0, start=1_700_000_000):
+    return [{"id": f"p{i:06d}", "like_count": i, "comment_count": comments_per_post, "timestamp": start + i,
+             "comments": [{"id": f"c{i}-{j}", "user": f"fan{j}", "text": f"comment {j}"}
+                          for j in range(comments_per_post)]}
+            for i in range(count)]
+
+
+def test_bulk_writer_upserts_are_idempotent(mongo):
+    posts = make_posts(30, comments_per_post=4)
+    for _ in range(2):
+        with BulkWriter(batch_size=10) as writer:
+            writer.add_posts("alice", posts)
+    assert mongo.posts.count_documents({"username": "alice"}) == 30
+    assert mongo.comments.count_documents({}) == 120
+    assert writer.totals()["upserted"] == 0
+    stored = mongo.posts.find_one({"_id": "p000001"})
+    assert "comments" not in stored
+    assert len(stored["comment_preview"]) == 3
+
+
+@pytest.mark.parametrize("forget", [False, True], ids=["cached", "read_back"])
+def test_unchanged_records_are_not_rewritten(mongo, forget):
+    posts = make_posts(20, comments_per_post=2)
+    with BulkWriter() as writer:
+        writer.add_profile({"username": "alice", "follower_count": 1})
+        writer.add_posts("alice", posts)
+    assert writer.totals()["skipped"] == 0
+    if forget:
+        seen_hashes.clear()  # Another process: hashes come from the stored documents
+
+    posts[3]["like_count"] = 999
+    with BulkWriter() as writer:
+        writer.add_profile({"follower_count": 1, "username": "alice"})
+        writer.add_posts("alice", posts)
+    assert writer.skipped == {"profiles": 1, "posts": 19, "comments": 40}
+    assert writer.totals()["operations"] == 1
+    assert mongo.posts.find_one({"_id": "p000003"})["like_count"] == 999
+
+
+def test_cached_hash_is_confirmed_against_the_stored_one(mongo):
+    posts = make_posts(2)
+    save_posts("alice", posts)
+    # Another process stores different content (and its hash) behind this process's cache
+    mongo.posts.update_one({"_id": "p000000"}, {"$set": {"like_count": 500, "content_hash": 42}})
+    with BulkWriter() as writer:
+        writer.add_posts("alice", posts)
+    assert writer.skipped == {"posts": 1}
+    assert mongo.posts.find_one({"_id": "p000000"})["like_count"] == 0
+
+
+def test_partial_update_clears_content_hash(mongo):
+    posts = make_posts(3)
+    save_posts("alice", posts)
+    save_comments("p000000", [{"id": "c1", "user": "bob", "text": "first"}])
+    assert mongo.posts.find_one({"_id": "p000000"})["content_hash"] is None
+    # Only the updated post's hash was dropped
+    assert [seen_hashes.get(f"{mongo.name}:posts:p00000{i}") is MISSING for i in range(3)] == [True, False, False]
+    with BulkWriter() as writer:
+        writer.add_posts("alice", posts)
+    assert writer.skipped == {"posts": 2}
+    assert mongo.posts.find_one({"_id": "p000000"})["comment_preview"] == []
+
+
+def test_empty_record_fields_clear_stored_values(mongo):
+    post = Post(source="instagram", id="p1", username="alice", caption="first caption", like_count=5)
+    with BulkWriter() as writer:
+        writer.add_record(post)
+    post.caption = None  # The caption was deleted on the platform
+    with BulkWriter() as writer:
+        writer.add_record(post)
+    stored = mongo.posts.find_one({"_id": "p1"})
+    assert "caption" not in stored and stored["like_count"] == 5
+    assert None not in stored.values()
+
+
+def test_backfill_keeps_every_legacy_comment(mongo):
+    # As the MySQL migration embedded them: no ids, `username` / `comment` keys, repeats allowed
+    legacy = [{"username": "bob", "comment": "first!"}, {"username": "bob", "comment": "first!"},
+              {"username": "carol", "comment": "nice"}, {"username": "dave", "comment": "wow"}]
+    mongo.posts.insert_many([{"_id": "p1", "username": "alice", "comments": legacy},
+                             {"_id": "p2", "username": "alice", "comments": [{"id": 7, "user": "erin", "text": "hey"}]}])
+    assert indexes.backfill_comments() == 2
+    stored = sorted((doc["user"], doc["text"]) for doc in mongo.comments.find({"post_id": "p1"}))
+    assert stored == sorted((comment["username"], comment["comment"]) for comment in legacy)
+    assert mongo.comments.find_one({"post_id": "p2"})["_id"] == "p2:7"
+    post = mongo.posts.find_one({"_id": "p1"})
+    assert "comments" not in post
+    assert post["comment_preview"] == [{"user": "bob", "text": "first!"}] * 2 + [{"user": "carol", "text": "nice"}]
+
+
+def test_save_comments_refreshes_preview(mongo):
+    save_posts("alice", make_posts(1))
+    save_comments("p000000", [{"id": "c1", "user": "bob", "text": "first"}, {"id": "c2", "user": "eve", "text": "hi"}])
+    assert mongo.comments.count_documents({"post_id": "p000000"}) == 2
+    assert mongo.posts.find_one({"_id": "p000000"})["comment_preview"][0] == {"user": "bob", "text": "first"}
+
+
+def test_profile_cache_is_invalidated_on_save(mongo):
+    save_profile({"username": "alice", "full_name": "Alice", "follower_count": 1})
+    assert queries.get_profile_by_username("alice")["follower_count"] == 1
+    save_profile({"username": "alice", "full_name": "Alice", "follower_count": 2})
+    assert queries.get_profile_by_username("alice")["follower_count"] == 2
+
+
+def test_posts_page_cursor_visits_every_post_once(mongo):
+    save_posts("alice", make_posts(35))
+    seen, cursor = [], None
+    while True:
+        rows, cursor = queries.get_posts_page("alice", limit=10, cursor=cursor)
+        seen.extend(row["_id"] for row in rows)
+        if cursor is None:
+            break
+    assert seen == [f"p{i:06d}" for i in range(35)]
+
+
+def test_comments_page_cursor(mongo):
+    save_comments("p1", [{"id": f"c{i:03d}", "user": "fan", "text": str(i)} for i in range(12)])
+    first, cursor = queries.get_comments("p1", limit=5)
+    rest, _ = queries.get_comments("p1", limit=50, cursor=cursor)
+    assert len(first) == 5
+    assert len(first) + len(rest) == 12
+    assert not {row["_id"] for row in first} & {row["_id"] for row in rest}
+
+
+def test_importing_modules_opens_no_connections():
+    code = ("import sys; import src.scraper.save_to_db, src.database.queries, src.database.migration, "
+            "src.scraper.scheduler; from src.config import db; "
+            "assert db._mongo is None and db._mysql is None and 'mysql.connector' not in sys.modules")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+
+
+def _child_client(connection):
+    inherited = connections._mongo
+    connections.get_client()
+    connection.send((inherited is None, connections._mongo[0] == os.getpid()))
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_client_is_reused_per_process_and_reopened_after_fork():
+    client = connections.get_client()
+    try:
+        assert connections.get_client() is client
+        assert connections.get_db().client is client
+        parent, child = multiprocessing.Pipe()
+        process = multiprocessing.get_context("fork").Process(target=_child_client, args=(child,))
+        process.start()
+        assert parent.recv() == (True, True)
+        process.join()
+    finally:
+        connections.close()
+    assert connections._mongo is None
+
+
+# --- Benchmarks ---
+# Sized for mongomock; set TEST_MONGO_URI for numbers that reflect a real mongod
+
+def fresh(make):
+    """A `setup` hook that gives every round new values, so dedup never skips the timed writes."""
+    data, rounds = [], iter(range(1, 1_000_000))
+
+    def setup():
+        data[:] = make(next(rounds))
+
+    return data, setup
+
+
+@pytest.mark.benchmark(group="db")
+def test_bench_save_profile(mongo, measure):
+    profiles, setup = fresh(lambda round: [{**profile, "follower_count": round} for profile in make_profiles(200)])
+
+    def save_all():
+        for profile in profiles:
+            save_profile(profile)
+
+    measure("save_profile", save_all, records=200, setup=setup)
+
+
+@pytest.mark.benchmark(group="db")
+def test_bench_save_posts(mongo, measure):
+    posts, setup = fresh(lambda round: make_posts(100, comments_per_post=5, start=round))
+    measure("save_posts", lambda: save_posts("alice", posts), records=100 * 6, setup=setup)
+
+
+@pytest.mark.benchmark(group="db")
+def test_bench_save_comments(mongo, measure):
+    comments, setup = fresh(lambda round: [{"id": f"c{i}", "user": f"fan{i}", "text": f"great post {round}"}
+                                           for i in range(300)])
+    measure("save_comments", lambda: save_comments("p1", comments), records=300, setup=setup)
+
+
+@pytest.mark.benchmark(group="db")
+def test_bench_bulk_writer_profiles(mongo, measure):
+    profiles, setup = fresh(lambda round: [{**profile, "follower_count": round} for profile in make_profiles(300)])
+
+    def write():
+        with BulkWriter() as writer:
+            for profile in profiles:
+                writer.add_profile(profile)
+
+    measure("BulkWriter.add_profile", write, records=300, setup=setup)
+
+
+@pytest.mark.benchmark(group="db")
+def test_bench_bulk_writer_unchanged(mongo, measure):
+    """An identical re-crawl: every record is dropped by its content hash (cached, as within one process)."""
+    posts = make_posts(100, comments_per_post=5)
+    save_posts("alice", posts)
+
+    def write():
+        with BulkWriter() as writer:
+            writer.add_posts("alice", posts)
+        assert writer.totals()["operations"] == 0
+
+    measure("BulkWriter unchanged (dedup)", write, records=100 * 6)
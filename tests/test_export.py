@@ -0,0 +1,75 @@
+"""Parquet snapshots: table building, append/overwrite exports and compaction."""
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from src.database import export
+
+DAY = 1_717_200_000  # 2024-06-01 00:00 UTC
+
+
+def seed(mongo, likes=0):
+    mongo.profiles.insert_many([{"_id": f"id{i}", "username": f"user{i}", "follower_count": i * 100,
+                                 "search_keys": [f"user{i}"], "content_hash": 1} for i in range(2)])
+    mongo.posts.insert_many([{"_id": f"p{i}", "username": f"user{i % 2}", "like_count": likes + i,
+                              "timestamp": DAY + i * 86_400, "caption": f"post {i}"} for i in range(4)])
+
+
+def part_files(root):
+    return sorted(os.path.relpath(os.path.join(folder, name), root)
+                  for folder, _, names in os.walk(root) for name in names if name.endswith(".parquet"))
+
+
+def test_to_table_types_and_partition_columns(mongo):
+    mongo.posts.insert_one({"_id": "p1", "username": "alice"})
+    exported_at = datetime(2024, 6, 3, tzinfo=timezone.utc)
+    documents = [{"_id": "p1:c1", "post_id": "p1", "comment_id": 1, "user": "bob", "text": "hi",
+                  "like_count": "7", "created_at": datetime(2024, 6, 1, 12, tzinfo=timezone.utc)},
+                 {"_id": "p2:c1", "post_id": "p2", "user": "carol", "like_count": "n/a"}]
+    table = export.to_table("comments", documents, exported_at)
+
+    assert table.schema == export.schema_for("comments")
+    rows = table.to_pylist()
+    assert rows[0]["comment_id"] == "1" and rows[0]["like_count"] == 7
+    assert rows[0]["created_at"] == DAY + 12 * 3600 and rows[0]["date"] == "2024-06-01"
+    assert rows[0]["username"] == "alice"  # Looked up from the post for partitioning
+    assert rows[1]["username"] is None and rows[1]["like_count"] is None and rows[1]["date"] is None
+    profiles = export.to_table("profiles", [{"_id": "id0", "username": "user0"}], exported_at)
+    assert profiles.column("date").to_pylist() == ["2024-06-03"]  # Profiles are partitioned by export day
+
+
+def test_append_adds_rows_and_overwrite_replaces_them(mongo, tmp_path):
+    seed(mongo)
+    root = str(tmp_path)
+    assert export.export_collection("posts", root=root) == 4
+    assert export.export_collection("posts", root=root) == 4
+    assert len(export.load_snapshot("posts", root=root)) == 8
+    assert len(part_files(root)) == 8  # One file per partition per run
+    assert export.export_collection("profiles", root=root) == 2
+    assert not {"search_keys", "content_hash"} & set(export.load_snapshot("profiles", root=root).columns)
+
+    assert export.export_collection("posts", mode="overwrite", root=root) == 4
+    frame = export.load_snapshot("posts", root=root)
+    assert sorted(frame["_id"]) == ["p0", "p1", "p2", "p3"]
+    assert sorted(os.listdir(root)) == ["posts", "profiles"]  # The temporary dataset was swapped in
+    recent = export.load_snapshot("posts", root=root, filters=[("username", "=", "user1"), ("date", ">=", "2024-06-02")])
+    assert sorted(recent["_id"]) == ["p1", "p3"]
+
+
+def test_compact_keeps_the_newest_row_per_id(mongo, tmp_path):
+    seed(mongo)
+    root = str(tmp_path)
+    export.export_collection("posts", root=root)
+    mongo.posts.update_many({}, {"$inc": {"like_count": 100}})
+    export.export_collection("posts", root=root)
+
+    assert export.compact("posts", root=root) == 4
+    assert len(part_files(root)) == 4
+    assert all(name.endswith("-compacted.parquet") for name in part_files(root))
+    frame = export.load_snapshot("posts", root=root).sort_values("_id")
+    assert list(frame["_id"]) == ["p0", "p1", "p2", "p3"]
+    assert list(frame["like_count"]) == [100, 101, 102, 103]
+    assert export.compact("posts", root=root) == 0  # Already one file per partition
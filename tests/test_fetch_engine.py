@@ -0,0 +1,93 @@
+"""Concurrent fetch engine: per-host limits and comment fan-out, with stubbed requests."""
+import threading
+import time
+from collections import Counter, defaultdict
+
+import pytest
+import requests
+
+from src.scraper import fetch_engine
+from src.scraper.fetch_engine import FetchEngine, HostLimiter
+
+
+class StubAPI:
+    """Stands in for the three fetch functions, recording how many calls overlap per host."""
+
+    def __init__(self, monkeypatch, posts_per_profile=3, delay=0.02, failing=(), profile_delay=0.0):
+        self.posts_per_profile = posts_per_profile
+        self.delay = delay
+        self.profile_delay = profile_delay
+        self.failing = set(failing)
+        self.active = Counter()
+        self.peak = Counter()
+        self.calls = defaultdict(list)
+        self._lock = threading.Lock()
+        monkeypatch.setattr(fetch_engine, "PROFILE_URL", "https://profiles.test/info")
+        monkeypatch.setattr(fetch_engine, "POSTS_URL", "https://profiles.test/posts")
+        monkeypatch.setattr(fetch_engine, "COMMENTS_URL", "https://comments.test/comments")
+        monkeypatch.setattr(fetch_engine, "fetch_instagram_profile", self.profile)
+        monkeypatch.setattr(fetch_engine, "fetch_instagram_posts", self.posts)
+        monkeypatch.setattr(fetch_engine, "fetch_comments_for_post", self.comments)
+
+    def _run(self, host, kind, key, delay):
+        with self._lock:
+            self.active[host] += 1
+            self.peak[host] = max(self.peak[host], self.active[host])
+            self.calls[kind].append(key)
+        time.sleep(delay)
+        with self._lock:
+            self.active[host] -= 1
+
+    def profile(self, username):
+        self._run("profiles.test", "profile", username, self.delay + self.profile_delay)
+        if username in self.failing:
+            raise requests.exceptions.HTTPError(f"404 for {username}")
+        return {"username": username, "follower_count": 1}
+
+    def posts(self, username):
+        self._run("profiles.test", "posts", username, self.delay)
+        return [{"id": f"{username}-{i}", "comment_count": 1, "comments": []} for i in range(self.posts_per_profile)]
+
+    def comments(self, post_id):
+        self._run("comments.test", "comments", post_id, self.delay)
+        return [{"id": f"{post_id}-c", "user": "fan", "text": "hi"}]
+
+
+def test_host_limiter_shares_one_semaphore_per_host():
+    hosts = HostLimiter(2)
+    assert hosts.slot("https://a.test/x") is hosts.slot("https://a.test/y?z=1")
+    assert hosts.slot("https://a.test/x") is not hosts.slot("https://b.test/x")
+
+
+@pytest.mark.parametrize("per_host_limit", [1, 3])
+def test_requests_per_host_stay_within_the_limit(monkeypatch, per_host_limit):
+    api = StubAPI(monkeypatch)
+    records = FetchEngine(max_workers=8, per_host_limit=per_host_limit).fetch([f"user{i}" for i in range(6)])
+    assert len(records) == 6 and all(len(record["posts"]) == 3 for record in records.values())
+    assert all(post["comments"] for record in records.values() for post in record["posts"])
+    assert api.peak["profiles.test"] == per_host_limit
+    assert api.peak["comments.test"] == per_host_limit
+    assert max(api.active.values()) == 0
+
+
+def test_hosts_are_limited_independently(monkeypatch):
+    api = StubAPI(monkeypatch, posts_per_profile=6, delay=0.03)
+    FetchEngine(max_workers=8, per_host_limit=2).fetch([f"user{i}" for i in range(8)])
+    assert api.peak["profiles.test"] <= 2 and api.peak["comments.test"] <= 2
+    assert len(api.calls["comments"]) == 48
+
+
+def test_comments_wait_for_the_profile(monkeypatch):
+    # Posts come back well before the profile, which fails for "gone"
+    api = StubAPI(monkeypatch, failing={"gone"}, profile_delay=0.1)
+    records = FetchEngine(max_workers=4, per_host_limit=4).fetch(["gone", "alice"])
+    assert records["gone"]["status"] == "failed"
+    assert records["alice"]["status"] == "success" and len(records["alice"]["posts"]) == 3
+    assert sorted(api.calls["comments"]) == ["alice-0", "alice-1", "alice-2"]
+
+
+def test_duplicate_usernames_are_fetched_once(monkeypatch):
+    api = StubAPI(monkeypatch, posts_per_profile=1)
+    pairs = list(FetchEngine(max_workers=2, per_host_limit=2).iter_fetch(["alice", "bob", "alice", "bob", "carol"]))
+    assert sorted(username for username, _ in pairs) == ["alice", "bob", "carol"]
+    assert sorted(api.calls["profile"]) == ["alice", "bob", "carol"]
@@ -0,0 +1,146 @@
+"""Content-addressed media store: dedup, conditional re-fetch and LRU eviction."""
+import hashlib
+import io
+import os
+
+import pytest
+from requests import Response
+from requests.adapters import BaseAdapter
+
+from src.scraper.media import READ_CHUNK, MediaFetcher, MediaStore, media_urls, stored_media_urls
+
+
+class Body(io.BytesIO):
+    """A response stream that counts the bytes read from it."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.served = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.served += len(data)
+        return data
+
+
+class FakeCDN(BaseAdapter):
+    """Serves `files` (url -> bytes) with an ETag and honours If-None-Match."""
+
+    def __init__(self, files, content_length=True):
+        super().__init__()
+        self.files = files
+        self.content_length = content_length
+        self.requests = []
+        self.bodies = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = Response()
+        response.url = request.url
+        response.request = request
+        body = self.files.get(request.url)
+        if body is None:
+            response.status_code, response.raw = 404, Body(b"")
+            return response
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            response.status_code, response.raw = 304, Body(b"")
+        else:
+            response.status_code, response.raw = 200, Body(body)
+            response.headers.update({"Content-Type": "image/jpeg", "ETag": etag})
+            if self.content_length:
+                response.headers["Content-Length"] = str(len(body))
+        self.bodies.append(response.raw)
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    def make(files, refresh_hours=24, max_bytes=10**6, content_length=True, **options):
+        fetcher = MediaFetcher(MediaStore(str(tmp_path), max_bytes=max_bytes), max_workers=4,
+                               refresh_hours=refresh_hours, **options)
+        fetcher.cdn = FakeCDN(files, content_length)
+        fetcher.session.mount("https://", fetcher.cdn)
+        return fetcher
+
+    return make
+
+
+def test_same_content_is_stored_once(fetcher):
+    image = b"\xff\xd8jpeg" * 10
+    fetch = fetcher({"https://cdn/a.jpg?sig=1": image, "https://cdn/b.jpg?sig=2": image})
+    paths, outcomes = fetch.fetch_many(["https://cdn/a.jpg?sig=1", "https://cdn/b.jpg?sig=2", "https://cdn/a.jpg?sig=1"])
+    assert outcomes == {"downloaded": 2}
+    assert len(set(paths.values())) == 1
+    path = paths["https://cdn/a.jpg?sig=1"]
+    assert path.endswith(hashlib.sha256(image).hexdigest() + ".jpg")
+    assert open(path, "rb").read() == image
+    assert fetch.store.total_bytes() == len(image)
+
+
+def test_stale_copies_are_revalidated_with_etag(fetcher):
+    url = "https://cdn/pic.jpg"
+    fetch = fetcher({url: b"v1"}, refresh_hours=0)
+    _, first = fetch.fetch(url)
+    assert fetch.fetch(url) == ("not_modified", first)
+    assert fetch.cdn.requests[-1].headers["If-None-Match"]
+
+    fetch.cdn.files[url] = b"v2"
+    outcome, second = fetch.fetch(url)
+    assert outcome == "downloaded" and open(second, "rb").read() == b"v2"
+
+    del fetch.cdn.files[url]  # The CDN link expired: keep serving the last copy
+    assert fetch.fetch(url) == ("failed", second)
+    assert fetch.store.path_for(url) == second
+
+
+def test_fresh_copies_skip_the_network(fetcher):
+    fetch = fetcher({"https://cdn/pic.jpg": b"v1"})
+    fetch.fetch("https://cdn/pic.jpg")
+    assert fetch.fetch("https://cdn/pic.jpg")[0] == "fresh"
+    assert len(fetch.cdn.requests) == 1
+
+
+@pytest.mark.parametrize("content_length", [True, False], ids=["declared", "streamed"])
+def test_oversized_files_are_not_read_past_the_cap(fetcher, content_length):
+    fetch = fetcher({"https://cdn/video.mp4": b"v" * (READ_CHUNK * 16)}, content_length=content_length,
+                    max_file_bytes=READ_CHUNK * 2)
+    assert fetch.fetch("https://cdn/video.mp4") == ("too_large", None)
+    assert fetch.cdn.bodies[0].served <= (0 if content_length else READ_CHUNK * 3)
+    assert fetch.store.total_bytes() == 0
+
+
+def test_least_recently_used_files_are_evicted_by_size(tmp_path):
+    store = MediaStore(str(tmp_path), max_bytes=250)
+    first = store.put("https://cdn/1", b"1" * 100)
+    store.put("https://cdn/2", b"2" * 100)
+    with store._conn:
+        store._conn.execute("UPDATE blobs SET last_access = 0")  # Both long unused...
+    assert store.path_for("https://cdn/1") == first  # ...until 1 is read again
+    store.put("https://cdn/3", b"3" * 100)
+    assert store.path_for("https://cdn/2") is None
+    assert store.lookup("https://cdn/2") is None
+    assert store.path_for("https://cdn/1") == first
+    assert store.total_bytes() == 200
+    assert sum(len(files) for folder, _, files in os.walk(tmp_path) if folder != str(tmp_path)) == 2
+
+
+def test_media_urls_cover_profiles_posts_and_tweets():
+    assert media_urls({"profile_pic_url_hd": "p"}) == ["p"]
+    assert media_urls({"thumbnail_url": "t", "media": [{"url": "u"}, {"preview_url": "v"}]}) == ["t", "u", "v"]
+
+
+def test_stored_media_urls_include_tweet_collections(mongo):
+    mongo.profiles.insert_one({"username": "alice", "profile_pic_url_hd": "https://cdn/alice.jpg"})
+    mongo.posts.insert_one({"_id": "p1", "username": "alice", "thumbnail_url": "https://cdn/p1.jpg", "timestamp": 1})
+    mongo["user_17919972_apiv2"].insert_many([
+        {"_id": "t1", "timestamp": 1, "media": [{"url": "https://pbs/t1.jpg"}]},
+        {"_id": "t2", "timestamp": 2, "media": [{"preview_url": "https://pbs/t2_preview.jpg"}]},
+        {"_id": "t3", "timestamp": 3, "media": []},
+    ])
+    mongo.other_collection.insert_one({"media": [{"url": "https://pbs/ignored.jpg"}]})
+    assert stored_media_urls(tweets_db=mongo) == ["https://cdn/alice.jpg", "https://cdn/p1.jpg",
+                                                  "https://pbs/t2_preview.jpg", "https://pbs/t1.jpg"]
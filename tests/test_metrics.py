@@ -0,0 +1,52 @@
+"""Prometheus exposition and the no-op path of src.utils.metrics."""
+import pytest
+
+from src.utils import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    return metrics.REGISTRY
+
+
+def test_counter_and_gauge_render(registry):
+    requests = metrics.Counter("requests_total", "Requests", ["endpoint", "status"])
+    requests.labels("/v1/info", 200).inc()
+    requests.labels("/v1/info", 200).inc(2)
+    depth = metrics.Gauge("queue_depth", "Queue depth", ["queue"])
+    depth.labels("fetch").set(7)
+    text = metrics.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{endpoint="/v1/info",status="200"} 3' in text
+    assert 'queue_depth{queue="fetch"} 7' in text
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = metrics.Histogram("latency_seconds", "Latency", ["endpoint"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        latency.labels("/x").observe(value)
+    lines = metrics.render().splitlines()
+    assert 'latency_seconds_bucket{endpoint="/x",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{endpoint="/x",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{endpoint="/x",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{endpoint="/x"} 4' in lines
+
+
+def test_write_textfile_labels_series_with_pid(registry, tmp_path):
+    metrics.Counter("jobs_total", "Jobs").inc()
+    path = metrics.write_textfile(str(tmp_path), process="job")
+    with open(path) as f:
+        assert 'jobs_total{pid="' in f.read()
+
+
+def test_noop_metrics_accept_every_call():
+    noop = metrics.NOOP
+    noop.labels("a", "b").inc()
+    noop.labels("a").observe(1.5)
+    noop.set(3)
+    with noop.labels("a").time():
+        pass
+    with metrics.span("stage", username="alice"):
+        pass
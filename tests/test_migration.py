@@ -0,0 +1,159 @@
+"""MySQL -> MongoDB migration: key ranges, checkpointed resume and idempotent re-runs.
+
+MySQL is stood in for by SQLite behind the few mysql-connector calls the
+migration makes; the ranges run in-process against the Mongo stand-in.
+"""
+import functools
+import json
+import sqlite3
+
+import pytest
+
+from src.database import migration
+from src.scraper.checkpoints import CrawlJob
+
+PROFILES, POSTS, COMMENTS_PER_POST = 20, 30, 3
+
+
+class FakeCursor:
+    def __init__(self, connection, dictionary):
+        self.connection = connection
+        self.cursor = connection.conn.cursor()
+        self.dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(sql.replace("%s", "?"), params)
+
+    def _rows(self, rows):
+        self.connection.fetched += len(rows)
+        if self.connection.fail_after is not None and self.connection.fetched > self.connection.fail_after:
+            raise ConnectionError("lost connection to MySQL server")
+        if not self.dictionary:
+            return rows
+        columns = [column[0] for column in self.cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return row if row is None else self._rows([row])[0]
+
+    def fetchmany(self, size):
+        return self._rows(self.cursor.fetchmany(size))
+
+    def close(self):
+        self.cursor.close()
+
+
+class FakeMySQL:
+    """SQLite behind `cursor(dictionary=..., buffered=...)`, `%s` placeholders and `close()`."""
+
+    fail_after = None  # Raise once this many rows have been fetched through one connection
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.fetched = 0
+
+    def cursor(self, dictionary=False, buffered=True):
+        return FakeCursor(self, dictionary)
+
+    def close(self):
+        self.conn.close()
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """A populated source database wired into the migration, plus checkpoints under tmp_path."""
+    path = str(tmp_path / "source.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE instagram_profiles (id INTEGER PRIMARY KEY, username TEXT UNIQUE, full_name TEXT,
+                                         follower_count INTEGER);
+        CREATE TABLE bio_links (id INTEGER PRIMARY KEY, username TEXT, title TEXT, url TEXT);
+        CREATE TABLE instagram_posts (id TEXT PRIMARY KEY, username TEXT, caption TEXT, timestamp INTEGER);
+        CREATE TABLE instagram_comments (id INTEGER PRIMARY KEY, post_id TEXT, username TEXT, comment TEXT,
+                                         created_at INTEGER);
+    """)
+    conn.executemany("INSERT INTO instagram_profiles (username, full_name, follower_count) VALUES (?, ?, ?)",
+                     [(f"user{i:02d}", f"User {i}", i * 100) for i in range(PROFILES)])
+    conn.executemany("INSERT INTO bio_links (username, title, url) VALUES (?, ?, ?)",
+                     [(f"user{i:02d}", "shop", f"https://shop/{i}") for i in range(PROFILES)])
+    conn.executemany("INSERT INTO instagram_posts VALUES (?, ?, ?, ?)",
+                     [(f"p{i:03d}", f"user{i % PROFILES:02d}", f"post {i}", 1_700_000_000 + i) for i in range(POSTS)])
+    conn.executemany("INSERT INTO instagram_comments (post_id, username, comment, created_at) VALUES (?, ?, ?, ?)",
+                     [(f"p{i:03d}", f"fan{j}", f"nice {j}", 1_700_000_000) for i in range(POSTS)
+                      for j in range(COMMENTS_PER_POST)])
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(migration, "mysql_connection", lambda: FakeMySQL(path))
+    monkeypatch.setattr(migration, "CrawlJob", functools.partial(CrawlJob, path=str(tmp_path / "jobs.sqlite3")))
+    return path
+
+
+def run(job_name, workers=2, batch_size=5):
+    """Plan the job and migrate its pending ranges in this process."""
+    job = migration.CrawlJob(job_name)
+    migration.plan_tasks(job, workers)
+    tasks = job.pending_accounts()
+    job.close()
+    return sum(migration.migrate_range(job_name, task, batch_size) for task in tasks)
+
+
+def test_key_ranges_cover_the_table_without_overlap(source):
+    conn = FakeMySQL(source)
+    ranges = migration.key_ranges(conn, "instagram_posts", "id", 4)
+    assert ranges[0][0] is None and ranges[-1][1] is None
+    assert all(hi == next_lo for (_, hi), (next_lo, _) in zip(ranges, ranges[1:]))
+    counts = [len(list(migration.stream_rows(conn, "posts", lo, hi, None, 7))) for lo, hi in ranges]
+    assert len(ranges) == 4 and sum(counts) == POSTS and min(counts) > 0
+
+
+def test_migration_copies_every_row(mongo, source):
+    assert run("full") == PROFILES * 2 + POSTS * (1 + COMMENTS_PER_POST)
+    assert mongo.profiles.count_documents({}) == PROFILES
+    profile = mongo.profiles.find_one({"username": "user03"})
+    assert profile["bio_links"] == [{"title": "shop", "url": "https://shop/3"}]
+    assert profile["mysql_id"] == 4 and "id" not in profile
+    assert mongo.comments.count_documents({}) == POSTS * COMMENTS_PER_POST
+    post = mongo.posts.find_one({"_id": "p007"})
+    assert post["timestamp"] == 1_700_000_007 and len(post["comment_preview"]) == COMMENTS_PER_POST
+
+
+def test_rerun_is_idempotent(mongo, source):
+    run("first")
+    snapshot = {name: sorted(mongo[name].find(), key=lambda doc: str(doc["_id"]))
+                for name in ("profiles", "posts", "comments")}
+    run("second")  # A new job name migrates everything again
+    for name, documents in snapshot.items():
+        assert sorted(mongo[name].find(), key=lambda doc: str(doc["_id"])) == documents
+
+
+def test_interrupted_range_resumes_after_its_checkpoint(mongo, source, monkeypatch):
+    task = json.dumps(["comments", None, None])
+    job = migration.CrawlJob("resume")
+    job.add_accounts([task])
+
+    monkeypatch.setattr(FakeMySQL, "fail_after", 40)
+    with pytest.raises(ConnectionError):
+        migration.migrate_range("resume", task, batch_size=9)
+    checkpoint = job.account_cursor(task)
+    assert checkpoint is not None and job.pending_accounts() == [task]
+    done = mongo.comments.count_documents({"post_id": {"$lte": checkpoint}})
+
+    monkeypatch.setattr(FakeMySQL, "fail_after", None)
+    assert migration.migrate_range("resume", task, batch_size=9) == POSTS * COMMENTS_PER_POST - done
+    assert mongo.comments.count_documents({}) == POSTS * COMMENTS_PER_POST
+    assert job.pending_accounts() == []
+
+
+def test_failed_writes_are_not_checkpointed(mongo, source):
+    mongo.posts.create_index("caption", unique=True)
+    mongo.posts.insert_one({"_id": "elsewhere", "caption": "post 12"})  # p012 now fails to upsert
+    task = json.dumps(["posts", None, None])
+    job = migration.CrawlJob("errors")
+    job.add_accounts([task])
+
+    with pytest.raises(migration.WriteFailed):
+        migration.migrate_range("errors", task, batch_size=5)
+    assert job.account_cursor(task) == "p009"  # The last checkpoint before the failing batch
+    assert job.pending_accounts() == [task]
@@ -0,0 +1,99 @@
+"""Crawl scheduler: due-account planning and hand-off to the worker pool."""
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.scraper import scheduler
+from src.scraper.rate_limit import QuotaExhausted
+from src.scraper.scheduler import Scheduler, plan, track
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+class FakePool:
+    """Records submissions instead of starting processes."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, func, username):
+        self.submitted.append(username)
+        return Future()
+
+
+@pytest.fixture
+def accounts(mongo):
+    """Five tracked accounts: two never crawled, one overdue, one a bit overdue and one fresh."""
+    track(["new_big", "new_small", "overdue", "late", "fresh"])
+    hours = scheduler.REFRESH_MAX_HOURS
+    mongo.crawl_state.insert_many([
+        {"_id": "new_big", "follower_count": 10_000},
+        {"_id": "overdue", "last_crawl_at": NOW - timedelta(hours=hours * 10)},
+        {"_id": "late", "last_crawl_at": NOW - timedelta(hours=hours * 2)},
+        {"_id": "fresh", "last_crawl_at": NOW - timedelta(minutes=1)},
+    ])
+    return mongo
+
+
+def usernames(queue):
+    return [entry[2] for entry in sorted(queue)]
+
+
+def test_plan_orders_due_accounts_by_how_overdue(accounts):
+    assert usernames(plan(NOW)) == ["new_big", "new_small", "overdue", "late"]
+    assert usernames(plan(NOW, skip={"new_small", "overdue"})) == ["new_big", "late"]
+
+
+def test_failed_attempts_wait_an_interval(accounts):
+    accounts.tracked_accounts.update_one({"_id": "new_small"}, {"$set": {"last_attempt_at": NOW}})
+    assert "new_small" not in usernames(plan(NOW))
+
+
+def test_submit_skips_accounts_in_flight_or_crawled_since_the_plan(accounts):
+    workers = Scheduler(workers=2)
+    pool, running = FakePool(), {}
+    planned_at, queue = time.monotonic(), plan(NOW)
+    running[Future()] = "new_big"  # Still crawling from an earlier plan
+    workers.attempted["overdue"] = time.monotonic()  # Finished after this plan was made
+    workers._submit_due(pool, queue, running, planned_at)
+    assert pool.submitted == ["new_small", "late"]
+    assert sorted(running.values()) == ["late", "new_big", "new_small"] and queue == []
+
+
+def test_submit_keeps_two_tasks_per_worker_queued(accounts):
+    workers = Scheduler(workers=1)
+    pool, running = FakePool(), {}
+    queue = plan(NOW)
+    workers._submit_due(pool, queue, running, time.monotonic())
+    assert pool.submitted == ["new_big", "new_small"] and usernames(queue) == ["overdue", "late"]
+
+
+def test_finished_crawls_are_not_resubmitted_from_an_older_plan(accounts):
+    workers = Scheduler(workers=4)
+    pool, running = FakePool(), {}
+    planned_at, queue = time.monotonic(), plan(NOW)
+    stale = list(queue)  # Planned before "late" was crawled
+    workers._submit_due(pool, plan(NOW, skip={"overdue", "new_big", "new_small"}), running, planned_at)
+    future = next(future for future, username in running.items() if username == "late")
+    future.set_result({"profiles": 1, "failed": 0, "posts": 3})
+    workers._finished(running.pop(future), future)
+
+    workers._submit_due(pool, stale, running, planned_at)
+    assert pool.submitted == ["late", "new_big", "new_small", "overdue"]
+    assert workers.stats == {"profiles": 1, "failed": 0, "posts": 3}
+    assert accounts.tracked_accounts.find_one({"_id": "late"})["last_attempt_at"]
+
+
+def test_exhausted_quota_stops_the_scheduler_and_leaves_the_account_due(accounts):
+    workers = Scheduler(workers=1)
+    pool, running = FakePool(), {}
+    planned_at, queue = time.monotonic(), plan(NOW)
+    workers._submit_due(pool, queue, running, planned_at)
+    future, username = next(iter(running.items()))
+    future.set_exception(QuotaExhausted("Monthly quota of 10 requests reached"))
+    workers._finished(running.pop(future), future)
+
+    assert workers.quota_exhausted and workers.stats["failed"] == 0
+    assert "last_attempt_at" not in accounts.tracked_accounts.find_one({"_id": username})
@@ -0,0 +1,174 @@
+"""Scraper tests and benchmarks against the replay server (tests/replay.py)."""
+from datetime import datetime
+
+import pytest
+
+from src.analysis.engagement import EngagementTracker
+from src.scraper import fetch_data, twitter
+from src.scraper.crawl_state import post_counts
+from src.scraper.pipeline import stream_instagram
+from src.scraper.checkpoints import CrawlJob
+from src.scraper.rate_limit import QuotaExhausted, QuotaTracker, rapidapi_limiter
+from src.scraper.save_to_db import BulkWriter
+
+TWEET_OPTIONS = {"tweet_fields": twitter.TWEET_FIELDS, "expansions": twitter.EXPANSIONS,
+                 "user_fields": twitter.USER_FIELDS, "media_fields": twitter.MEDIA_FIELDS}
+
+
+def test_fetch_instagram_data(replay):
+    record = fetch_data.fetch_instagram_data("replay_user")
+    assert record["status"] == "success"
+    assert record["username"] == "replay_user"
+    assert record["follower_count"] == 1250000
+    assert record["account_type"] == "Business"
+    assert len(record["posts"]) == replay.posts_per_page
+    assert all(len(post["comments"]) == replay.comments_per_post for post in record["posts"])
+    assert set(record["posts"][0]) == {"source", "id", "code", "thumbnail_url", "like_count", "comment_count",
+                                       "caption", "timestamp", "comments"}  # No Twitter-only fields
+    assert replay.requests_served() == 2 + replay.posts_per_page
+
+
+def test_incremental_fetch_skips_unchanged_comments(replay):
+    first = fetch_data.fetch_instagram_data("replay_user")
+    seen = {post["id"]: post_counts(post) for post in first["posts"]}
+    replay.reset_stats()
+
+    again = fetch_data.fetch_instagram_data("replay_user", seen)
+    assert replay.requests_served() == 2  # Profile and posts only
+    assert all("comments" not in post for post in again["posts"])
+
+
+def test_throttled_requests_are_retried(replay):
+    replay.throttle_every = 4
+    record = fetch_data.fetch_instagram_data("replay_user")
+    assert record["status"] == "success"
+    assert replay.statuses[429] > 0
+    assert all(len(post["comments"]) == replay.comments_per_post for post in record["posts"])
+    assert fetch_data.client.stats()["throttled"] >= replay.statuses[429]
+
+
+def test_server_errors_become_failed_records(replay):
+    replay.error_rate = 1.0
+    record = fetch_data.fetch_instagram_data("replay_user")
+    assert record["status"] == "failed"
+    assert record["status_code"] == 500
+
+
+def test_fetch_tweets_with_api_v2(replay):
+    tweets = twitter.fetch_tweets_with_api_v2("replay", "17919972", 100, 10, **TWEET_OPTIONS)
+    assert len(tweets) == replay.pages * replay.tweets_per_page
+    assert len({tweet.id for tweet in tweets}) == len(tweets)
+    assert tweets[0].username == "XEng"
+    assert tweets[0].media[0].type == "photo"
+    assert tweets[0].source_app == "Twitter Web App" and tweets[0].entities["urls"][0]["url"] == "https://t.co/replay"
+    assert tweets[0].author_name == "Engineering" and tweets[0].author_verified is True
+    reply = tweets[1]
+    assert reply.in_reply_to_user_id == "2244994945"
+    assert [(ref.type, ref.id, ref.author_username) for ref in reply.referenced] == [
+        ("replied_to", "1789999999999999999", "someone")]
+    assert reply.referenced[0].text == "Is the new ranking service documented anywhere?"
+
+
+def test_upgrade_stored_tweets(mongo):
+    legacy = {"_id": "1790000000000000002", "text": "@someone Thanks", "created_at": datetime(2024, 5, 13, 18, 40, 2),
+              "author_id": "17919972", "author_username": "XEng", "author_name": "Engineering",
+              "author_verified": True, "conversation_id": "1789999999999999999", "language": "en",
+              "source": "Twitter Web App", "in_reply_to_user_id": "2244994945",
+              "public_metrics": {"retweet_count": 2, "reply_count": 3, "like_count": 41, "quote_count": 1},
+              "entities": {"mentions": [{"username": "someone"}]},
+              "referenced_tweets": [{"type": "replied_to", "id": "1789999999999999999", "text": "Docs?",
+                                     "author_id": "2244994945", "author_username": "someone", "error": None}],
+              "attachments": [{"media_key": "3_1", "type": "photo", "url": "https://pbs/1.jpg", "alt_text": None}]}
+    mongo.user_17919972_apiv2.insert_many([legacy, {"_id": "new", "source": "twitter", "caption": "already a record"}])
+
+    assert twitter.upgrade_stored_tweets(mongo) == {"user_17919972_apiv2": 1}
+    tweet = mongo.user_17919972_apiv2.find_one({"_id": legacy["_id"]})
+    assert not set(twitter.LEGACY_FIELDS) & set(tweet)
+    assert tweet["source"] == "twitter" and tweet["source_app"] == "Twitter Web App"
+    assert tweet["caption"] == "@someone Thanks" and tweet["username"] == "XEng"
+    assert tweet["timestamp"] == 1715625602 and tweet["share_count"] == 3 and tweet["comment_count"] == 3
+    assert tweet["referenced"] == [{"type": "replied_to", "id": "1789999999999999999", "text": "Docs?",
+                                    "author_id": "2244994945", "author_username": "someone"}]
+    assert tweet["media"] == [{"key": "3_1", "type": "photo", "url": "https://pbs/1.jpg"}]
+    assert tweet["author_name"] == "Engineering" and tweet["entities"] == legacy["entities"]
+    assert twitter.upgrade_stored_tweets(mongo) == {}
+
+
+def test_stream_instagram_writes_every_page(replay, mongo):
+    posts = replay.pages * replay.posts_per_page
+    with BulkWriter() as writer:
+        stats = stream_instagram(["replay_user"], writer, max_pages=replay.pages, tracker=EngagementTracker(writer))
+    assert stats == {"profiles": 1, "failed": 0, "posts": posts}
+    assert mongo.posts.count_documents({"username": "replay_user"}) == posts
+    assert mongo.comments.count_documents({}) == posts * replay.comments_per_post
+    assert mongo.profile_metrics.find_one({"_id": "replay_user"})["post_count"] == posts
+    assert len(mongo.crawl_state.find_one({"_id": "replay_user"})["posts"]) == posts
+
+
+def test_exhausted_quota_stops_the_crawl_with_the_job_resumable(replay, mongo, tmp_path, monkeypatch):
+    # Profile, first page and its comments fit; the quota runs out on the second page's comments
+    monkeypatch.setattr(rapidapi_limiter, "quota", QuotaTracker(2 + replay.posts_per_page + 3))
+    job = CrawlJob("quota", path=str(tmp_path / "jobs.sqlite3"))
+    with pytest.raises(QuotaExhausted):
+        with BulkWriter() as writer:
+            stream_instagram(["replay_user", "other_user"], writer, max_pages=replay.pages, job=job,
+                             tracker=EngagementTracker(writer))
+    assert job.pending_accounts() == ["replay_user", "other_user"]  # Neither finished nor failed
+    assert job.account_cursor("replay_user") == "page-1"
+    assert mongo.comments.count_documents({}) == replay.posts_per_page * replay.comments_per_post
+    assert mongo.profile_metrics.count_documents({}) == 0  # The half-crawled profile's deltas were dropped
+
+
+def test_resumed_job_keeps_crawl_state_of_finished_pages(replay, mongo, tmp_path):
+    posts = replay.pages * replay.posts_per_page
+    with BulkWriter() as writer:
+        stream_instagram(["replay_user"], writer, max_pages=replay.pages, tracker=EngagementTracker(writer))
+    first = mongo.crawl_state.find_one({"_id": "replay_user"})
+
+    # A later job that stopped after its first two pages picks up at the last one
+    job = CrawlJob("resume", path=str(tmp_path / "jobs.sqlite3"))
+    job.add_accounts(["replay_user"])
+    job.save_page("replay_user", f"page-{replay.pages - 1}")
+    replay.reset_stats()
+    with BulkWriter() as writer:
+        stats = stream_instagram(["replay_user"], writer, max_pages=replay.pages, job=job,
+                                 tracker=EngagementTracker(writer))
+    assert stats["posts"] == replay.posts_per_page
+    state = mongo.crawl_state.find_one({"_id": "replay_user"})
+    assert state["posts"] == first["posts"]
+    assert state["latest_post_id"] == first["latest_post_id"]
+    assert mongo.profile_metrics.find_one({"_id": "replay_user"})["post_count"] == posts
+    assert job.pending_accounts() == []
+
+
+# --- Benchmarks ---
+
+@pytest.mark.benchmark(group="scraper")
+def test_bench_fetch_instagram_data(replay, measure):
+    replay.latency, replay.jitter = 0.002, 0.003
+    posts = replay.posts_per_page
+    measure("fetch_instagram_data", lambda: fetch_data.fetch_instagram_data("replay_user"),
+            records=1 + posts + posts * replay.comments_per_post)
+
+
+@pytest.mark.benchmark(group="scraper")
+def test_bench_fetch_tweets_with_api_v2(replay, measure):
+    replay.latency, replay.jitter = 0.002, 0.003
+    replay.pages, replay.tweets_per_page = 5, 100
+    measure("fetch_tweets_with_api_v2",
+            lambda: twitter.fetch_tweets_with_api_v2("replay", "17919972", 500, 100, **TWEET_OPTIONS),
+            records=replay.pages * replay.tweets_per_page)
+
+
+@pytest.mark.benchmark(group="scraper")
+def test_bench_stream_instagram(replay, mongo, measure):
+    replay.latency, replay.jitter = 0.002, 0.003
+    posts = replay.pages * replay.posts_per_page
+
+    def crawl():
+        with BulkWriter() as writer:
+            stream_instagram(["replay_user"], writer, incremental=False, max_pages=replay.pages,
+                             tracker=EngagementTracker(writer))
+
+    measure("stream_instagram", crawl, records=1 + posts + posts * replay.comments_per_post,
+            setup=lambda: mongo.crawl_state.delete_many({}))